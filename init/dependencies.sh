@@ -1,7 +1,7 @@
 #!/bin/bash
 
 # List of dependencies
-DEPS=(pygame pygame_gui networkx)
+DEPS=(pygame pygame_gui networkx numpy scipy)
 
 # Detect OS
 if [[ "$(uname)" == "Darwin" ]]; then
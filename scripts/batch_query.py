@@ -0,0 +1,125 @@
+import argparse
+import json
+import sys
+from collections import OrderedDict
+from itertools import islice
+
+# Only the graph modules are imported here, never pygame, pygame_gui or networkx, so the CLI starts fast
+from compact_graph import CompactGraph
+from snapshot import is_snapshot, load_snapshot
+
+BATCH_SIZE = 10000  # Pairs read before the queries are grouped by source and answered
+TREE_CACHE_SIZE = 8  # Complete single-source searches kept between batches
+
+
+def load_graph(path):
+    # Open a binary snapshot or stream-parse a DOT file into a compact graph
+    if is_snapshot(path):
+        return load_snapshot(path)
+    graph = CompactGraph()
+    with open(path, "rb") as dot_file:
+        graph.load_dot(dot_file)
+    graph.freeze()
+    return graph
+
+
+def read_pairs(lines):
+    # "source target" per line, separated by whitespace or a comma. Empty lines and # comments are skipped
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = line.replace(",", " ").split()
+        if len(fields) != 2:
+            raise ValueError(f"Expected 'source target', got {line!r}")
+        yield fields[0], fields[1]
+
+
+def _path(graph, predecessors, source_id, target_id):
+    path = []
+    current_node = target_id
+    while current_node >= 0:
+        path.append(graph.names[current_node])
+        if current_node == source_id:
+            break
+        current_node = predecessors[current_node]
+    path.reverse()
+    return path
+
+
+def answer(graph, pairs, batch_size=BATCH_SIZE, cache_size=TREE_CACHE_SIZE):
+    # Yield one result dict per (source, target) pair, in input order.
+    # Pairs are taken in batches and grouped by source inside a batch, so every source is searched only once per
+    # batch (and not at all while its complete search is still cached)
+    pairs = iter(pairs)
+    trees = OrderedDict()  # source id -> (distances, predecessors) of a complete search
+    while True:
+        batch = list(islice(pairs, batch_size))
+        if not batch:
+            break
+
+        by_source = {}
+        for source, target in batch:
+            by_source.setdefault(source, set()).add(target)
+
+        results = {}
+        for source, targets in by_source.items():
+            source_id = graph.ids.get(source)
+            if source_id is None:
+                continue
+            tree = trees.get(source_id)
+            if tree is not None:
+                trees.move_to_end(source_id)
+            elif len(targets) == 1:
+                # A single target only needs the search up to that target
+                target_id = graph.ids.get(next(iter(targets)), -1)
+                distances, predecessors, _ = graph.dijkstra_ids(source_id, target_id, stop_at_target=True)
+                tree = (distances, predecessors)
+            else:
+                distances, predecessors, _ = graph.dijkstra_ids(source_id)
+                tree = (distances, predecessors)
+                trees[source_id] = tree
+                if len(trees) > cache_size:
+                    trees.popitem(last=False)
+            results[source] = tree
+
+        for source, target in batch:
+            result = {"source": source, "target": target}
+            target_id = graph.ids.get(target)
+            if source not in results or target_id is None:
+                result["error"] = f"unknown node {source if source not in results else target}"
+            else:
+                distances, predecessors = results[source]
+                distance = distances[target_id]
+                if distance == float("inf"):
+                    result["distance"], result["path"] = None, []
+                else:
+                    result["distance"] = distance
+                    result["path"] = _path(graph, predecessors, graph.ids[source], target_id)
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer many shortest path queries against one graph.")
+    parser.add_argument("graph", help="DOT file or binary graph snapshot")
+    parser.add_argument("--pairs", help="file with 'source target' lines (default: stdin)")
+    parser.add_argument("--output", help="file for the JSON lines results (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="pairs grouped by source at once (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    graph = load_graph(args.graph)
+    pairs_file = open(args.pairs) if args.pairs else sys.stdin
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for result in answer(graph, read_pairs(pairs_file), args.batch_size):
+            output.write(json.dumps(result) + "\n")
+    finally:
+        if args.pairs:
+            pairs_file.close()
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from compact_graph import CompactGraph
+from dijkstra import Graph
+from generators import GENERATORS, to_dot
+from layout import force_layout
+
+SIZES = (100, 1000, 10000, 100000)  # Default edge counts, up to 10 ** 7 can be asked for with --sizes
+RENDER_MAX_EDGES = 100000  # Bigger graphs are not rendered, a frame would take seconds
+LAYOUT_MAX_EDGES = 20000  # Bigger graphs are not laid out, that takes minutes
+PATH_QUERIES = 20  # Random pairs timed for shortest_path
+FRAMES = 10  # Frames timed for renderGraph
+ZOOM = 8  # Zoom of the zoomed in frames
+
+
+def _timed(function, *args):
+    # (seconds, result) of one call
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def _best(repeats, function, *args):
+    # Shortest of several runs, the least disturbed by the rest of the machine
+    return min(_timed(function, *args)[0] for _ in range(repeats))
+
+
+def _load(dot):
+    graph = Graph()
+    graph.from_dot_string(dot)
+    return graph
+
+
+def _load_compact(dot):
+    graph = CompactGraph()
+    graph.load_dot(dot)
+    graph.freeze()
+    return graph
+
+
+def _steps_peak(graph, source):
+    # Peak memory allocated while a search records its step log
+    tracemalloc.start()
+    try:
+        _, _, steps = graph.dijkstra(source, None)
+        return tracemalloc.get_traced_memory()[1], len(steps)
+    finally:
+        tracemalloc.stop()
+
+
+def _render_frames(dot, graph, distances, source, positions=None):
+    # Mean renderGraph time per frame on the dummy SDL driver, after a first frame that builds the scene.
+    # Without positions (the graph was too big to lay out) a random layout stands in for a real one
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # The banner would end up in the JSON on stdout
+    import pygame
+    import visualization
+
+    pygame.init()
+    screen = pygame.display.set_mode((1200, 800))
+    parse_seconds, data = _timed(visualization.parseInput, dot)
+    rng = random.Random(1)
+    visualization.invalidateScene()
+    if positions is None:
+        positions = {node: (rng.uniform(-1, 1), rng.uniform(-1, 1)) for node in graph.nodes()}
+    visualization.setLayout(data, positions)
+    font = visualization.getFont("label")
+
+    visualization.renderGraph(data, screen, font, screen, distances, source)
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        screen.fill((0, 0, 0))
+        visualization.renderGraph(data, screen, font, screen, distances, source)
+    frame_seconds = (time.perf_counter() - start) / FRAMES
+
+    # Zoomed in on the middle of the window, only the few visible nodes and edges are drawn
+    camera = visualization.Camera()
+    camera.zoom_at(ZOOM, screen.get_rect().center)
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        screen.fill((0, 0, 0))
+        visualization.renderGraph(data, screen, font, screen, distances, source, camera=camera)
+    zoomed_seconds = (time.perf_counter() - start) / FRAMES
+    visualization.invalidateScene()
+    return parse_seconds, frame_seconds, zoomed_seconds
+
+
+def run_case(generator, size, repeats=3, render=True, seed=1):
+    # Every measurement for one generated graph, as a JSON friendly dict (times in milliseconds)
+    dot = to_dot(GENERATORS[generator](size, seed))
+    result = {"generator": generator, "requested_edges": size, "dot_bytes": len(dot)}
+
+    graph = _load(dot)
+    result["nodes"] = len(graph.graph)
+    result["edges"] = sum(len(neighbors) for neighbors in graph.graph.values())
+    result["from_dot_string_ms"] = _best(repeats, _load, dot) * 1000
+    result["compact_load_ms"] = _best(repeats, _load_compact, dot) * 1000
+
+    rng = random.Random(seed)
+    nodes = graph.nodes()
+    source = rng.choice(nodes)
+    result["dijkstra_ms"] = _best(repeats, graph.dijkstra, source, None) * 1000
+    result["dijkstra_no_steps_ms"] = _best(repeats, lambda: graph.dijkstra(source, None, record_steps=False)) * 1000
+
+    pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(PATH_QUERIES)]
+    fresh = _load(dot)  # Without the trees cached by the runs above
+    seconds, _ = _timed(lambda: [fresh.shortest_path(a, b) for a, b in pairs])
+    result["shortest_path_ms"] = seconds / PATH_QUERIES * 1000
+
+    result["steps_peak_bytes"], result["steps"] = _steps_peak(graph, source)
+
+    positions = None
+    if render and result["edges"] <= LAYOUT_MAX_EDGES:
+        seconds, positions = _timed(force_layout, list(graph.edges()))
+        result["force_layout_ms"] = seconds * 1000
+
+    if render and result["edges"] <= RENDER_MAX_EDGES:
+        distances, _, _ = graph.dijkstra(source, None, record_steps=False)
+        parse_seconds, frame_seconds, zoomed_seconds = _render_frames(dot, graph, distances, source, positions)
+        result["parseInput_ms"] = parse_seconds * 1000
+        result["render_frame_ms"] = frame_seconds * 1000
+        result["render_zoomed_frame_ms"] = zoomed_seconds * 1000
+    return result
+
+
+def run(generators, sizes, repeats=3, render=True, seed=1):
+    report = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "results": [],
+    }
+    for generator in generators:
+        for size in sizes:
+            report["results"].append(run_case(generator, size, repeats, render, seed))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark parsing, searching and rendering on generated graphs.")
+    parser.add_argument("--generators", default=",".join(GENERATORS),
+                        help="comma separated, any of %(default)s")
+    parser.add_argument("--sizes", default=",".join(map(str, SIZES)),
+                        help="comma separated edge counts (default: %(default)s)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per timing, the best is kept")
+    parser.add_argument("--no-render", action="store_true", help="skip the pygame measurements")
+    parser.add_argument("--output", help="JSON file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    generators = args.generators.split(",")
+    unknown = [name for name in generators if name not in GENERATORS]
+    if unknown:
+        parser.error(f"unknown generator {unknown[0]!r}")
+    sizes = [int(float(size)) for size in args.sizes.split(",")]
+
+    report = run(generators, sizes, args.repeats, not args.no_render)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,491 @@
+from array import array  # Typed arrays for the CSR adjacency and per-node search state
+from collections.abc import Mapping
+from heapq import heappop, heappush  # Import functions to work with a priority queue
+
+from dijkstra import PROGRESS_INTERVAL, Graph
+from step_log import LazyStepLog, StepLog
+
+INF = float("inf")
+
+
+class NodeArrayView(Mapping):
+    # Read-only name -> value mapping over an array indexed by node id.
+    # Lets the integer based search hand back results in the same shape as Graph.dijkstra without
+    # building a dict with one entry per node
+    def __init__(self, graph, values, as_name=False):
+        self._graph = graph
+        self._values = values
+        self._as_name = as_name  # Values are node ids that should be returned as names (-1 meaning None)
+
+    def __getitem__(self, node):
+        value = self._values[self._graph.ids[node]]
+        if self._as_name:
+            return self._graph.names[value] if value >= 0 else None
+        return value
+
+    def __iter__(self):
+        return iter(self._graph.names)
+
+    def __len__(self):
+        return len(self._graph.names)
+
+
+class CompactGraph(Graph):
+    # Graph backend for large inputs.
+    # Node names are interned to integer ids and the adjacency is stored in CSR form: the outgoing edges of
+    # node i are targets[offsets[i]:offsets[i + 1]] with the matching weights. Edges are buffered by add_edge
+    # and the CSR arrays are built by freeze(), which queries call on their own if the graph changed.
+    def __init__(self):
+        self.names = []  # Node id -> name
+        self.ids = {}  # Name -> node id
+
+        # Edges added since the last freeze
+        self._pending_from = array('l')
+        self._pending_to = array('l')
+        self._pending_weight = array('d')
+
+        # Forward CSR adjacency
+        self.offsets = array('l', [0])
+        self.targets = array('l')
+        self.weights = array('d')
+        # Reverse CSR adjacency (incoming edges), used by the backward half of bidirectional search
+        self.rev_offsets = array('l', [0])
+        self.rev_sources = array('l')
+        self.rev_weights = array('d')
+        self.frozen = True
+        self.layout = None  # Node name -> (x, y), see Graph
+        self.landmarks = None  # LandmarkIndex over the node ids, see Graph
+        self.hierarchy = None  # ContractionHierarchy over the node ids, see Graph
+        self.snapshot_path = None  # Snapshot file the arrays are mapped from, if any
+
+        # Query caches, see Graph
+        self.version = 0
+        self._paths = {}
+        self._trees = {}
+        self._exports = {}
+
+    @classmethod
+    def from_graph(cls, graph):
+        compact = cls()
+        for node in graph.nodes():
+            compact.intern(node)
+        for from_node, to_node, weight in graph.edges():
+            compact.add_edge(from_node, to_node, weight)
+        compact.freeze()
+        compact.layout = graph.layout
+        if graph.landmarks is not None and graph.landmarks.version == graph.version:
+            compact.landmarks = graph.landmarks.rebind(compact)  # Nodes are interned in the same order
+        if graph.hierarchy is not None and graph.hierarchy.version == graph.version:
+            compact.hierarchy = graph.hierarchy.rebind(compact)
+        return compact
+
+    @classmethod
+    def from_arrays(cls, names, ids, offsets, targets, weights, rev_offsets, rev_sources, rev_weights):
+        # Wrap already built CSR arrays (for example views of a mapped snapshot) without copying them
+        compact = cls()
+        compact.names, compact.ids = names, ids
+        compact.offsets, compact.targets, compact.weights = offsets, targets, weights
+        compact.rev_offsets, compact.rev_sources, compact.rev_weights = rev_offsets, rev_sources, rev_weights
+        return compact
+
+    def intern(self, node):
+        node_id = self.ids.get(node)
+        if node_id is None:
+            if not isinstance(self.names, list):
+                # Names of a loaded snapshot are read-only views, copy them before the first new node
+                self.names = list(self.names)
+                self.ids = dict(self.ids)
+            node_id = len(self.names)
+            self.ids[node] = node_id
+            self.names.append(node)
+            self.frozen = False  # offsets need one more entry
+        return node_id
+
+    def add_node(self, node):
+        if node not in self.ids:
+            self.intern(node)
+            self._changed()
+
+    def add_edge(self, from_, to_, weight):
+        # Edges are only buffered here, the adjacency is rebuilt by the next freeze
+        self._pending_from.append(self.intern(from_))
+        self._pending_to.append(self.intern(to_))
+        self._pending_weight.append(weight)
+        self.frozen = False
+        self._changed()
+
+    def remove_edge(self, from_, to_):
+        # Edits of a CSR graph are rebuilds, the edge is dropped from the arrays and the reverse index rebuilt
+        self.freeze()
+        from_id, to_id = self.ids[from_], self.ids[to_]
+        start, end = self.offsets[from_id], self.offsets[from_id + 1]
+        for i in range(start, end):
+            if self.targets[i] == to_id:
+                break
+        else:
+            raise KeyError((from_, to_))
+        sources = array('l')
+        for node_id in range(len(self.names)):
+            sources.extend([node_id] * (self.offsets[node_id + 1] - self.offsets[node_id]))
+        del sources[i]
+        targets, weights = array('l', self.targets), array('d', self.weights)
+        del targets[i]
+        del weights[i]
+        self.offsets, self.targets, self.weights = array('l', [0]), array('l'), array('d')
+        self._pending_from, self._pending_to, self._pending_weight = sources, targets, weights
+        self.frozen = False
+        self._changed()
+
+    def freeze(self):
+        # Build the CSR arrays from the current adjacency plus the buffered edges. Call once after bulk loading,
+        # afterwards the graph can still be edited but every change costs a rebuild
+        if self.frozen:
+            return
+        node_count = len(self.names)
+        self.snapshot_path = None  # The rebuilt arrays no longer come from the file
+
+        # Existing edges first so buffered edges win when the same edge was added again, like in Graph
+        sources = array('l')
+        for node_id in range(len(self.offsets) - 1):
+            sources.extend([node_id] * (self.offsets[node_id + 1] - self.offsets[node_id]))
+        sources.extend(self._pending_from)
+        destinations = array('l', self.targets)  # The current arrays may be read-only views
+        destinations.extend(self._pending_to)
+        weights = array('d', self.weights)
+        weights.extend(self._pending_weight)
+
+        self.offsets, self.targets, self.weights = _build_csr(node_count, sources, destinations, weights, True)
+        self._pending_from, self._pending_to, self._pending_weight = array('l'), array('l'), array('d')
+
+        # The reverse adjacency is the same edges grouped by target
+        sources = array('l')
+        for node_id in range(node_count):
+            sources.extend([node_id] * (self.offsets[node_id + 1] - self.offsets[node_id]))
+        self.rev_offsets, self.rev_sources, self.rev_weights = _build_csr(node_count, self.targets, sources,
+                                                                          self.weights, False)
+        self.frozen = True
+
+    def nodes(self):
+        return list(self.names)
+
+    def node_count(self):
+        return len(self.names)
+
+    def edge_count(self):
+        self.freeze()
+        return len(self.targets)
+
+    def edges(self):
+        self.freeze()
+        names, offsets, targets, weights = self.names, self.offsets, self.targets, self.weights
+        for node_id, name in enumerate(names):
+            for i in range(offsets[node_id], offsets[node_id + 1]):
+                yield name, names[targets[i]], weights[i]
+
+    def neighbors(self, node):
+        # Outgoing edges of a node as a name -> weight dict
+        self.freeze()
+        node_id = self.ids[node]
+        start, end = self.offsets[node_id], self.offsets[node_id + 1]
+        return {self.names[target]: weight for target, weight in zip(self.targets[start:end], self.weights[start:end])}
+
+    def dijkstra_ids(self, source_id, target_id=-1, stop_at_target=False, record_steps=False, queue=None,
+                     progress=None):
+        # Dijkstra over node ids, returns the raw distance and predecessor arrays and the step log (or None).
+        # queue picks another priority queue by name (see priority_queues.py), None is the inlined heapq loop.
+        # progress as in Graph.dijkstra
+        self.freeze()
+        if queue is not None:
+            from priority_queues import make_queue
+            return self._dijkstra_with(make_queue(queue, self), source_id, target_id, stop_at_target, record_steps,
+                                       progress)
+        node_count = len(self.names)
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+
+        distances = array('d', [INF]) * node_count
+        predecessors = array('l', [-1]) * node_count
+        visited = bytearray(node_count)
+        steps = StepLog(names=self.names, ids=self.ids) if record_steps else None
+
+        distances[source_id] = 0
+        if record_steps:
+            steps.record_ids(source_id, 0)
+
+        priority_queue = [(0, source_id)]
+        settled = 0
+        while priority_queue:
+            currentDist, currentNode = heappop(priority_queue)
+            if visited[currentNode]:
+                continue  # Stale entry of a node that was already settled
+            visited[currentNode] = 1
+            if record_steps:
+                steps.settle_id(currentNode)
+            if progress is not None:
+                settled += 1
+                if not settled % PROGRESS_INTERVAL:
+                    progress(settled, node_count)
+
+            if stop_at_target and currentNode == target_id:
+                break
+
+            for i in range(offsets[currentNode], offsets[currentNode + 1]):
+                neighbor = targets[i]
+                temporary_distance = currentDist + weights[i]
+                if temporary_distance < distances[neighbor]:
+                    distances[neighbor] = temporary_distance
+                    predecessors[neighbor] = currentNode
+                    heappush(priority_queue, (temporary_distance, neighbor))
+                    if record_steps:
+                        steps.record_ids(neighbor, temporary_distance, currentNode, currentNode)
+
+        return distances, predecessors, steps
+
+    def _dijkstra_with(self, queue, source_id, target_id, stop_at_target, record_steps, progress=None):
+        # Same search as dijkstra_ids through the push / pop interface of a priority_queues queue
+        node_count = len(self.names)
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+
+        distances = array('d', [INF]) * node_count
+        predecessors = array('l', [-1]) * node_count
+        visited = bytearray(node_count)
+        steps = StepLog(names=self.names, ids=self.ids) if record_steps else None
+
+        distances[source_id] = 0
+        if record_steps:
+            steps.record_ids(source_id, 0)
+
+        queue.push(source_id, 0)
+        settled = 0
+        while queue:
+            currentDist, currentNode = queue.pop()
+            # Lazy queues keep the entries of lowered priorities, a bucket may return those before the new one
+            if visited[currentNode] or currentDist > distances[currentNode]:
+                continue
+            visited[currentNode] = 1
+            if record_steps:
+                steps.settle_id(currentNode)
+            if progress is not None:
+                settled += 1
+                if not settled % PROGRESS_INTERVAL:
+                    progress(settled, node_count)
+
+            if stop_at_target and currentNode == target_id:
+                break
+
+            for i in range(offsets[currentNode], offsets[currentNode + 1]):
+                neighbor = targets[i]
+                temporary_distance = currentDist + weights[i]
+                if temporary_distance < distances[neighbor]:
+                    distances[neighbor] = temporary_distance
+                    predecessors[neighbor] = currentNode
+                    queue.push(neighbor, temporary_distance)
+                    if record_steps:
+                        steps.record_ids(neighbor, temporary_distance, currentNode, currentNode)
+
+        return distances, predecessors, steps
+
+    def dijkstra(self, source: str, target: str, stop_at_target=False, record_steps=True, queue=None,
+                 progress=None):
+        # Same contract as Graph.dijkstra, the returned mappings are views over the result arrays
+        source_id = self.ids[source]
+        target_id = self.ids.get(target, -1)
+        distances, predecessors, steps = self.dijkstra_ids(source_id, target_id, stop_at_target, record_steps,
+                                                           queue, progress)
+        distances = NodeArrayView(self, distances)
+        predecessors = NodeArrayView(self, predecessors, as_name=True)
+        if not stop_at_target:
+            self.remember_tree(source, distances, predecessors)
+        return distances, predecessors, steps
+
+    def dijkstra_lazy(self, source: str):
+        # See Graph.dijkstra_lazy. The finished result holds views over the id arrays like dijkstra's
+        self.freeze()
+        steps = LazyStepLog(names=self.names, ids=self.ids)
+        steps.search = self._dijkstra_steps(source, steps)
+        return steps
+
+    def _dijkstra_steps(self, source, steps):
+        version = self.version
+        source_id = self.ids[source]
+        node_count = len(self.names)
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+
+        distances = array('d', [INF]) * node_count
+        predecessors = array('l', [-1]) * node_count
+        visited = bytearray(node_count)
+        distances[source_id] = 0
+        steps.record_ids(source_id, 0)
+
+        priority_queue = [(0, source_id)]
+        while priority_queue:
+            currentDist, currentNode = heappop(priority_queue)
+            if visited[currentNode]:
+                continue
+            visited[currentNode] = 1
+            steps.settle_id(currentNode)
+
+            for i in range(offsets[currentNode], offsets[currentNode + 1]):
+                neighbor = targets[i]
+                temporary_distance = currentDist + weights[i]
+                if temporary_distance < distances[neighbor]:
+                    distances[neighbor] = temporary_distance
+                    predecessors[neighbor] = currentNode
+                    heappush(priority_queue, (temporary_distance, neighbor))
+                    steps.record_ids(neighbor, temporary_distance, currentNode, currentNode)
+            yield currentNode
+
+        distances = NodeArrayView(self, distances)
+        predecessors = NodeArrayView(self, predecessors, as_name=True)
+        if self.version == version:
+            self.remember_tree(source, distances, predecessors)
+        return distances, predecessors
+
+    def astar_ids(self, source_id, target_id, estimate, record_steps=False, progress=None):
+        # A* over node ids, estimate(node_id) is the lower bound of the distance left to target_id. Returns the
+        # raw distance and predecessor arrays and the step log (or None), see Graph.astar
+        self.freeze()
+        node_count = len(self.names)
+        offsets, targets, weights = self.offsets, self.targets, self.weights
+
+        distances = array('d', [INF]) * node_count
+        predecessors = array('l', [-1]) * node_count
+        steps = StepLog(names=self.names, ids=self.ids) if record_steps else None
+
+        distances[source_id] = 0
+        if record_steps:
+            steps.record_ids(source_id, 0)
+
+        priority_queue = [(estimate(source_id), 0, source_id)]
+        settled = 0
+        while priority_queue:
+            _, currentDist, currentNode = heappop(priority_queue)
+            if currentDist > distances[currentNode]:
+                continue
+            if record_steps:
+                steps.settle_id(currentNode)
+            if progress is not None:
+                settled += 1
+                if not settled % PROGRESS_INTERVAL:
+                    progress(settled, node_count)
+            if currentNode == target_id:
+                break
+
+            for i in range(offsets[currentNode], offsets[currentNode + 1]):
+                neighbor = targets[i]
+                temporary_distance = currentDist + weights[i]
+                if temporary_distance < distances[neighbor]:
+                    distances[neighbor] = temporary_distance
+                    predecessors[neighbor] = currentNode
+                    if record_steps:
+                        steps.record_ids(neighbor, temporary_distance, currentNode, currentNode)
+                    remaining = estimate(neighbor)
+                    if remaining != INF:
+                        heappush(priority_queue, (temporary_distance + remaining, temporary_distance, neighbor))
+
+        return distances, predecessors, steps
+
+    def astar(self, source: str, target: str, heuristic=None, record_steps=True, progress=None):
+        # Same contract as Graph.astar. A LandmarkIndex is asked for its bounds by node id directly
+        source_id, target_id = self.ids[source], self.ids[target]
+        if heuristic is None:
+            estimate = lambda node_id: 0
+        elif hasattr(heuristic, "bound_ids") and heuristic.node_count == len(self.names):
+            estimate = heuristic.bound_ids(target_id)
+        else:
+            names = self.names
+            estimate = lambda node_id: heuristic(names[node_id], target)
+        distances, predecessors, steps = self.astar_ids(source_id, target_id, estimate, record_steps, progress)
+        return NodeArrayView(self, distances), NodeArrayView(self, predecessors, as_name=True), steps
+
+    def bidirectional_dijkstra(self, source: str, target: str):
+        if source == target:
+            return 0, [source]
+        self.freeze()
+        source_id, target_id = self.ids[source], self.ids[target]
+
+        node_count = len(self.names)
+        distances = (array('d', [INF]) * node_count, array('d', [INF]) * node_count)
+        predecessors = (array('l', [-1]) * node_count, array('l', [-1]) * node_count)
+        settled = (bytearray(node_count), bytearray(node_count))
+        adjacency = ((self.offsets, self.targets, self.weights), (self.rev_offsets, self.rev_sources, self.rev_weights))
+        distances[0][source_id] = 0
+        distances[1][target_id] = 0
+        queues = ([(0, source_id)], [(0, target_id)])
+
+        best, meeting_node = INF, -1
+        while queues[0] and queues[1]:
+            if queues[0][0][0] + queues[1][0][0] >= best:
+                break
+            side = 0 if len(queues[0]) <= len(queues[1]) else 1
+            currentDist, currentNode = heappop(queues[side])
+            if settled[side][currentNode]:
+                continue
+            settled[side][currentNode] = 1
+
+            own, other = distances[side], distances[1 - side]
+            offsets, targets, weights = adjacency[side]
+            for i in range(offsets[currentNode], offsets[currentNode + 1]):
+                neighbor = targets[i]
+                temporary_distance = currentDist + weights[i]
+                if temporary_distance < own[neighbor]:
+                    own[neighbor] = temporary_distance
+                    predecessors[side][neighbor] = currentNode
+                    heappush(queues[side], (temporary_distance, neighbor))
+                if temporary_distance + other[neighbor] < best:
+                    best = temporary_distance + other[neighbor]
+                    meeting_node = neighbor
+
+        if meeting_node < 0:
+            return INF, []
+
+        path = []
+        current_node = meeting_node
+        while current_node >= 0:
+            path.append(current_node)
+            current_node = predecessors[0][current_node]
+        path.reverse()
+        current_node = predecessors[1][meeting_node]
+        while current_node >= 0:
+            path.append(current_node)
+            current_node = predecessors[1][current_node]
+        return best, [self.names[node_id] for node_id in path]
+
+
+def _build_csr(node_count, sources, destinations, weights, deduplicate):
+    # Counting sort of the edges by source node. The sort is stable, so with deduplicate only the last of
+    # several edges between the same pair of nodes is kept
+    offsets = array('l', [0]) * (node_count + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for node_id in range(node_count):
+        offsets[node_id + 1] += offsets[node_id]
+
+    sorted_targets = array('l', [0]) * len(sources)
+    sorted_weights = array('d', [0.0]) * len(sources)
+    position = offsets[:-1]
+    for source, destination, weight in zip(sources, destinations, weights):
+        i = position[source]
+        sorted_targets[i] = destination
+        sorted_weights[i] = weight
+        position[source] = i + 1
+
+    if not deduplicate:
+        return offsets, sorted_targets, sorted_weights
+
+    # Rows are usually short, so duplicates are looked for row by row and rows without any are copied as is
+    kept_targets, kept_weights = array('l'), array('d')
+    kept_offsets = array('l', [0])
+    for node_id in range(node_count):
+        start, end = offsets[node_id], offsets[node_id + 1]
+        row = sorted_targets[start:end]
+        if len(set(row)) == len(row):
+            kept_targets.extend(row)
+            kept_weights.extend(sorted_weights[start:end])
+        else:
+            last = {}
+            for i in range(start, end):
+                last[sorted_targets[i]] = sorted_weights[i]  # Later edges overwrite earlier ones
+            kept_targets.extend(last.keys())
+            kept_weights.extend(last.values())
+        kept_offsets.append(len(kept_targets))
+    return kept_offsets, kept_targets, kept_weights
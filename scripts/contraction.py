@@ -0,0 +1,294 @@
+import random
+import sys
+import time
+from array import array  # Upward and downward CSR graphs of the hierarchy
+from heapq import heappop, heappush  # Import functions to work with a priority queue
+
+from compact_graph import CompactGraph
+from generators import road_like
+
+INF = float("inf")
+WITNESS_SETTLE_LIMIT = 60  # Nodes a witness search may settle before the shortcut is added anyway
+
+
+class ContractionHierarchy:
+    # Contraction hierarchy (CH) index for fast point-to-point queries.
+    # Nodes are contracted one by one in order of importance. Contracting v removes it from the graph and adds a
+    # shortcut u -> w for every path u -> v -> w that was the only shortest way from u to w. Afterwards every
+    # shortest path can be found by searching only "upwards" (towards nodes contracted later) from both ends.
+    # The index is two CSR graphs over node ids:
+    #   up    edges v -> w with rank[w] > rank[v], searched forward from the source
+    #   down  edges u -> v with rank[u] > rank[v], stored by v and searched backward from the target
+    # Every edge carries the contracted node it skips (middle, -1 for an original edge) so paths can be unpacked.
+    def __init__(self, names, ids, rank, up, down, version=0):
+        self.names = names  # Node id -> name
+        self.ids = ids  # Name -> node id
+        self.rank = rank  # Node id -> position in the contraction order
+        self.up_offsets, self.up_targets, self.up_weights, self.up_middles = up
+        self.down_offsets, self.down_sources, self.down_weights, self.down_middles = down
+        self.version = version  # Graph version the index was built for
+
+    @classmethod
+    def build(cls, graph, settle_limit=WITNESS_SETTLE_LIMIT):
+        compact = graph if isinstance(graph, CompactGraph) else CompactGraph.from_graph(graph)
+        compact.freeze()
+        node_count = len(compact.names)
+
+        # Remaining graph while contracting: node -> {neighbor: (weight, middle)}
+        out_edges = [{} for _ in range(node_count)]
+        in_edges = [{} for _ in range(node_count)]
+        for node_id in range(node_count):
+            for i in range(compact.offsets[node_id], compact.offsets[node_id + 1]):
+                target, weight = compact.targets[i], compact.weights[i]
+                if target != node_id:  # Self loops are never part of a shortest path
+                    out_edges[node_id][target] = (weight, -1)
+                    in_edges[target][node_id] = (weight, -1)
+
+        contracted_neighbors = [0] * node_count
+        rank = array('l', [0]) * node_count
+        up_rows, down_rows = [None] * node_count, [None] * node_count
+
+        # Importance = edge difference (shortcuts added minus edges removed) plus contracted neighbors, which
+        # spreads the contraction evenly over the graph. Priorities are updated lazily when popped
+        def importance(node_id):
+            shortcuts = _shortcuts(node_id, out_edges, in_edges, settle_limit)
+            return len(shortcuts) - len(out_edges[node_id]) - len(in_edges[node_id]) + contracted_neighbors[node_id]
+
+        queue = [(importance(node_id), node_id) for node_id in range(node_count)]
+        queue.sort()
+        order = 0
+        while queue:
+            _, node_id = heappop(queue)
+            priority = importance(node_id)
+            if queue and priority > queue[0][0]:
+                heappush(queue, (priority, node_id))  # Got more important since it was queued, try again later
+                continue
+
+            rank[node_id] = order
+            order += 1
+            for source, target, distance in _shortcuts(node_id, out_edges, in_edges, settle_limit):
+                current = out_edges[source].get(target)
+                if current is None or distance < current[0]:
+                    out_edges[source][target] = (distance, node_id)
+                    in_edges[target][source] = (distance, node_id)
+
+            # Every remaining neighbor is contracted later, so the edges to them are the node's upward edges
+            up_rows[node_id] = list(out_edges[node_id].items())
+            down_rows[node_id] = list(in_edges[node_id].items())
+            for target in out_edges[node_id]:
+                del in_edges[target][node_id]
+                contracted_neighbors[target] += 1
+            for source in in_edges[node_id]:
+                del out_edges[source][node_id]
+                contracted_neighbors[source] += 1
+            out_edges[node_id], in_edges[node_id] = {}, {}
+
+        ids = compact.ids if graph is compact else {name: node_id for node_id, name in enumerate(compact.names)}
+        return cls(compact.names, ids, rank, _pack(up_rows), _pack(down_rows), graph.version)
+
+    def rebind(self, graph):
+        # The same index for another graph with the same node ids, for example a converted copy
+        return ContractionHierarchy(graph.names, graph.ids, self.rank,
+                                    (self.up_offsets, self.up_targets, self.up_weights, self.up_middles),
+                                    (self.down_offsets, self.down_sources, self.down_weights, self.down_middles),
+                                    graph.version)
+
+    @property
+    def shortcut_count(self):
+        return sum(1 for middle in self.up_middles if middle >= 0) + sum(1 for middle in self.down_middles if middle >= 0)
+
+    @property
+    def size(self):
+        # Bytes taken by the index arrays
+        arrays = (self.rank, self.up_offsets, self.up_targets, self.up_weights, self.up_middles,
+                  self.down_offsets, self.down_sources, self.down_weights, self.down_middles)
+        return sum(len(values) * values.itemsize for values in arrays)
+
+    def query_ids(self, source_id, target_id):
+        # Bidirectional upward search, returns (distance, node id path) with an empty path if unreachable
+        if source_id == target_id:
+            return 0, [source_id]
+        distances = ({source_id: 0}, {target_id: 0})
+        predecessors = ({source_id: -1}, {target_id: -1})
+        queues = ([(0, source_id)], [(0, target_id)])
+        adjacency = ((self.up_offsets, self.up_targets, self.up_weights),
+                     (self.down_offsets, self.down_sources, self.down_weights))
+
+        best, meeting_node = INF, -1
+        side = 0
+        while queues[0] or queues[1]:
+            # Unlike plain bidirectional Dijkstra both sides have to run until their frontier passes best,
+            # the two upward searches usually meet at the most important node of the path
+            if not queues[side] or queues[side][0][0] >= best:
+                side = 1 - side
+                if not queues[side] or queues[side][0][0] >= best:
+                    break
+            currentDist, currentNode = heappop(queues[side])
+            own = distances[side]
+            if currentDist > own[currentNode]:
+                continue
+            other_distance = distances[1 - side].get(currentNode)
+            if other_distance is not None and currentDist + other_distance < best:
+                best, meeting_node = currentDist + other_distance, currentNode
+
+            offsets, targets, weights = adjacency[side]
+            for i in range(offsets[currentNode], offsets[currentNode + 1]):
+                neighbor = targets[i]
+                temporary_distance = currentDist + weights[i]
+                if temporary_distance < own.get(neighbor, INF):
+                    own[neighbor] = temporary_distance
+                    predecessors[side][neighbor] = currentNode
+                    heappush(queues[side], (temporary_distance, neighbor))
+            side = 1 - side
+
+        if meeting_node < 0:
+            return INF, []
+
+        # Upward half from the source, then the downward half to the target, then every shortcut unpacked
+        upward = []
+        current_node = meeting_node
+        while current_node >= 0:
+            upward.append(current_node)
+            current_node = predecessors[0][current_node]
+        upward.reverse()
+        current_node = predecessors[1][meeting_node]
+        while current_node >= 0:
+            upward.append(current_node)
+            current_node = predecessors[1][current_node]
+
+        path = [upward[0]]
+        for from_id, to_id in zip(upward, upward[1:]):
+            self._unpack(from_id, to_id, path)
+        return best, path
+
+    def query(self, source, target):
+        # (distance, path of node names)
+        distance, path = self.query_ids(self.ids[source], self.ids[target])
+        return distance, [self.names[node_id] for node_id in path]
+
+    def _middle(self, from_id, to_id):
+        # Node skipped by the hierarchy edge from_id -> to_id, the edge is stored with its lower ranked end
+        if self.rank[from_id] < self.rank[to_id]:
+            offsets, ends, middles, row, end = self.up_offsets, self.up_targets, self.up_middles, from_id, to_id
+        else:
+            offsets, ends, middles, row, end = (self.down_offsets, self.down_sources, self.down_middles, to_id,
+                                                from_id)
+        for i in range(offsets[row], offsets[row + 1]):
+            if ends[i] == end:
+                return middles[i]
+        raise KeyError((from_id, to_id))
+
+    def _unpack(self, from_id, to_id, path):
+        # Append the original nodes of the edge from_id -> to_id (without from_id) to path. Iterative, shortcuts
+        # of large graphs can nest deeper than the recursion limit
+        stack = [(from_id, to_id)]
+        while stack:
+            from_id, to_id = stack.pop()
+            middle = self._middle(from_id, to_id)
+            if middle < 0:
+                path.append(to_id)
+            else:
+                stack.append((middle, to_id))
+                stack.append((from_id, middle))
+
+
+def _shortcuts(node_id, out_edges, in_edges, settle_limit):
+    # Shortcuts contracting node_id would need as (u, w, length): every in-neighbor u and out-neighbor w for which
+    # no witness path u -> w avoiding node_id is at most as short as u -> node_id -> w
+    shortcuts = []
+    outgoing = out_edges[node_id]
+    if not outgoing:
+        return shortcuts
+    longest_out = max(weight for weight, _ in outgoing.values())
+    for source, incoming in in_edges[node_id].items():
+        limit = incoming[0] + longest_out
+        witness = _witness_search(source, node_id, out_edges, limit, settle_limit)
+        for target, outgoing_edge in outgoing.items():
+            if target == source:
+                continue
+            distance = incoming[0] + outgoing_edge[0]
+            if witness.get(target, INF) > distance:
+                shortcuts.append((source, target, distance))
+    return shortcuts
+
+
+def _witness_search(source, skipped, out_edges, limit, settle_limit):
+    # Local Dijkstra from source that ignores the node being contracted. It stops at distance limit or after
+    # settle_limit nodes, a witness it did not find only costs an unnecessary shortcut
+    distances = {source: 0}
+    queue = [(0, source)]
+    settled = 0
+    while queue and settled < settle_limit:
+        currentDist, currentNode = heappop(queue)
+        if currentDist > distances[currentNode]:
+            continue
+        if currentDist > limit:
+            break
+        settled += 1
+        for neighbor, (weight, _) in out_edges[currentNode].items():
+            if neighbor == skipped:
+                continue
+            temporary_distance = currentDist + weight
+            if temporary_distance < distances.get(neighbor, INF):
+                distances[neighbor] = temporary_distance
+                heappush(queue, (temporary_distance, neighbor))
+    return distances
+
+
+def _pack(rows):
+    # Per-node [(neighbor, (weight, middle))] lists -> CSR arrays
+    offsets, ends, weights, middles = array('l', [0]), array('l'), array('d'), array('l')
+    for row in rows:
+        for end, (weight, middle) in row:
+            ends.append(end)
+            weights.append(weight)
+            middles.append(middle)
+        offsets.append(len(ends))
+    return offsets, ends, weights, middles
+
+
+def build_hierarchy(graph, settle_limit=WITNESS_SETTLE_LIMIT):
+    # Contract the graph and keep the index on it, where shortest_path picks it up and save() writes it into
+    # the snapshot
+    graph.hierarchy = ContractionHierarchy.build(graph, settle_limit)
+    return graph.hierarchy
+
+
+def benchmark(graph, queries=200, seed=1):
+    # Preprocessing time, index size and mean query latency of the hierarchy against plain Dijkstra
+    start = time.perf_counter()
+    hierarchy = ContractionHierarchy.build(graph)
+    preprocessing = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    names = graph.nodes()
+    pairs = [(rng.choice(names), rng.choice(names)) for _ in range(queries)]
+
+    start = time.perf_counter()
+    for source, target in pairs:
+        hierarchy.query(source, target)
+    ch_latency = (time.perf_counter() - start) / queries
+
+    start = time.perf_counter()
+    for source, target in pairs:
+        graph.dijkstra(source, target, stop_at_target=True, record_steps=False)
+    dijkstra_latency = (time.perf_counter() - start) / queries
+
+    return {"nodes": len(names), "edges": sum(1 for _ in graph.edges()), "preprocessing_s": preprocessing,
+            "shortcuts": hierarchy.shortcut_count, "index_bytes": hierarchy.size,
+            "query_ms": ch_latency * 1000, "dijkstra_query_ms": dijkstra_latency * 1000}
+
+
+if __name__ == '__main__':
+    # python contraction.py [input.dot | edge count], default is a road-like graph of about 13000 edges
+    argument = sys.argv[1] if len(sys.argv) > 1 else "13000"
+    benchmarked = CompactGraph()
+    if argument.isdigit():
+        for edge in road_like(int(argument)):
+            benchmarked.add_edge(*edge)
+    else:
+        with open(argument, "rb") as dot_file:
+            benchmarked.load_dot(dot_file)
+    benchmarked.freeze()
+    for key, value in benchmark(benchmarked).items():
+        print(f"{key:>18}  {value:.3f}" if isinstance(value, float) else f"{key:>18}  {value}")
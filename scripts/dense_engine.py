@@ -0,0 +1,145 @@
+import numpy as np  # Vectorized relaxations
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as sparse_dijkstra
+except ImportError:  # SciPy is optional, sparse graphs then fall back to the heap based Graph.dijkstra
+    csr_matrix = None
+
+# Graphs with at least this fraction of all possible edges use the dense engines
+DENSE_THRESHOLD = 0.1
+# Dense matrices above this many nodes take too much memory (V * V floats), those use the sparse engines
+DENSE_MAX_NODES = 4000
+
+
+def to_matrix(graph):
+    # Dense adjacency matrix of any Graph, inf where there is no edge. Returns (node names, matrix)
+    names = graph.nodes()
+    ids = {name: node_id for node_id, name in enumerate(names)}
+    matrix = np.full((len(names), len(names)), np.inf)
+    for from_node, to_node, weight in graph.edges():
+        matrix[ids[from_node], ids[to_node]] = weight
+    return names, matrix
+
+
+def to_sparse(graph):
+    # SciPy CSR adjacency matrix of any Graph. Zero weights are stored explicitly, so they stay edges
+    if csr_matrix is None:
+        raise ImportError("to_sparse needs SciPy")
+    names = graph.nodes()
+    ids = {name: node_id for node_id, name in enumerate(names)}
+    rows, columns, weights = [], [], []
+    for from_node, to_node, weight in graph.edges():
+        rows.append(ids[from_node])
+        columns.append(ids[to_node])
+        weights.append(weight)
+    return names, csr_matrix((weights, (rows, columns)), shape=(len(names), len(names)))
+
+
+def density(graph):
+    node_count = graph.node_count()
+    if node_count == 0:
+        return 0.0
+    return graph.edge_count() / (node_count * node_count)
+
+
+def choose_engine(graph):
+    # "dense" for small dense graphs, "sparse" (SciPy) or "heap" (Graph.dijkstra) otherwise
+    if graph.node_count() <= DENSE_MAX_NODES and density(graph) >= DENSE_THRESHOLD:
+        return "dense"
+    return "sparse" if csr_matrix is not None else "heap"
+
+
+def dense_dijkstra(matrix, source_id):
+    # O(V^2) array Dijkstra: every iteration settles the closest node with one argmin and relaxes its whole
+    # matrix row at once. Returns distance and predecessor arrays (-1 for no predecessor)
+    node_count = len(matrix)
+    distances = np.full(node_count, np.inf)
+    predecessors = np.full(node_count, -1)
+    settled = np.zeros(node_count, dtype=bool)
+    distances[source_id] = 0
+    for _ in range(node_count):
+        current = int(np.argmin(np.where(settled, np.inf, distances)))
+        if settled[current] or distances[current] == np.inf:
+            break  # Everything still unsettled is unreachable
+        settled[current] = True
+        candidates = distances[current] + matrix[current]
+        better = (candidates < distances) & ~settled
+        distances[better] = candidates[better]
+        predecessors[better] = current
+    return distances, predecessors
+
+
+def floyd_warshall(matrix):
+    # All pairs distances and predecessors. Every k is one vectorized min-plus rank-1 update of the whole
+    # distance matrix. predecessors[i, j] is the node before j on the shortest path from i (-1 for none)
+    node_count = len(matrix)
+    distances = matrix.copy()
+    np.fill_diagonal(distances, np.minimum(np.diagonal(distances), 0))
+    predecessors = np.where(np.isfinite(matrix), np.arange(node_count)[:, None], -1)
+    np.fill_diagonal(predecessors, -1)
+    candidates = np.empty_like(distances)
+    better = np.empty(distances.shape, dtype=bool)
+    for k in range(node_count):
+        # In place, the matrices are V x V and a fresh copy per k would dominate the run time
+        np.add(distances[:, k, None], distances[k], out=candidates)
+        np.less(candidates, distances, out=better)
+        if better.any():
+            np.copyto(predecessors, predecessors[k], where=better)
+            np.minimum(distances, candidates, out=distances)
+    return distances, predecessors
+
+
+def _as_dicts(names, distances, predecessors):
+    # Same (distances, predecessors) shape Graph.dijkstra returns
+    distance_dict = {name: float(distance) for name, distance in zip(names, distances)}
+    predecessor_dict = {name: names[predecessor] if predecessor >= 0 else None
+                        for name, predecessor in zip(names, predecessors)}
+    return distance_dict, predecessor_dict
+
+
+def single_source(graph, source, engine="auto"):
+    # Distances and predecessors from one source with the engine picked by density (or the one asked for).
+    # The result is remembered by the graph, so graph.shortest_path(source, ...) is answered from it
+    if engine == "auto":
+        engine = choose_engine(graph)
+    if engine == "heap":
+        distances, predecessors, _ = graph.dijkstra(source, None, record_steps=False)
+        return distances, predecessors
+
+    if engine == "dense":
+        names, matrix = graph.cached_export(to_matrix)
+        distance_array, predecessor_array = dense_dijkstra(matrix, names.index(source))
+    elif engine == "sparse":
+        names, matrix = graph.cached_export(to_sparse)
+        distance_array, predecessor_array = sparse_dijkstra(matrix, indices=names.index(source),
+                                                            return_predecessors=True)
+    else:
+        raise ValueError(f"Unknown engine {engine!r}")
+
+    distances, predecessors = _as_dicts(names, distance_array, predecessor_array)
+    graph.remember_tree(source, distances, predecessors)
+    return distances, predecessors
+
+
+def all_pairs(graph, engine="auto"):
+    # {source: (distances, predecessors)} for every node, Floyd-Warshall on dense graphs and one SciPy (or heap)
+    # search per source otherwise
+    if engine == "auto":
+        engine = choose_engine(graph)
+    if engine == "dense":
+        names, matrix = graph.cached_export(to_matrix)
+        distance_matrix, predecessor_matrix = floyd_warshall(matrix)
+    elif engine == "sparse":
+        names, matrix = graph.cached_export(to_sparse)
+        distance_matrix, predecessor_matrix = sparse_dijkstra(matrix, return_predecessors=True)
+    elif engine == "heap":
+        return {source: single_source(graph, source, "heap") for source in graph.nodes()}
+    else:
+        raise ValueError(f"Unknown engine {engine!r}")
+
+    results = {}
+    for source_id, source in enumerate(names):
+        results[source] = _as_dicts(names, distance_matrix[source_id], predecessor_matrix[source_id])
+        graph.remember_tree(source, *results[source])
+    return results
@@ -1,41 +1,133 @@
-import re  # Import the regular expression module to parse the DOT string
+from dot_parser import iter_dot  # Streaming DOT parser
 from heapq import heapify, heappop, heappush  # Import functions to work with a priority queue
+from step_log import PROGRESS_INTERVAL, LazyStepLog, StepLog  # Compact delta log of the algorithm steps
+
+PATH_CACHE_SIZE = 1024  # How many (source, target) paths a graph remembers
+TREE_CACHE_SIZE = 16  # How many single-source shortest path trees a graph remembers
 
 
 class Graph:
     def __init__(self):
         self.graph = {}  # Initialize an empty dictionary to store the graph
+        self.reverse = {}  # Incoming edges of every node, used by the backward half of bidirectional search
+        self.layout = None  # Node name -> (x, y) layout coordinates, saved and loaded with snapshots
+        self.landmarks = None  # LandmarkIndex for A* queries, saved and loaded with snapshots
+        self.hierarchy = None  # ContractionHierarchy for point-to-point queries, saved and loaded with snapshots
+        self._edge_count = 0
+
+        # Query caches, only valid for the version of the graph they were computed on
+        self.version = 0  # Bumped on every change of the graph
+        self._paths = {}  # (source, target, version) -> path
+        self._trees = {}  # (source, version) -> (distances, predecessors) of a complete search
+        self._exports = {}  # (export function, version) -> matrix export, see dense_engine.py
+
+    def _changed(self):
+        # Any edit makes every cached answer stale
+        self.version += 1
+        if self._paths or self._trees or self._exports:
+            self._paths.clear()
+            self._trees.clear()
+            self._exports.clear()
+
+    def cached_export(self, export):
+        # export(self), computed once per version of the graph
+        key = (export, self.version)
+        result = self._exports.get(key)
+        if result is None:
+            result = self._exports[key] = export(self)
+        return result
 
     def add_edge(self, from_, to_, weight):
         # If the 'from_' node is not in the graph, add it with an empty dictionary
         if from_ not in self.graph:
             self.graph[from_] = {}
+            self.reverse[from_] = {}
+        # Nodes without outgoing edges still get an entry so every search can look them up
+        if to_ not in self.graph:
+            self.graph[to_] = {}
+            self.reverse[to_] = {}
         # Add the edge from 'from_' to 'to_' with the specified 'weight'
+        if to_ not in self.graph[from_]:
+            self._edge_count += 1
         self.graph[from_][to_] = weight
-        # No reverse edge is added because the graph is directed
+        # No reverse edge is added because the graph is directed, only the reverse index is updated
+        self.reverse[to_][from_] = weight
+        self._changed()
+
+    def remove_edge(self, from_, to_):
+        # Raises KeyError if there is no such edge, the nodes themselves stay in the graph
+        del self.graph[from_][to_]
+        del self.reverse[to_][from_]
+        self._edge_count -= 1
+        self._changed()
+
+    def add_node(self, node):
+        # Declare a node that may have no edges at all
+        if node not in self.graph:
+            self.graph[node] = {}
+            self.reverse[node] = {}
+            self._changed()
+
+    def nodes(self):
+        return list(self.graph)
+
+    def node_count(self):
+        return len(self.graph)
+
+    def edge_count(self):
+        return self._edge_count
+
+    def edges(self):
+        # Every edge as a (from, to, weight) tuple
+        for from_node, neighbors in self.graph.items():
+            for to_node, weight in neighbors.items():
+                yield from_node, to_node, weight
 
     def from_dot_string(self, dot_string):
-        # Define a regular expression to match the DOT format for edges with weights
-        edge_pattern = re.compile(r'(\w+)\s*->\s*(\w+)\s*\[weight=(\d+(\.\d+)?)\];')
-        # Loop through all matches of the regex in the DOT string
-        for match in edge_pattern.finditer(dot_string):
-            # Extract the 'from_node', 'to_node', and 'weight' from the match
-            from_node, to_node, weight = match.group(1), match.group(2), float(match.group(3))
-            # Add the edge to the graph
-            self.add_edge(from_node, to_node, weight)
-
-    def dijkstra(self, source: str, target: str):
-        steps = []
+        self.load_dot(dot_string)
+
+    def load_dot(self, source):
+        # Add every node and edge of a DOT string, text or binary file object or mmap. The input is parsed in
+        # chunks and fed straight into the graph, so no edge list is ever built
+        for from_node, to_node, weight in iter_dot(source):
+            if to_node is None:
+                self.add_node(from_node)
+            else:
+                self.add_edge(from_node, to_node, weight)
+
+    def save(self, path):
+        # Write the graph as a binary snapshot (see snapshot.py)
+        from snapshot import save_snapshot
+        save_snapshot(self, path)
+
+    @staticmethod
+    def load(path):
+        # Open a binary snapshot, the result is a CompactGraph backed by the mapped file
+        from snapshot import load_snapshot
+        return load_snapshot(path)
+
+    def track(self, source):
+        # Shortest path tree from source that is repaired instead of recomputed when edges change,
+        # see dynamic_paths.py
+        from dynamic_paths import DynamicShortestPaths
+        return DynamicShortestPaths(self, source)
+
+    def dijkstra(self, source: str, target: str, stop_at_target=False, record_steps=True, progress=None):
+        # With stop_at_target the search ends as soon as the target is settled, distances of nodes that were
+        # not settled by then are only upper bounds. Without record_steps no step log is built and None is
+        # returned in its place, which is the fast path for plain point-to-point queries.
+        # progress(settled, node_count) is called every PROGRESS_INTERVAL settled nodes, an exception raised by
+        # it aborts the search (see worker.py)
+        # Step 0 of the log is the initialization, every node at infinity
+        steps = StepLog(node_count=len(self.graph)) if record_steps else None
 
         # Initialize the distances for all nodes as infinity
         distances = {node: float("inf") for node in self.graph}
-
-        # Set the 0th step as initialization
-        steps.append({node: float("inf") for node in self.graph})
         distances[source] = 0  # Set the distance to the source node as 0
 
         # Set the value of source node to 0
-        steps.append({source: 0})
+        if record_steps:
+            steps.record(source, 0)
 
         priority_queue = [(0, source)]  # Initialize the priority queue with the source node
         heapify(priority_queue)  # Heapify the priority queue to make it a valid min-heap
@@ -50,6 +142,13 @@ class Graph:
             if currentNode in visited:
                 continue  # Skip the node if it has already been visited
             visited.add(currentNode)  # Mark the node as visited
+            if record_steps:
+                steps.settle(currentNode)
+            if progress is not None and not len(visited) % PROGRESS_INTERVAL:
+                progress(len(visited), len(self.graph))
+
+            if stop_at_target and currentNode == target:
+                break  # The target's distance is final once it is popped
 
             # For each neighbor of the current node
             for neighbor, weight in self.graph[currentNode].items():
@@ -61,10 +160,9 @@ class Graph:
                     # Update the distance for the neighbor
                     distances[neighbor] = temporary_distance
 
-                    # Create a new snapshot for the current step
-                    new_step = steps[-1].copy()  # Copy the previous step
-                    new_step[neighbor] = temporary_distance  # Update the modified variable (neighbor's distance)
-                    steps.append(new_step)  # Append the new step
+                    # Record only what changed in this step instead of copying the whole previous step
+                    if record_steps:
+                        steps.record(neighbor, temporary_distance, currentNode, currentNode)
 
                     # Push the neighbor into the priority queue with the updated distance
                     heappush(priority_queue, (temporary_distance, neighbor))
@@ -72,26 +170,201 @@ class Graph:
                     # Update the predecessor
                     predecessors[neighbor] = currentNode
 
+        if not stop_at_target:
+            # A complete search answers the path to every target from this source, keep it for shortest_path
+            self.remember_tree(source, distances, predecessors)
+
         return distances, predecessors, steps  # Return both the distances and the predecessors
 
-    def shortest_path(self, source: str, target: str):
-        # Call dijkstra to get distances and predecessors from the source node
-        distances, predecessors, _ = self.dijkstra(source, target)
+    def dijkstra_lazy(self, source: str):
+        # Complete search from source that only runs as far as its steps are looked at: returns a LazyStepLog
+        # at step 0, which resumes the search whenever a later step is asked for. Nothing is computed up front,
+        # so the first step is there at once however big the graph is. The finished search is remembered for
+        # shortest_path like a dijkstra run
+        steps = LazyStepLog(node_count=len(self.graph))
+        steps.search = self._dijkstra_steps(source, steps)
+        return steps
+
+    def _dijkstra_steps(self, source, steps):
+        # The generator behind dijkstra_lazy, dijkstra recording into steps and yielding after every settled
+        # node. Unreached nodes are left out of the dicts until the end, instead of a pass over the whole graph
+        version = self.version
+        distances = {source: 0}
+        predecessors = {source: None}
+        steps.record(source, 0)
+
+        priority_queue = [(0, source)]
+        visited = set()
+        infinity = float("inf")
+        while priority_queue:
+            currentDist, currentNode = heappop(priority_queue)
+            if currentNode in visited:
+                continue
+            visited.add(currentNode)
+            steps.settle(currentNode)
+
+            for neighbor, weight in self.graph[currentNode].items():
+                temporary_distance = currentDist + weight
+                if temporary_distance < distances.get(neighbor, infinity):
+                    distances[neighbor] = temporary_distance
+                    steps.record(neighbor, temporary_distance, currentNode, currentNode)
+                    heappush(priority_queue, (temporary_distance, neighbor))
+                    predecessors[neighbor] = currentNode
+            yield currentNode
+
+        for node in self.graph:
+            distances.setdefault(node, infinity)
+            predecessors.setdefault(node, None)
+        if self.version == version:  # Not edited while the steps were being looked at
+            self.remember_tree(source, distances, predecessors)
+        return distances, predecessors
 
-        # If the target is unreachable, return an empty path
-        if distances[target] == float('inf'):
-            return []
+    def astar(self, source: str, target: str, heuristic=None, record_steps=True, progress=None):
+        # Goal directed point-to-point search. heuristic(node, target) must never overestimate the remaining
+        # distance, a LandmarkIndex is one such heuristic, without one this is Dijkstra stopping at the target.
+        # Returns (distances, predecessors, steps) like dijkstra(stop_at_target=True), the step log replays the
+        # A* run and steps.settled tells how many nodes it had to settle. progress as in dijkstra
+        if heuristic is None:
+            estimate = lambda node: 0
+        elif hasattr(heuristic, "bound"):
+            estimate = heuristic.bound(target)  # Lets the heuristic prepare everything that depends on the target
+        else:
+            estimate = lambda node: heuristic(node, target)
 
+        steps = StepLog(node_count=len(self.graph)) if record_steps else None
+        distances = {node: float("inf") for node in self.graph}
+        predecessors = {node: None for node in self.graph}
+        distances[source] = 0
+        if record_steps:
+            steps.record(source, 0)
+
+        # Ordered by distance plus estimate. A node can be settled again if the heuristic is not consistent,
+        # so stale entries are recognized by their distance instead of a visited set
+        priority_queue = [(estimate(source), 0, source)]
+        settled = 0
+        while priority_queue:
+            _, currentDist, currentNode = heappop(priority_queue)
+            if currentDist > distances[currentNode]:
+                continue
+            if record_steps:
+                steps.settle(currentNode)
+            if progress is not None:
+                settled += 1
+                if not settled % PROGRESS_INTERVAL:
+                    progress(settled, len(self.graph))
+            if currentNode == target:
+                break
+
+            for neighbor, weight in self.graph[currentNode].items():
+                temporary_distance = currentDist + weight
+                if temporary_distance < distances[neighbor]:
+                    distances[neighbor] = temporary_distance
+                    predecessors[neighbor] = currentNode
+                    if record_steps:
+                        steps.record(neighbor, temporary_distance, currentNode, currentNode)
+                    remaining = estimate(neighbor)
+                    if remaining != float("inf"):  # The target can not be reached through this node
+                        heappush(priority_queue, (temporary_distance + remaining, temporary_distance, neighbor))
+
+        return distances, predecessors, steps
+
+    def remember_tree(self, source, distances, predecessors):
+        # Store a complete single-source result so later queries from the same source need no search
+        if len(self._trees) >= TREE_CACHE_SIZE:
+            del self._trees[next(iter(self._trees))]  # Forget the oldest tree
+        self._trees[(source, self.version)] = (distances, predecessors)
+
+    def bidirectional_dijkstra(self, source: str, target: str):
+        # Point-to-point search growing one tree forward from the source and one backward from the target
+        # over the reverse index, returns (distance, path) with an empty path if the target is unreachable
+        if source == target:
+            return 0, [source]
+
+        inf = float("inf")
+        distances = ({source: 0}, {target: 0})  # Forward and backward tentative distances
+        predecessors = ({source: None}, {target: None})  # Forward predecessors and backward successors
+        queues = ([(0, source)], [(0, target)])
+        settled = (set(), set())
+        adjacency = (self.graph, self.reverse)
+
+        best, meeting_node = inf, None  # Length of the best connection found so far and where the trees meet
+        while queues[0] and queues[1]:
+            # Once the two frontiers together can not beat the best connection it is the shortest path
+            if queues[0][0][0] + queues[1][0][0] >= best:
+                break
+
+            # Expand the side with the smaller frontier
+            side = 0 if len(queues[0]) <= len(queues[1]) else 1
+            currentDist, currentNode = heappop(queues[side])
+            if currentNode in settled[side]:
+                continue
+            settled[side].add(currentNode)
+
+            own, other = distances[side], distances[1 - side]
+            for neighbor, weight in adjacency[side][currentNode].items():
+                temporary_distance = currentDist + weight
+                if temporary_distance < own.get(neighbor, inf):
+                    own[neighbor] = temporary_distance
+                    predecessors[side][neighbor] = currentNode
+                    heappush(queues[side], (temporary_distance, neighbor))
+                # Every edge that touches the other tree is a candidate connection
+                if neighbor in other and temporary_distance + other[neighbor] < best:
+                    best = temporary_distance + other[neighbor]
+                    meeting_node = neighbor
+
+        if meeting_node is None:
+            return inf, []
+
+        # Forward half from the source to the meeting node, backward half from it to the target
+        path = self._backtrack(predecessors[0], source, meeting_node)
+        current_node = predecessors[1][meeting_node]
+        while current_node is not None:
+            path.append(current_node)
+            current_node = predecessors[1][current_node]
+        return best, path
+
+    def _backtrack(self, predecessors, source, target):
         path = []  # Initialize an empty list to store the path
         current_node = target  # Start from the target node
 
         # Backtrack from the target node using the predecessors dictionary
-        while current_node:
+        while current_node is not None:
             path.append(current_node)  # Add the current node to the path
-            current_node = predecessors[current_node]  # Move to the predecessor node
             if current_node == source:
-                path.append(source)  # Add the source node and end the loop
                 break
+            current_node = predecessors[current_node]  # Move to the predecessor node
 
         path.reverse()  # Reverse the path to get it from source to target
-        return path  # Return the reversed path
+        return path
+
+    def shortest_path(self, source: str, target: str):
+        key = (source, target, self.version)
+        path = self._paths.get(key)
+        if path is None:
+            tree = self._trees.get((source, self.version))
+            if tree is None and self.hierarchy is not None and self.hierarchy.version == self.version:
+                # The contraction hierarchy answers with two small upward searches
+                _, path = self.hierarchy.query(source, target)
+            else:
+                if tree is not None:
+                    # A complete search from this source already ran, just walk its predecessors
+                    distances, predecessors = tree
+                elif self.landmarks is not None and self.landmarks.version == self.version:
+                    # Landmark lower bounds steer the search towards the target
+                    distances, predecessors, _ = self.astar(source, target, self.landmarks, record_steps=False)
+                else:
+                    # Only the path is needed here, so the search stops at the target and records no steps
+                    distances, predecessors, _ = self.dijkstra(source, target, stop_at_target=True,
+                                                               record_steps=False)
+
+                # If the target is unreachable, the path is empty
+                if distances[target] == float('inf'):
+                    path = []
+                else:
+                    path = self._backtrack(predecessors, source, target)
+
+            if len(self._paths) >= PATH_CACHE_SIZE:
+                del self._paths[next(iter(self._paths))]  # Forget the oldest path
+            self._paths[key] = path
+
+        return list(path)  # Return a copy so callers can not change the cached path
@@ -0,0 +1,226 @@
+import codecs  # Incremental decoding of byte chunks (binary files, mmap)
+import re  # Import the regular expression module to tokenize the DOT input
+
+CHUNK_SIZE = 1 << 16  # Characters (or bytes) read from a file per refill
+
+# One DOT token per match, leading whitespace included. The plain "A -- B [weight=3];" statement that makes up
+# almost every line of our inputs is matched as a single token, everything else goes through the generic tokens.
+# Edge operators are tried before numbers so "--" is never read as a negative number
+TOKEN_PATTERN = re.compile(r'''
+    \s*(?:
+      (?P<edge>([^\W\d]\w*|\d+)\s*(?:--|->)\s*([^\W\d]\w*|\d+)
+               \s*\[\s*weight\s*=\s*"?(-?(?:\.\d+|\d+(?:\.\d*)?))"?\s*\]\s*;)
+    | (?P<comment>//[^\n]*\n|\#[^\n]*\n|/\*.*?\*/)
+    | (?P<edgeop>--|->)
+    | (?P<id>[^\W\d]\w*|-?(?:\.\d+|\d+(?:\.\d*)?))
+    | (?P<string>"(?:[^"\\]|\\.)*")
+    | (?P<punct>[\[\]{};,=:])
+    | (?P<space>\Z)
+    )
+''', re.VERBOSE | re.DOTALL)
+
+# Line comments at the very end of the input have no newline to end them. Tokens include their leading
+# whitespace, so the whitespace before the comment is still unread when this is tried
+TRAILING_COMMENT = re.compile(r'\s*(?://|#)[^\n]*\Z')
+
+KEYWORDS = {"graph", "digraph", "subgraph", "strict", "node", "edge"}
+
+
+def _weight(text):
+    # Weights are parsed signed so the error can name them, Dijkstra's algorithm gives wrong answers for
+    # negative ones
+    weight = float(text)
+    if not weight >= 0:
+        raise ValueError(f"Edge weights must not be negative, got weight={text}")
+    return weight
+
+
+def _members(item):
+    # Nodes of one chain entry, a node ID or a {B C} group
+    return item if isinstance(item, tuple) else (item,)
+
+
+def _chunks(source, chunk_size):
+    # Text chunks from a string, a text or binary file object, or an mmap
+    if isinstance(source, str):
+        yield source
+        return
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield bytes(source).decode("utf-8")
+        return
+    decoder = None
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            yield chunk
+        else:
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder("utf-8")()
+            yield decoder.decode(chunk)
+    if decoder is not None:
+        yield decoder.decode(b"", final=True)
+
+
+def iter_tokens(source, chunk_size=CHUNK_SIZE):
+    # Yield (kind, text) tokens, skipping whitespace and comments.
+    # Only the unconsumed tail of the previous chunk is kept, so memory stays flat for any input size
+    buffer = ""
+    chunks = _chunks(source, chunk_size)
+    eof = False
+    while not eof:
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+        else:
+            buffer += chunk
+
+        position, end = 0, len(buffer)
+        while position < end:
+            match = TOKEN_PATTERN.match(buffer, position)
+            # A token touching the end of the buffer may continue in the next chunk
+            if match is None or (match.end() == end and not eof):
+                if eof:
+                    comment = TRAILING_COMMENT.match(buffer, position)
+                    if comment is not None:
+                        position = comment.end()
+                        continue
+                    raise ValueError(f"Unexpected DOT input near {buffer[position:position + 20]!r}")
+                break
+            position = match.end()
+            kind = match.lastgroup
+            if kind == "space" or kind == "comment":
+                continue
+            if kind == "edge":
+                yield kind, match.group(2, 3, 4)
+                continue
+            text = match.group(kind)
+            if kind == "string":
+                text = text[1:-1].replace('\\"', '"')
+            yield kind, text
+        buffer = buffer[position:]
+
+
+def iter_dot(source, chunk_size=CHUNK_SIZE):
+    # Single pass DOT parser yielding (from, to, weight) for every edge and (node, None, None) for node
+    # declarations. Handles both "--" and "->", edge chains (A -> B -> C), attributes in any order, edge
+    # defaults set with "edge [weight=...]", comments and statements with or without a trailing ";".
+    # An edge can lead to a group of nodes, "A -> {B C}" is an edge to each of them. Groups (and subgraphs)
+    # as edge sources are rejected, as are negative weights.
+    # The weight attribute defaults to 1 like in Graphviz.
+    default_weight = 1.0
+    chain = []  # Node IDs of the current statement
+    expecting_node = False  # An edge operator was read and the next ID continues the chain
+    keyword = None  # "node" / "edge" / "graph" of an attribute statement, or the graph header keyword
+    attributes = {}
+    in_attributes = False
+    attribute_key = None
+    skip_next_id = False  # Next ID is a port (A:port) or the value of a graph attribute (A = B)
+    group = None  # Node IDs of an open {...} edge target
+    previous = None
+
+    def finish():
+        # Emit the statement collected so far
+        nonlocal default_weight
+        if keyword == "edge":
+            if "weight" in attributes:
+                default_weight = _weight(attributes["weight"])
+        elif keyword is None and chain:
+            if len(chain) == 1:
+                yield chain[0], None, None
+            else:
+                weight = _weight(attributes["weight"]) if "weight" in attributes else default_weight
+                for i in range(len(chain) - 1):
+                    for from_node in _members(chain[i]):
+                        for to_node in _members(chain[i + 1]):
+                            yield from_node, to_node, weight
+
+    for kind, text in iter_tokens(source, chunk_size):
+        if kind == "edge":
+            # Complete "A -- B [weight=w];" statement
+            from_node, to_node, weight = text
+            if group is not None:
+                raise ValueError("Edges inside an edge target group are not supported")
+            if skip_next_id and chain:
+                # "X:port -- B [weight=w];", the first ID is the port of the node before it
+                chain.append(to_node)
+                attributes["weight"] = weight
+                yield from finish()
+            elif expecting_node:
+                # It continues a chain like "X -- A -- B [weight=w];"
+                chain.extend((from_node, to_node))
+                attributes["weight"] = weight
+                yield from finish()
+            else:
+                yield from finish()
+                yield from_node, to_node, _weight(weight)
+            chain, attributes, keyword, expecting_node, skip_next_id = [], {}, None, False, False
+            previous = ";"
+            continue
+
+        if in_attributes:
+            if text == "]" and kind == "punct":
+                in_attributes = False
+                previous = "]"
+                continue
+            elif kind != "punct":
+                if previous == "=":
+                    attributes[attribute_key] = text
+                else:
+                    attribute_key = text
+            previous = text if kind == "punct" else None
+            continue
+
+        if group is not None:
+            # Inside "{B C}" after an edge operator only node IDs and separators are allowed
+            if kind == "id" or kind == "string":
+                group.append(text)
+            elif text == "}":
+                chain.append(tuple(group))
+                group = None
+            elif text not in (",", ";"):
+                raise ValueError(f"Unexpected {text!r} in an edge target group, only node IDs are supported")
+            previous = text if kind == "punct" else None
+            continue
+
+        if kind == "id" or kind == "string":
+            if skip_next_id:
+                skip_next_id = False
+            elif kind == "id" and not chain and keyword is None and text.lower() in KEYWORDS:
+                keyword = text.lower()
+            elif keyword is not None and previous == "]":
+                # An attribute statement (node [...], edge [...]) ended without a semicolon
+                yield from finish()
+                chain, attributes, keyword = [text], {}, None
+            elif keyword is not None:
+                pass  # Name of the graph or subgraph
+            elif not chain or expecting_node:
+                chain.append(text)
+                expecting_node = False
+            else:
+                # The previous statement ended without a semicolon
+                yield from finish()
+                chain, attributes, keyword = [text], {}, None
+        elif kind == "edgeop":
+            if not chain:
+                raise ValueError("Edge without a source node, groups and subgraphs can only be edge targets")
+            expecting_node = True
+        elif text == "{" and expecting_node:
+            group = []
+            expecting_node = False
+        elif text == "[":
+            in_attributes = True
+        elif text == ":":
+            skip_next_id = True
+        elif text == "=":
+            # "ID = ID" sets a graph attribute, neither side is a node
+            chain = []
+            skip_next_id = True
+        else:
+            # ";", ",", "{" and "}" all end the current statement
+            yield from finish()
+            chain, attributes, keyword, expecting_node = [], {}, None, False
+        previous = text if kind == "punct" else None
+
+    yield from finish()
@@ -0,0 +1,141 @@
+from heapq import heappop, heappush  # Import functions to work with a priority queue
+
+INF = float("inf")
+
+
+class PathTreeResult:
+    # Versioned view of a dynamic shortest path tree. version goes up with every repair and changed holds the
+    # nodes whose distance or predecessor changed in the last one, so a renderer only redraws those.
+    # distances / predecessors are the live dicts of the tree, the same shape Graph.dijkstra returns
+    def __init__(self, source, version, distances, predecessors, changed):
+        self.source = source
+        self.version = version
+        self.distances = distances
+        self.predecessors = predecessors
+        self.changed = changed
+
+
+class DynamicShortestPaths:
+    # Single-source shortest path tree over a dict backed Graph that is repaired in place when edges are
+    # inserted, deleted or reweighted, in the spirit of Ramalingam & Reps: only nodes whose shortest path can
+    # change are touched.
+    #  - a cheaper edge (u, v) can only improve v and what hangs below it, so a Dijkstra is started from v alone
+    #  - a dearer or deleted tree edge (u, v) can only hurt the subtree of v; those nodes are reset, seeded with
+    #    their best edge from outside the subtree and settled by a Dijkstra restricted to the subtree
+    # Edits of edges that are not part of the tree and do not improve anything cost O(1).
+    def __init__(self, graph, source):
+        if not isinstance(getattr(graph, "graph", None), dict):
+            raise TypeError("DynamicShortestPaths needs a dict backed Graph, a CompactGraph rebuilds on every edit")
+        self.graph = graph
+        self.source = source
+        self.version = 0
+        distances, predecessors, _ = graph.dijkstra(source, None, record_steps=False)
+        self.distances = dict(distances)
+        self.predecessors = dict(predecessors)
+        self.children = {node: set() for node in self.distances}  # Shortest path tree edges, downwards
+        for node, predecessor in self.predecessors.items():
+            if predecessor is not None:
+                self.children[predecessor].add(node)
+        self.changed = set()
+
+    def result(self):
+        return PathTreeResult(self.source, self.version, self.distances, self.predecessors, self.changed)
+
+    def set_edge(self, from_, to_, weight):
+        # Insert an edge or change its weight
+        old_weight = self.graph.graph.get(from_, {}).get(to_)
+        self.graph.add_edge(from_, to_, weight)
+        self._new_nodes(from_, to_)
+        self.changed = set()
+        if old_weight is None or weight < old_weight:
+            self._improve(from_, to_, weight)
+        elif weight > old_weight:
+            self._worsen(from_, to_)
+        return self._finish()
+
+    insert_edge = set_edge
+    update_weight = set_edge
+
+    def delete_edge(self, from_, to_):
+        self.graph.remove_edge(from_, to_)
+        self.changed = set()
+        self._worsen(from_, to_)
+        return self._finish()
+
+    def _new_nodes(self, *nodes):
+        for node in nodes:
+            if node not in self.distances:
+                self.distances[node] = INF
+                self.predecessors[node] = None
+                self.children[node] = set()
+
+    def _set(self, node, distance, predecessor):
+        old_predecessor = self.predecessors[node]
+        if old_predecessor != predecessor:
+            if old_predecessor is not None:
+                self.children[old_predecessor].discard(node)
+            if predecessor is not None:
+                self.children[predecessor].add(node)
+            self.predecessors[node] = predecessor
+        self.distances[node] = distance
+        self.changed.add(node)
+
+    def _improve(self, from_, to_, weight):
+        candidate = self.distances[from_] + weight
+        if candidate >= self.distances[to_]:
+            return  # The edge does not shorten anything
+        self._set(to_, candidate, from_)
+        self._propagate([(candidate, to_)], None)
+
+    def _worsen(self, from_, to_):
+        if self.predecessors.get(to_) != from_:
+            return  # Not a tree edge, no shortest path used it
+
+        # Every node below to_ in the tree may have lost its shortest path
+        affected = set()
+        stack = [to_]
+        while stack:
+            node = stack.pop()
+            affected.add(node)
+            stack.extend(self.children[node])
+        before = {node: (self.distances[node], self.predecessors[node]) for node in affected}
+
+        for node in affected:
+            self._set(node, INF, None)
+
+        # Seed each affected node with its best edge from a node whose distance is still valid
+        queue = []
+        reverse = self.graph.reverse
+        for node in affected:
+            best, best_predecessor = INF, None
+            for predecessor, weight in reverse.get(node, {}).items():
+                if predecessor not in affected and self.distances[predecessor] + weight < best:
+                    best, best_predecessor = self.distances[predecessor] + weight, predecessor
+            if best < INF:
+                self._set(node, best, best_predecessor)
+                heappush(queue, (best, node))
+        self._propagate(queue, affected)
+        # Nodes that got their old distance and predecessor back did not change
+        self.changed.difference_update(node for node in affected
+                                       if (self.distances[node], self.predecessors[node]) == before[node])
+
+    def _propagate(self, queue, limit):
+        # Dijkstra from the seeded nodes, relaxing only into limit (None = anywhere)
+        graph = self.graph.graph
+        while queue:
+            currentDist, currentNode = heappop(queue)
+            if currentDist > self.distances[currentNode]:
+                continue  # Stale entry
+            for neighbor, weight in graph[currentNode].items():
+                if limit is not None and neighbor not in limit:
+                    continue
+                temporary_distance = currentDist + weight
+                if temporary_distance < self.distances[neighbor]:
+                    self._set(neighbor, temporary_distance, currentNode)
+                    heappush(queue, (temporary_distance, neighbor))
+
+    def _finish(self):
+        self.version += 1
+        # The repaired tree answers graph.shortest_path from this source without a new search
+        self.graph.remember_tree(self.source, self.distances, self.predecessors)
+        return self.result()
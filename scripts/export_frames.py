@@ -0,0 +1,175 @@
+import argparse
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Frames are drawn off screen, no window is ever opened
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+
+import visualization
+from batch_query import load_graph
+from compact_graph import CompactGraph
+from layout import ENGINES
+from parallel import run_chunks
+from snapshot import load_snapshot
+from step_log import StepLog
+
+# Headless export of a Dijkstra search, one frame per step of its step log plus a last frame with the shortest
+# path highlighted, drawn like the window draws them (graph, distance table, step number).
+#   png  one numbered PNG file per frame in the output directory
+#   raw  all frames as packed RGB24 in one file, or on stdout with "-", e.g. for ffmpeg -f rawvideo
+# Frames are rendered by a process pool. Every worker maps the graph and its layout from one shared snapshot,
+# gets the step log's arrays once and renders contiguous ranges of steps, seeking to the start of a range from
+# the nearest checkpoint and then applying one delta per frame.
+FRAME_NAME = "step_%06d.png"
+SIZE = (1200, 800)
+PWRITE = hasattr(os, "pwrite")  # POSIX only, elsewhere every worker seeks and writes with its own file handle
+
+
+class FrameRenderer:
+    # Draws the frames of one search the way the window shows them, with the window's layers
+    def __init__(self, graph, steps, source, target, size=SIZE):
+        pygame.init()
+        self.screen = pygame.display.set_mode(size)
+        self.graph, self.steps, self.source, self.target = graph, steps, source, target
+        self.data = visualization.parseInput(graph)
+        visualization.setLayout(self.data, graph.layout)
+        self.font = visualization.getFont("label")
+        self.renderer = visualization.LayeredRenderer(self.screen, visualization.VisualizerApp.BACKGROUND)
+        self.renderer.build_static(self.data, self.font, {}, source)
+        self.nodes = visualization.getScene(self.data, self.screen).node_objects
+        self.cursor = steps.cursor()
+
+    def render(self, k):
+        # Frame k: step k of the log, or the shortest path after the last step for k == len(steps)
+        steps, renderer = self.steps, self.renderer
+        step = min(k, len(steps) - 1)
+        changed = None  # The first frame of a range redraws the whole table
+        if abs(step - self.cursor.index) <= visualization.TABLE_REDRAW_LIMIT:
+            changed = steps.changed_nodes(self.cursor.index, step)
+        renderer.set_table(self.cursor.seek(step), self.nodes, self.font, changed)
+        if k == len(steps):
+            renderer.show_shortest_path(self.data, self.graph, self.source, self.target, self.font,
+                                        self.cursor.state)
+        else:
+            renderer.hide_shortest_path()
+        renderer.compose(self.screen)
+        label = visualization.text_cache.render(self.font, f"current step: {step}", (255, 255, 255))
+        self.screen.blit(label, label.get_rect(midbottom=(self.screen.get_width() // 2,
+                                                          self.screen.get_height() - 30)))
+        return self.screen
+
+
+def _write_frames(frames, start, stop, output, image_format):
+    # Render frames start to stop - 1 into the output. Raw frames for stdout are returned instead, the parent
+    # writes them in order
+    frame_bytes = frames.screen.get_width() * frames.screen.get_height() * 3
+    streamed = []
+    raw_file = None
+    if image_format == "raw" and output != "-":
+        raw_file = open(output, "r+b")  # Every worker has its own handle, so its seeks do not disturb the others
+    try:
+        for k in range(start, stop):
+            surface = frames.render(k)
+            if image_format == "png":
+                pygame.image.save(surface, os.path.join(output, FRAME_NAME % k))
+            elif raw_file is not None and PWRITE:
+                os.pwrite(raw_file.fileno(), pygame.image.tobytes(surface, "RGB"), k * frame_bytes)
+            elif raw_file is not None:
+                raw_file.seek(k * frame_bytes)
+                raw_file.write(pygame.image.tobytes(surface, "RGB"))
+            else:
+                streamed.append(pygame.image.tobytes(surface, "RGB"))
+    finally:
+        if raw_file is not None:
+            raw_file.close()
+    return b"".join(streamed)
+
+
+# Frame renderer of the worker process, built once per worker from the shared snapshot
+_worker_frames = None
+
+
+def _init_worker(graph, step_arrays=None, source=None, target=None, size=SIZE):
+    # graph is the snapshot path in a pool worker, the graph itself without a pool and None afterwards, see
+    # parallel.run_chunks
+    global _worker_frames
+    if graph is None:
+        _worker_frames = None
+        return
+    if isinstance(graph, str):
+        graph = load_snapshot(graph)
+    steps = StepLog.from_arrays(step_arrays, graph.names, graph.ids)
+    _worker_frames = FrameRenderer(graph, steps, source, target, size)
+
+
+def _render_range(frames, output, image_format):
+    # frames is a range of frame numbers
+    return _write_frames(_worker_frames, frames.start, frames.stop, output, image_format)
+
+
+def export_frames(graph, source, target, output, image_format="png", workers=None, size=SIZE, layout_engine=None,
+                  chunk_size=None):
+    # Render every step of a complete Dijkstra search from source, and the shortest path to target, into output
+    # (a directory for png, a file or "-" for raw). graph is a DOT or snapshot path or a loaded Graph. Returns
+    # the number of frames written
+    if image_format not in ("png", "raw"):
+        raise ValueError(f"Unknown image format {image_format!r}, expected png or raw")
+    if isinstance(graph, str):
+        graph = load_graph(graph)
+    elif not isinstance(graph, CompactGraph):
+        graph = CompactGraph.from_graph(graph)
+    graph.freeze()
+
+    # The layout is computed (or taken from the layout store) once here and handed to the workers in the
+    # snapshot, a graph loaded from a snapshot with a complete layout is mapped by the workers as it is
+    data = visualization.parseInput(graph)
+    stale = not graph.layout or not all(node in graph.layout for edge in data for node in edge[:2])
+    if stale:
+        graph.layout = visualization.computeLayout(data, layout_engine, initial=graph.layout or None)
+    _, _, steps = graph.dijkstra(source, target)
+    frame_count = len(steps) + 1
+
+    if image_format == "png":
+        os.makedirs(output, exist_ok=True)
+    elif output != "-":
+        with open(output, "wb") as raw_file:
+            raw_file.truncate(frame_count * size[0] * size[1] * 3)  # Workers write their frames in place
+
+    # Contiguous ranges of frames, every range pays for one seek. Raw frames for stdout come back in order
+    results = run_chunks(graph, _render_range, range(frame_count), workers, chunk_size, _init_worker,
+                         (steps.arrays(), source, target, size), (output, image_format), ordered=True,
+                         fresh_snapshot=stale)
+    for data in results:
+        if output == "-":
+            sys.stdout.buffer.write(data)
+    return frame_count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render every step of a Dijkstra search to PNG files or a raw "
+                                                 "RGB24 video stream, without opening a window.")
+    parser.add_argument("graph", help="DOT file or binary graph snapshot")
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument("--output", required=True,
+                        help="directory for png, file or - (stdout) for raw")
+    parser.add_argument("--format", choices=("png", "raw"), default="png")
+    parser.add_argument("--workers", type=int, help="processes rendering frames (default: one per core)")
+    parser.add_argument("--size", default="%dx%d" % SIZE, help="frame size (default: %(default)s)")
+    parser.add_argument("--layout-engine", choices=list(ENGINES), help="default: chosen by graph size")
+    args = parser.parse_args(argv)
+
+    try:
+        size = tuple(int(side) for side in args.size.lower().split("x"))
+    except ValueError:
+        size = ()
+    if len(size) != 2 or min(size) <= 0:
+        parser.error(f"invalid size {args.size!r}, expected WIDTHxHEIGHT")
+    count = export_frames(args.graph, args.source, args.target, args.output, args.format, args.workers, size,
+                          args.layout_engine)
+    print(f"{count} frames of {size[0]}x{size[1]}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
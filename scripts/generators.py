@@ -0,0 +1,103 @@
+import math
+import random
+
+# Synthetic graphs for benchmarks. Every generator takes the approximate number of directed edges wanted and a
+# seed and yields (from, to, weight) triples, so the result can be fed to Graph.add_edge or written as DOT
+# without building an edge list. Node names are "n<id>" so the DOT output stays on the parser's fast path.
+
+
+def grid(edge_count, seed=1):
+    # Square grid with both directions of every edge, random integer weights
+    rng = random.Random(seed)
+    side = max(2, round(math.sqrt(edge_count / 4)))
+    for y in range(side):
+        for x in range(side):
+            node = y * side + x
+            if x + 1 < side:
+                yield f"n{node}", f"n{node + 1}", rng.randint(1, 9)
+                yield f"n{node + 1}", f"n{node}", rng.randint(1, 9)
+            if y + 1 < side:
+                yield f"n{node}", f"n{node + side}", rng.randint(1, 9)
+                yield f"n{node + side}", f"n{node}", rng.randint(1, 9)
+
+
+def random_geometric(edge_count, seed=1, degree=8):
+    # Random points in the unit square, each connected in both directions to the points within a radius chosen
+    # for the given mean degree. Weights are the distances. Points are hashed into cells of that radius, so only
+    # the neighboring cells are compared
+    rng = random.Random(seed)
+    node_count = max(2, edge_count // degree)
+    radius = math.sqrt(degree / (math.pi * node_count))
+    points = [(rng.random(), rng.random()) for _ in range(node_count)]
+    cells = {}
+    for node, (x, y) in enumerate(points):
+        cells.setdefault((int(x / radius), int(y / radius)), []).append(node)
+
+    for node, (x, y) in enumerate(points):
+        cell_x, cell_y = int(x / radius), int(y / radius)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for other in cells.get((cell_x + dx, cell_y + dy), ()):
+                    if other != node:
+                        distance = math.hypot(x - points[other][0], y - points[other][1])
+                        if distance <= radius:
+                            yield f"n{node}", f"n{other}", round(distance * 1000, 2)
+
+
+def scale_free(edge_count, seed=1, links=4):
+    # Barabasi-Albert preferential attachment: every new node links to `links` existing nodes picked with
+    # probability proportional to their degree, edges in both directions
+    rng = random.Random(seed)
+    node_count = max(links + 1, edge_count // (2 * links))
+    endpoints = list(range(links))  # Every node appears once per edge end, sampling it is sampling by degree
+    for node in range(links, node_count):
+        targets = set()
+        while len(targets) < links:
+            targets.add(rng.choice(endpoints) if endpoints else rng.randrange(node))
+        for target in targets:
+            yield f"n{node}", f"n{target}", rng.randint(1, 20)
+            yield f"n{target}", f"n{node}", rng.randint(1, 20)
+            endpoints.extend((node, target))
+
+
+def road_like(edge_count, seed=1):
+    # Jittered grid with about a tenth of the streets missing and a sparse net of long fast highways, roughly
+    # the degree distribution and metric structure of a road network
+    rng = random.Random(seed)
+    side = max(3, round(math.sqrt(edge_count / 3.6)))
+    for y in range(side):
+        for x in range(side):
+            node = y * side + x
+            for neighbor in ((node + 1) if x + 1 < side else None, (node + side) if y + 1 < side else None):
+                if neighbor is not None and rng.random() > 0.1:
+                    weight = round(rng.uniform(1, 3), 2)
+                    yield f"n{node}", f"n{neighbor}", weight
+                    yield f"n{neighbor}", f"n{node}", weight
+    step = max(2, side // 8)
+    for y in range(0, side, step):
+        for x in range(0, side - step, step):
+            # Highways along every step-th row and column, faster than the streets they replace
+            for a, b in ((y * side + x, y * side + x + step), (x * side + y, (x + step) * side + y)):
+                weight = round(step * 0.8, 2)
+                yield f"n{a}", f"n{b}", weight
+                yield f"n{b}", f"n{a}", weight
+
+
+def random_directed(edge_count, seed=1, degree=4, weights=(1, 20)):
+    # Uniform random directed graph: every node gets `degree` edges to nodes picked at random, so self loops and
+    # parallel edges occur and usually some nodes are unreachable from a given source. weights is the range of
+    # the random integer weights
+    rng = random.Random(seed)
+    node_count = max(1, edge_count // degree)
+    for node in range(node_count):
+        for _ in range(degree):
+            yield f"n{node}", f"n{rng.randrange(node_count)}", rng.randint(*weights)
+
+
+GENERATORS = {"grid": grid, "geometric": random_geometric, "scale_free": scale_free, "road": road_like,
+              "random": random_directed}
+
+
+def to_dot(edges):
+    # DOT text of the edges, the format Graph.from_dot_string and parseInput read
+    return "graph G {\n" + "".join(f"{a} -- {b} [weight={w}];\n" for a, b, w in edges) + "}\n"
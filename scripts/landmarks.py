@@ -0,0 +1,146 @@
+import random
+import sys
+from array import array  # Landmark distance tables, one flat typed array per direction
+from heapq import heappop, heappush  # Import functions to work with a priority queue
+
+from compact_graph import CompactGraph
+
+INF = float("inf")
+LANDMARK_COUNT = 8  # Default number of landmarks, every one costs two searches and 2 * 8 bytes per node
+
+
+class LandmarkIndex:
+    # ALT heuristic (A*, landmarks, triangle inequality).
+    # For a few landmark nodes L the distances d(L, v) and d(v, L) to and from every node are precomputed.
+    # By the triangle inequality d(v, t) >= d(L, t) - d(L, v) and d(v, t) >= d(v, L) - d(t, L), so the largest
+    # of these differences is a lower bound that A* can use as its heuristic.
+    # The tables are flat arrays with one row of node_count entries per landmark, indexed by node id, so they
+    # can be written to and mapped from a graph snapshot as they are.
+    def __init__(self, ids, landmarks, from_landmark, to_landmark, version=0):
+        self.ids = ids  # Node name -> node id, the column of the node in the tables
+        self.landmarks = landmarks  # Node ids of the landmarks
+        self.from_landmark = from_landmark  # d(landmark i, node) at [i * node_count + node]
+        self.to_landmark = to_landmark  # d(node, landmark i) at [i * node_count + node]
+        self.node_count = len(ids)
+        self.version = version  # Graph version the distances were computed for
+
+    @classmethod
+    def build(cls, graph, count=LANDMARK_COUNT, seed=0):
+        # Pick landmarks with the farthest strategy: every new landmark is the node that is farthest from all
+        # landmarks chosen so far, which spreads them out to the edges of the graph where they give the best
+        # bounds. Nodes no landmark can reach or be reached from count as infinitely far
+        compact = graph if isinstance(graph, CompactGraph) else CompactGraph.from_graph(graph)
+        compact.freeze()
+        node_count = len(compact.names)
+        count = min(count, node_count)
+        from_landmark, to_landmark = array('d'), array('d')
+        landmarks = array('l')
+        closest = array('d', [INF]) * node_count  # Distance of every node to the closest landmark
+        candidate = random.Random(seed).randrange(node_count) if node_count else 0
+
+        for _ in range(count):
+            landmarks.append(candidate)
+            forward = _search(compact.offsets, compact.targets, compact.weights, candidate, node_count)
+            backward = _search(compact.rev_offsets, compact.rev_sources, compact.rev_weights, candidate, node_count)
+            from_landmark.extend(forward)
+            to_landmark.extend(backward)
+
+            candidate, farthest = -1, -1.0
+            for node_id in range(node_count):
+                distance = min(closest[node_id], forward[node_id], backward[node_id])
+                closest[node_id] = distance
+                if distance > farthest and node_id not in landmarks:
+                    candidate, farthest = node_id, distance
+            if candidate < 0:
+                break
+
+        ids = compact.ids if graph is compact else {name: node_id for node_id, name in enumerate(compact.names)}
+        return cls(ids, landmarks, from_landmark, to_landmark, graph.version)
+
+    def rebind(self, graph):
+        # The same tables for another graph with the same node ids, for example a converted copy
+        return LandmarkIndex(graph.ids, self.landmarks, self.from_landmark, self.to_landmark, graph.version)
+
+    def bound_ids(self, target_id):
+        # node id -> lower bound of its distance to target_id. The target columns are looked up once here
+        node_count, from_landmark, to_landmark = self.node_count, self.from_landmark, self.to_landmark
+        columns = [(i * node_count, from_landmark[i * node_count + target_id], to_landmark[i * node_count + target_id])
+                   for i in range(len(self.landmarks))]
+
+        def estimate(node_id):
+            best = 0.0
+            for row, landmark_to_target, target_to_landmark in columns:
+                # inf - inf is NaN and compares false, so a landmark that reaches neither node is skipped, while
+                # inf means the target can not be reached from the node at all
+                bound = landmark_to_target - from_landmark[row + node_id]
+                if bound > best:
+                    best = bound
+                bound = to_landmark[row + node_id] - target_to_landmark
+                if bound > best:
+                    best = bound
+            return best
+        return estimate
+
+    def bound(self, target):
+        # Same as bound_ids for node names
+        ids = self.ids
+        estimate = self.bound_ids(ids[target])
+        return lambda node: estimate(ids[node])
+
+    def __call__(self, node, target):
+        # Makes the index a plain heuristic(node, target) like any other
+        return self.bound_ids(self.ids[target])(self.ids[node])
+
+
+def _search(offsets, targets, weights, source_id, node_count):
+    # Distances of a complete search over CSR arrays, used for both directions
+    distances = array('d', [INF]) * node_count
+    distances[source_id] = 0
+    priority_queue = [(0, source_id)]
+    while priority_queue:
+        currentDist, currentNode = heappop(priority_queue)
+        if currentDist > distances[currentNode]:
+            continue
+        for i in range(offsets[currentNode], offsets[currentNode + 1]):
+            neighbor = targets[i]
+            temporary_distance = currentDist + weights[i]
+            if temporary_distance < distances[neighbor]:
+                distances[neighbor] = temporary_distance
+                heappush(priority_queue, (temporary_distance, neighbor))
+    return distances
+
+
+def build_landmarks(graph, count=LANDMARK_COUNT, seed=0):
+    # Precompute the landmark index and keep it on the graph, where shortest_path picks it up and save()
+    # writes it into the snapshot
+    graph.landmarks = LandmarkIndex.build(graph, count, seed)
+    return graph.landmarks
+
+
+def compare_settled(graph, pairs, heuristic):
+    # Settled node counts of Dijkstra and A* for every (source, target) pair, as (dijkstra, astar) tuples
+    counts = []
+    for source, target in pairs:
+        _, _, dijkstra_steps = graph.dijkstra(source, target, stop_at_target=True)
+        _, _, astar_steps = graph.astar(source, target, heuristic)
+        counts.append((len(dijkstra_steps.settled), len(astar_steps.settled)))
+    return counts
+
+
+if __name__ == '__main__':
+    # Settled nodes of Dijkstra and ALT on a DOT file: python landmarks.py input.dot [landmark count]
+    if len(sys.argv) not in (2, 3):
+        print(f"usage: {sys.argv[0]} input.dot [landmark count]")
+        raise SystemExit(2)
+    loaded = CompactGraph()
+    with open(sys.argv[1], "rb") as dot_file:
+        loaded.load_dot(dot_file)
+    index = build_landmarks(loaded, int(sys.argv[2]) if len(sys.argv) == 3 else LANDMARK_COUNT)
+    names = loaded.nodes()
+    sample = random.Random(1).sample([(s, t) for s in names for t in names if s != t],
+                                     min(500, len(names) * (len(names) - 1)))
+    results = compare_settled(loaded, sample, index)
+    dijkstra_total = sum(dijkstra for dijkstra, _ in results)
+    astar_total = sum(astar for _, astar in results)
+    print(f"{len(results)} queries, {len(index.landmarks)} landmarks")
+    print(f"settled nodes  dijkstra {dijkstra_total / len(results):.1f}  alt {astar_total / len(results):.1f}")
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np  # Vectorized force simulation
+
+# Node placement for the visualization. A layout maps every node to (x, y) with the graph centered on (0, 0) and
+# the farthest node at distance 1 on an axis, the range nx.spectral_layout returns and the Scene scales to the
+# window. networkx is only imported when the spectral engine actually runs.
+#   spectral  NetworkX spectral layout, a dense eigenproblem (cubic in the node count), for small graphs
+#   force     Fruchterman-Reingold forces with Barnes-Hut repulsion on a quadtree, a bounded number of
+#             iterations, can be warm started from an earlier layout after the graph was edited
+SPECTRAL_MAX_NODES = 500  # Bigger graphs use the force layout when no engine is asked for
+FORCE_ITERATIONS = 60  # Iterations of a cold start
+WARM_ITERATIONS = 15  # Iterations when starting from earlier coordinates, which are already close
+WARM_TEMPERATURE = 0.25  # Largest step of a warm start in edge lengths, known nodes only settle a little
+LEAF_SIZE = 4  # Mean nodes per cell of the finest quadtree level, those pairs are computed exactly
+MAX_DEPTH = 11  # Quadtree levels at most, 4 ** 11 cells
+GRAVITY = 0.05  # Pull towards the center, keeps unconnected parts from drifting apart
+STORE_SIZE = 8  # Layouts of the last few graphs kept in memory
+CACHE_ENV = "DIJKSTRA_LAYOUT_CACHE"  # Directory where layouts are also kept between runs (off if not set)
+
+
+def _index(edges):
+    # Node names in first seen order, and the edges as id arrays without self loops
+    ids = {}
+    sources, targets = [], []
+    for from_node, to_node, _ in edges:
+        from_id = ids.setdefault(from_node, len(ids))
+        to_id = ids.setdefault(to_node, len(ids))
+        if from_id != to_id:
+            sources.append(from_id)
+            targets.append(to_id)
+    return list(ids), np.array(sources, dtype=np.intp), np.array(targets, dtype=np.intp)
+
+
+def _normalized(names, positions):
+    # Center the positions and scale the largest coordinate to 1
+    if not names:
+        return {}
+    positions = positions - positions.mean(axis=0)
+    extent = np.abs(positions).max()
+    if extent > 0:
+        positions = positions / extent
+    return dict(zip(names, map(tuple, positions.tolist())))
+
+
+def spectral_layout(edges, initial=None, progress=None):
+    # initial and progress are accepted for a uniform engine signature, the spectral layout has no use for them
+    import networkx as nx
+
+    nx_graph = nx.DiGraph()  # Directed graph
+    for from_node, to_node, weight in edges:
+        nx_graph.add_edge(from_node, to_node, weight=weight)
+    # Plain float tuples like the force layout, so layouts compare equal and can be written as JSON
+    return {node: (float(x), float(y)) for node, (x, y) in nx.spectral_layout(nx_graph).items()}
+
+
+def _pair_forces(x, y, force_x, force_y, first, second_x, second_y, mass=None):
+    # Repulsion k^2 / d (with k = 1) pushing every node in first away from the points (or nodes) in second.
+    # Coordinates are kept as separate x and y arrays, reductions over a short second axis are slow in NumPy
+    delta_x, delta_y = x[first] - second_x, y[first] - second_y
+    scale = 1 / np.maximum(delta_x * delta_x + delta_y * delta_y, 1e-9)
+    if mass is not None:
+        scale *= mass
+    force_x += np.bincount(first, weights=delta_x * scale, minlength=len(x))
+    force_y += np.bincount(first, weights=delta_y * scale, minlength=len(x))
+
+
+def _repulsion(x, y):
+    # Barnes-Hut repulsion of all nodes on a quadtree built level by level over the bounding square. On every
+    # level a node is pushed by the cells that are children of its parent's neighbors but not next to its own
+    # cell, each as one mass at its center of mass. Farther cells were handled on a coarser level, the cells
+    # around the node's own finest cell are resolved node by node. That is Barnes-Hut with an opening angle of
+    # about one cell per cell of distance, and every level is a handful of array operations over all nodes.
+    # Levels are added until the finest cells hold about LEAF_SIZE nodes, so clustered layouts go deeper
+    node_count = len(x)
+    force_x, force_y = np.zeros(node_count), np.zeros(node_count)
+    if node_count < 2:
+        return force_x, force_y
+    low_x, low_y = x.min(), y.min()
+    span = max(x.max() - low_x, y.max() - low_y, 1e-9) * (1 + 1e-9)
+    unit_x, unit_y = (x - low_x) / span, (y - low_y) / span  # [0, 1)
+    nodes = np.arange(node_count)
+
+    level = 2
+    while True:
+        size = 1 << level
+        cell_x = np.minimum((unit_x * size).astype(np.intp), size - 1)
+        cell_y = np.minimum((unit_y * size).astype(np.intp), size - 1)
+        flat = cell_x * size + cell_y
+        mass = np.bincount(flat, minlength=size * size).astype(float)
+        occupied = mass > 0
+        center_x = np.bincount(flat, weights=x, minlength=size * size)
+        center_y = np.bincount(flat, weights=y, minlength=size * size)
+        center_x[occupied] /= mass[occupied]
+        center_y[occupied] /= mass[occupied]
+
+        base_x, base_y = (cell_x // 2) * 2 - 2, (cell_y // 2) * 2 - 2  # First child of the parent's first neighbor
+        for dx in range(6):
+            target_x = base_x + dx
+            column_far = np.abs(target_x - cell_x) > 1
+            column_inside = (target_x >= 0) & (target_x < size)
+            for dy in range(6):
+                target_y = base_y + dy
+                far = (column_far | (np.abs(target_y - cell_y) > 1)) & column_inside & (target_y >= 0) & \
+                    (target_y < size)
+                target = target_x[far] * size + target_y[far]
+                keep = occupied[target]
+                target = target[keep]
+                _pair_forces(x, y, force_x, force_y, nodes[far][keep], center_x[target], center_y[target],
+                             mass[target])
+
+        pairs_per_node = (mass * mass).sum() / node_count
+        if level == MAX_DEPTH or pairs_per_node <= LEAF_SIZE:
+            break
+        level += 1
+
+    # Exact pairs with the nodes in the same and the 8 neighboring finest cells
+    order = np.argsort(flat, kind="stable")
+    starts = np.searchsorted(flat[order], np.arange(size * size))
+    counts = mass.astype(np.intp)
+    for dx in (-1, 0, 1):
+        target_x = cell_x + dx
+        for dy in (-1, 0, 1):
+            target_y = cell_y + dy
+            inside = (target_x >= 0) & (target_x < size) & (target_y >= 0) & (target_y < size)
+            target = target_x[inside] * size + target_y[inside]
+            repeat = counts[target]
+            first = np.repeat(nodes[inside], repeat)
+            within = np.arange(len(first)) - np.repeat(np.cumsum(repeat) - repeat, repeat)
+            second = order[np.repeat(starts[target], repeat) + within]
+            different = first != second
+            first, second = first[different], second[different]
+            _pair_forces(x, y, force_x, force_y, first, x[second], y[second])
+    return force_x, force_y
+
+
+def force_layout(edges, initial=None, iterations=None, seed=0, progress=None):
+    # Force directed layout, see _repulsion. With initial (name -> (x, y) of an earlier layout, e.g. before an
+    # edit) the known nodes start where they were, new ones next to a known neighbor, and a few cool
+    # iterations settle the changes. progress(iteration, iterations) is called after every iteration, an
+    # exception raised by it aborts the layout
+    names, sources, targets = _index(edges)
+    node_count = len(names)
+    rng = np.random.default_rng(seed)
+    box = math.sqrt(max(node_count, 1))  # Ideal edge length 1, so the nodes fill a box of this side
+    positions = rng.uniform(-box / 2, box / 2, (node_count, 2))
+    temperature = box / 10
+
+    if initial:
+        known = np.array([name in initial for name in names], dtype=bool)
+        if known.any():
+            positions[known] = [initial[name] for name, placed in zip(names, known) if placed]
+            # Scale the earlier coordinates so their edges have the ideal length again, whatever engine made them
+            both = known[sources] & known[targets]
+            lengths = np.linalg.norm(positions[targets[both]] - positions[sources[both]], axis=1)
+            lengths = lengths[lengths > 0]
+            positions[known] *= 1 / np.median(lengths) if len(lengths) else box / 2
+            for from_id, to_id in zip(sources.tolist(), targets.tolist()):
+                for placed, new in ((from_id, to_id), (to_id, from_id)):
+                    if known[placed] and not known[new]:
+                        positions[new] = positions[placed] + rng.uniform(-0.5, 0.5, 2)
+                        known[new] = True
+            temperature = WARM_TEMPERATURE
+            if iterations is None:
+                iterations = WARM_ITERATIONS
+    if iterations is None:
+        iterations = FORCE_ITERATIONS
+
+    x, y = positions[:, 0].copy(), positions[:, 1].copy()
+    for iteration in range(iterations):
+        force_x, force_y = _repulsion(x, y)
+        # Attraction d^2 / k along the edges
+        delta_x, delta_y = x[targets] - x[sources], y[targets] - y[sources]
+        length = np.sqrt(delta_x * delta_x + delta_y * delta_y)
+        for force, pull in ((force_x, delta_x * length), (force_y, delta_y * length)):
+            force += np.bincount(sources, weights=pull, minlength=node_count)
+            force -= np.bincount(targets, weights=pull, minlength=node_count)
+        force_x -= GRAVITY * (x - x.mean())
+        force_y -= GRAVITY * (y - y.mean())
+
+        # Move every node along its force, at most the temperature, which cools down linearly
+        length = np.maximum(np.sqrt(force_x * force_x + force_y * force_y), 1e-9)
+        step = temperature * (1 - iteration / iterations)
+        scale = np.minimum(length, step) / length
+        x += force_x * scale
+        y += force_y * scale
+        if progress is not None:
+            progress(iteration + 1, iterations)
+    positions = np.column_stack((x, y))
+    return _normalized(names, positions)
+
+
+ENGINES = {"spectral": spectral_layout, "force": force_layout}
+
+
+def choose_engine(node_count, initial=None):
+    # The spectral layout for small graphs, the force layout for big ones and for warm starts
+    if initial or node_count > SPECTRAL_MAX_NODES:
+        return "force"
+    return "spectral"
+
+
+def compute_layout(edges, engine=None, initial=None, progress=None):
+    # Layout of an edge list of (from, to, weight) with the named engine, or the one choose_engine picks
+    if engine is None:
+        engine = choose_engine(len({node for edge in edges for node in edge[:2]}), initial)
+    function = ENGINES.get(engine)
+    if function is None:
+        raise ValueError(f"Unknown layout engine {engine!r}, expected one of {', '.join(ENGINES)}")
+    return function(edges, initial=initial, progress=progress)
+
+
+_store = OrderedDict()  # Graph key -> layout of the last laid out graphs
+_store_lock = threading.Lock()
+
+
+def graph_key(edges, engine=None, initial=None):
+    # Digest of the edge list, the engine and the warm start coordinates, the same graph loaded again has the
+    # same key. The edges are fed to the hash one at a time, so no text of the whole list is built
+    hasher = hashlib.blake2b(repr(engine).encode(), digest_size=16)
+    for edge in edges:
+        hasher.update(repr(edge).encode())  # A tuple's repr is delimited, so the edges can not run together
+    if initial:
+        # A warm started layout depends on where it started from
+        hasher.update(b"initial")
+        for item in initial.items():
+            hasher.update(repr(item).encode())
+    return hasher.hexdigest()
+
+
+def _cache_path(key):
+    directory = os.environ.get(CACHE_ENV)
+    return os.path.join(directory, key + ".json") if directory else None
+
+
+def _read_cached(key):
+    path = _cache_path(key)
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as cache_file:
+        return {name: (x, y) for name, x, y in json.load(cache_file)}
+
+
+def _write_cached(key, layout):
+    path = _cache_path(key)
+    if path is None:
+        return
+    try:
+        text = json.dumps([[name, float(x), float(y)] for name, (x, y) in layout.items()])
+    except TypeError:
+        return  # Node names JSON can not hold, the layout is only kept in memory
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as cache_file:
+        cache_file.write(text)
+
+
+def layout_for(edges, engine=None, initial=None, progress=None):
+    # Layout of the edge list, computed only if this exact graph was not laid out before (in this process, or
+    # in the cache directory when it is set). Layouts are computed with compute_layout. Safe to call from the
+    # compute worker's thread while the window thread uses the store
+    key = graph_key(edges, engine, initial)
+    with _store_lock:
+        layout = _store.get(key)
+    if layout is None:
+        layout = _read_cached(key)
+        if layout is None:
+            layout = compute_layout(edges, engine, initial, progress)
+            _write_cached(key, layout)
+    with _store_lock:
+        _store[key] = layout
+        _store.move_to_end(key)
+        if len(_store) > STORE_SIZE:
+            _store.popitem(last=False)
+    return layout
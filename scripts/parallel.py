@@ -0,0 +1,153 @@
+import os
+import random
+import tempfile
+import time
+from array import array
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from compact_graph import CompactGraph
+from snapshot import load_snapshot, save_snapshot
+
+# Graph of the worker process, mapped from the shared snapshot file once per worker
+_worker_graph = None
+
+
+def _init_worker(graph):
+    # graph is the snapshot path in a pool worker, the graph itself when run_chunks works in this process and
+    # None once it is done there
+    global _worker_graph
+    _worker_graph = load_snapshot(graph) if isinstance(graph, str) else graph
+
+
+def _solve_sources(source_ids):
+    # Complete search from every source of the task, distances go back as raw float64 bytes
+    results = []
+    for source_id in source_ids:
+        distances, _, _ = _worker_graph.dijkstra_ids(source_id)
+        results.append((source_id, distances.tobytes()))
+    return results
+
+
+def _shared_snapshot(graph, fresh=False):
+    # Workers read the graph from a snapshot file mapped into each of them, so the operating system shares
+    # the pages instead of the graph being pickled for every task. fresh writes a new one even if the graph was
+    # loaded from a snapshot, e.g. because something saved with it changed since. Returns (path, is_temporary)
+    path = getattr(graph, "snapshot_path", None)
+    if path is not None and graph.frozen and not fresh:
+        return path, False
+    handle, path = tempfile.mkstemp(suffix=".djkg")
+    os.close(handle)
+    save_snapshot(graph, path)
+    return path, True
+
+
+def run_chunks(graph, task, items, workers=None, chunk_size=None, initializer=_init_worker, initargs=(), args=(),
+               ordered=False, fresh_snapshot=False):
+    # Run task(chunk, *args) over slices of the sequence items in a process pool and yield the results, as
+    # they arrive or with ordered in the order of the chunks. Every worker calls initializer(snapshot path,
+    # *initargs) once, with one snapshot of the frozen CompactGraph graph shared by all of them (see
+    # _shared_snapshot), and keeps what it loads in a module global for task. initializer(graph, *initargs)
+    # sets up this process the same way when the chunks run here, and initializer(None) clears it afterwards
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # Several tasks per worker keep the pool balanced, but each task should be big enough to pay for the IPC
+        chunk_size = max(1, min(64, len(items) // (workers * 4)))
+    chunks = (items[i:i + chunk_size] for i in range(0, len(items), chunk_size))
+
+    if workers == 1:
+        # No pool for a single worker, this is also the baseline the pool is compared with
+        initializer(graph, *initargs)
+        try:
+            for chunk in chunks:
+                yield task(chunk, *args)
+        finally:
+            initializer(None)
+        return
+
+    path, temporary = _shared_snapshot(graph, fresh_snapshot)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=initializer,
+                                 initargs=(path,) + tuple(initargs)) as executor:
+            # Only a few tasks are in flight at a time so results are streamed instead of piling up
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(task, chunk, *args))
+                if len(pending) >= workers * 2:
+                    yield from _completed(pending, ordered)
+            while pending:
+                yield from _completed(pending, ordered)
+    finally:
+        if temporary:
+            os.remove(path)
+
+
+def _completed(pending, ordered):
+    # Results of the next finished tasks: the oldest one with ordered, otherwise whichever are done
+    if ordered:
+        yield pending.popleft().result()
+        return
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        pending.remove(future)
+        yield future.result()
+
+
+def many_sources(graph, sources=None, workers=None, chunk_size=None):
+    # Shortest distances from many sources, split across a process pool.
+    # Yields (source, distances) as results arrive, not in input order. distances is an array('d') indexed by
+    # node id (graph.names / graph.ids of a CompactGraph, graph.nodes() order otherwise), inf if unreachable.
+    # sources defaults to every node, which gives the all pairs distance matrix row by row.
+    if not isinstance(graph, CompactGraph):
+        graph = CompactGraph.from_graph(graph)
+    graph.freeze()
+    source_ids = [graph.ids[source] for source in sources] if sources is not None else range(len(graph.names))
+    for results in run_chunks(graph, _solve_sources, source_ids, workers, chunk_size):
+        yield from _unpack(graph, results)
+
+
+def _unpack(graph, results):
+    for source_id, data in results:
+        distances = array('d')
+        distances.frombytes(data)
+        yield graph.names[source_id], distances
+
+
+def all_pairs(graph, workers=None):
+    # Distance matrix as {source: array('d') of distances indexed by node id}
+    return dict(many_sources(graph, None, workers))
+
+
+def benchmark_scaling(node_count=3000, edge_count=15000, source_count=600, max_workers=None, seed=1):
+    # Time the same many-sources job with 1, 2, 4, ... workers on a random graph.
+    # Returns a list of {"workers", "seconds", "speedup"} rows
+    rng = random.Random(seed)
+    graph = CompactGraph()
+    for node_id in range(node_count):
+        graph.intern(f"n{node_id}")
+    for _ in range(edge_count):
+        graph.add_edge(f"n{rng.randrange(node_count)}", f"n{rng.randrange(node_count)}", rng.uniform(1, 10))
+    graph.freeze()
+    sources = [f"n{i}" for i in rng.sample(range(node_count), min(source_count, node_count))]
+
+    max_workers = max_workers or os.cpu_count() or 1
+    worker_counts = []
+    workers = 1
+    while workers < max_workers:
+        worker_counts.append(workers)
+        workers *= 2
+    worker_counts.append(max_workers)
+
+    rows = []
+    for workers in worker_counts:
+        start = time.perf_counter()
+        for _ in many_sources(graph, sources, workers):
+            pass
+        seconds = time.perf_counter() - start
+        rows.append({"workers": workers, "seconds": seconds, "speedup": rows[0]["seconds"] / seconds if rows else 1.0})
+    return rows
+
+
+if __name__ == '__main__':
+    for row in benchmark_scaling():
+        print(f"{row['workers']:>3} workers  {row['seconds']:8.3f} s  x{row['speedup']:.2f}")
@@ -0,0 +1,198 @@
+import math
+import random
+import sys
+import time
+from array import array  # Heap and bucket state indexed by node id
+from heapq import heappop, heappush
+
+INF = float("inf")
+MAX_BUCKETS = 1 << 20  # Bucket queues over a wider weight range need too much memory, use a heap there
+
+
+# Priority queues over integer node ids for CompactGraph.dijkstra_ids(queue=...).
+# Every queue has the same small interface:
+#   push(node_id, priority)   insert the node or lower its priority
+#   pop()                     remove and return (priority, node_id) with the smallest priority
+#   len(queue)                entries left (lazy queues may count stale entries, the search skips those)
+
+
+class HeapQueue:
+    # heapq with lazy deletion: a lowered priority is pushed as a new entry and the old one goes stale
+    def __init__(self):
+        self.entries = []
+
+    def push(self, node_id, priority):
+        heappush(self.entries, (priority, node_id))
+
+    def pop(self):
+        return heappop(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class IndexedDaryHeap:
+    # d-ary heap with a position index, so decrease-key moves the existing entry instead of adding one. The
+    # heap never holds more than one entry per node and is flatter than a binary heap, which makes the
+    # frequent decrease-keys of dense graphs cheaper than the rarer pops get more expensive
+    def __init__(self, node_count, arity=4):
+        self.arity = arity
+        self.heap = array('l')  # Node ids in heap order
+        self.keys = array('d', [INF]) * node_count  # Priority of every node
+        self.position = array('l', [-1]) * node_count  # Index of every node in heap, -1 if not in it
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, node_id, priority):
+        index = self.position[node_id]
+        if index < 0:
+            index = len(self.heap)
+            self.heap.append(node_id)
+        elif priority >= self.keys[node_id]:
+            return
+        self.keys[node_id] = priority
+        self._sift_up(index, node_id, priority)
+
+    def pop(self):
+        heap, position = self.heap, self.position
+        node_id = heap[0]
+        last = heap.pop()
+        position[node_id] = -1
+        if heap:
+            self._sift_down(last, self.keys[last])
+        return self.keys[node_id], node_id
+
+    def _sift_up(self, index, node_id, priority):
+        # Move the hole up while the parent is larger, then drop the node into it
+        heap, keys, position, arity = self.heap, self.keys, self.position, self.arity
+        while index > 0:
+            parent = (index - 1) // arity
+            parent_node = heap[parent]
+            if keys[parent_node] <= priority:
+                break
+            heap[index] = parent_node
+            position[parent_node] = index
+            index = parent
+        heap[index] = node_id
+        position[node_id] = index
+
+    def _sift_down(self, node_id, priority):
+        # Place node_id starting at the root, moving the smallest child up while it is smaller
+        heap, keys, position, arity = self.heap, self.keys, self.position, self.arity
+        size = len(heap)
+        index = 0
+        while True:
+            first = index * arity + 1
+            if first >= size:
+                break
+            smallest, smallest_key = first, keys[heap[first]]
+            for child in range(first + 1, min(first + arity, size)):
+                child_key = keys[heap[child]]
+                if child_key < smallest_key:
+                    smallest, smallest_key = child, child_key
+            if smallest_key >= priority:
+                break
+            heap[index] = heap[smallest]
+            position[heap[index]] = index
+            index = smallest
+        heap[index] = node_id
+        position[node_id] = index
+
+
+class BucketQueue:
+    # Dial's bucket queue: priorities are grouped into buckets of a fixed width and the buckets are used as a
+    # ring, because with edge weights at most max_weight every tentative distance lies within max_weight of the
+    # distance being settled. Push and pop are O(1) apart from skipping empty buckets.
+    # With integer weights and width 1 every bucket holds equal priorities. Otherwise the width must not exceed
+    # the smallest edge weight, then nothing in the current bucket can still improve another entry of it, so
+    # the order inside a bucket does not matter. Lowered priorities leave stale entries behind, like HeapQueue.
+    # Bucket numbers are int(priority / width). An edge of max_weight moves an entry at most
+    # ceil(max_weight / width) + 1 buckets ahead, even when rounding lands the quotients just below or above a
+    # whole number, so the ring has one bucket more than that
+    def __init__(self, width, max_weight):
+        self.width = width
+        self.buckets = [[] for _ in range(math.ceil(max_weight / width) + 2)]
+        self.current = 0  # Bucket number (not ring index) of the smallest entry
+        self.size = 0
+
+    @classmethod
+    def for_graph(cls, graph):
+        weights = graph.weights
+        max_weight = max(weights, default=0)
+        if all(weight == int(weight) for weight in weights):
+            width = 1
+        else:
+            width = min((weight for weight in weights if weight > 0), default=1)
+            if any(weight == 0 for weight in weights):
+                raise ValueError("a bucket queue needs integer weights or no zero weight edges")
+        if math.ceil(max_weight / width) + 2 > MAX_BUCKETS:
+            raise ValueError(f"weights up to {max_weight} need too many buckets, use a heap")
+        return cls(width, max_weight)
+
+    def __len__(self):
+        return self.size
+
+    def push(self, node_id, priority):
+        number = int(priority / self.width)
+        self.buckets[number % len(self.buckets)].append((priority, node_id))
+        if number < self.current or not self.size:
+            self.current = number
+        self.size += 1
+
+    def pop(self):
+        buckets = self.buckets
+        bucket = buckets[self.current % len(buckets)]
+        while not bucket:
+            self.current += 1
+            bucket = buckets[self.current % len(buckets)]
+        self.size -= 1
+        return bucket.pop()
+
+
+# Queue name -> factory taking the CompactGraph being searched. New queues can be registered here
+QUEUES = {
+    "heapq": lambda graph: HeapQueue(),
+    "dary": lambda graph: IndexedDaryHeap(len(graph.names)),
+    "binary": lambda graph: IndexedDaryHeap(len(graph.names), arity=2),
+    "bucket": BucketQueue.for_graph,
+}
+
+
+def make_queue(name, graph):
+    factory = QUEUES.get(name)
+    if factory is None:
+        raise ValueError(f"Unknown priority queue {name!r}, expected one of {', '.join(QUEUES)}")
+    return factory(graph)
+
+
+def benchmark(node_count=2000, seed=1, repeats=5):
+    # Time complete searches with every queue on a sparse (4 edges per node) and a dense (20 % of all pairs)
+    # random graph with integer weights. Returns rows of {"graph", "queue", "ms"}
+    from compact_graph import CompactGraph
+
+    rng = random.Random(seed)
+    rows = []
+    dense_nodes = min(node_count, 400)
+    for label, nodes, edges in (("sparse", node_count, node_count * 4),
+                                ("dense", dense_nodes, dense_nodes * dense_nodes // 5)):
+        graph = CompactGraph()
+        for node_id in range(nodes):
+            graph.intern(node_id)
+        for _ in range(edges):
+            graph.add_edge(rng.randrange(nodes), rng.randrange(nodes), rng.randint(1, 100))
+        graph.freeze()
+        sources = [rng.randrange(nodes) for _ in range(repeats)]
+        for name in (None,) + tuple(QUEUES):
+            start = time.perf_counter()
+            for source_id in sources:
+                graph.dijkstra_ids(source_id, queue=name)
+            rows.append({"graph": label, "queue": name or "default",
+                         "ms": (time.perf_counter() - start) / repeats * 1000})
+    return rows
+
+
+if __name__ == '__main__':
+    # python priority_queues.py [node count]
+    for row in benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 2000):
+        print(f"{row['graph']:>7}  {row['queue']:>8}  {row['ms']:8.2f} ms")
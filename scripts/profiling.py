@@ -0,0 +1,146 @@
+import atexit
+import json
+import os
+import time
+from collections import deque
+
+# Profiling is switched on with environment variables, so a normal run pays nothing for it:
+#   DIJKSTRA_PROFILE=1             phase timers in the visualize loop and the on-screen overlay (F3 toggles it)
+#   DIJKSTRA_TRACE=trace.json      also write the frames as a Chrome / Perfetto trace file on exit
+PROFILE_ENV = "DIJKSTRA_PROFILE"
+TRACE_ENV = "DIJKSTRA_TRACE"
+HISTORY = 60  # Frames averaged for the overlay
+TRACE_LIMIT = 200000  # Trace events kept, the oldest are dropped first
+
+
+class FrameProfiler:
+    # Lap timer for the main loop. Every frame starts with start_frame(), each lap(name) charges the time since
+    # the previous lap to that phase and end_frame() closes the frame. The loop only calls it behind an
+    # "if profiler:" check, which is the whole cost when profiling is off
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.frames = deque(maxlen=HISTORY)  # (frame seconds, {phase: seconds}) of the last frames
+        self.trace = deque(maxlen=TRACE_LIMIT)  # Chrome trace events
+        self.counters = {}  # Search counters shown in the overlay, see dijkstra_counters
+        self.show_overlay = True
+        self._origin = time.perf_counter()
+        self._frame_start = self._last = None
+        self._phases = {}
+
+    def start_frame(self):
+        self._frame_start = self._last = time.perf_counter()
+        self._phases = {}
+
+    def lap(self, phase):
+        if self._last is None:
+            return  # Outside of a frame, e.g. while the window is set up
+        now = time.perf_counter()
+        self._phases[phase] = self._phases.get(phase, 0.0) + now - self._last
+        if self.trace_path:
+            self.trace.append({"name": phase, "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (self._last - self._origin) * 1e6, "dur": (now - self._last) * 1e6})
+        self._last = now
+
+    def end_frame(self):
+        now = time.perf_counter()
+        self.frames.append((now - self._frame_start, self._phases))
+        if self.trace_path:
+            self.trace.append({"name": "frame", "ph": "X", "pid": 1, "tid": 0,
+                               "ts": (self._frame_start - self._origin) * 1e6,
+                               "dur": (now - self._frame_start) * 1e6})
+
+    def set_counters(self, counters):
+        self.counters = counters
+        if self.trace_path:
+            self.trace.append({"name": "search", "ph": "C", "pid": 1,
+                               "ts": (time.perf_counter() - self._origin) * 1e6, "args": counters})
+
+    def frame_ms(self):
+        if not self.frames:
+            return 0.0
+        return sum(seconds for seconds, _ in self.frames) / len(self.frames) * 1000
+
+    def fps(self):
+        frame_ms = self.frame_ms()
+        return 1000 / frame_ms if frame_ms else 0.0
+
+    def phase_ms(self):
+        totals = {}
+        for _, phases in self.frames:
+            for phase, seconds in phases.items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return {phase: seconds / len(self.frames) * 1000 for phase, seconds in totals.items()}
+
+    def overlay_lines(self):
+        lines = [f"frame {self.frame_ms():.2f} ms  {self.fps():.0f} fps"]
+        lines.extend(f"{phase} {ms:.2f} ms" for phase, ms in self.phase_ms().items())
+        lines.extend(f"{name} {value}" for name, value in self.counters.items())
+        return lines
+
+    def draw_overlay(self, surface, font, position=(0, 0)):
+        # Draw the overlay lines on a dark box, returns the rect that was drawn on (None when hidden)
+        if not self.show_overlay:
+            return None
+        rendered = [font.render(line, True, (230, 230, 230)) for line in self.overlay_lines()]
+        width = max(text.get_width() for text in rendered) + 12
+        height = sum(text.get_height() for text in rendered) + 8
+        x, y = position
+        rect = surface.fill((20, 20, 20), (x, y, width, height))
+        y += 4
+        for text in rendered:
+            surface.blit(text, (x + 6, y))
+            y += text.get_height()
+        return rect
+
+    def export_trace(self, path=None):
+        path = path or self.trace_path
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": list(self.trace), "displayTimeUnit": "ms"}, trace_file)
+
+
+_profiler = None
+
+
+def profiler_from_env():
+    # The process wide profiler if profiling is switched on, otherwise None. One instance survives restarts of
+    # the visualization, and the trace is written once when the program exits
+    global _profiler
+    if _profiler is None and (os.environ.get(PROFILE_ENV) or os.environ.get(TRACE_ENV)):
+        _profiler = FrameProfiler(os.environ.get(TRACE_ENV))
+        if _profiler.trace_path:
+            atexit.register(_profiler.export_trace)
+    return _profiler
+
+
+def dijkstra_counters(graph, steps, target=None):
+    # Priority queue counters of a Dijkstra run, worked out afterwards from its step log so the search loop
+    # itself stays untouched. That needs the log: the search must run with record_steps=True (or lazily, and
+    # be finished), a run without one has nothing to count from. Pass target if the search was run with
+    # stop_at_target.
+    #   pushes       every improved distance is one push, plus the source
+    #   pops         all pushes of a complete run, an early stop only popped the entries ordered before the target
+    #   stale_pops   pops of entries that were superseded by a shorter distance
+    #   relaxations  edges looked at from the settled nodes
+    if steps is None:
+        raise ValueError("dijkstra_counters needs the step log of the search, run it with record_steps=True")
+    node, distance, names = steps.node, steps.distance, steps.names
+    pushes = len(node)
+    settled = steps.settled
+    compact = hasattr(graph, "offsets")  # CompactGraph heaps hold node ids, Graph heaps hold names
+
+    def out_degree(node_id):
+        if compact:
+            return graph.offsets[node_id + 1] - graph.offsets[node_id]
+        return len(graph.graph[names[node_id]])
+
+    relaxations = sum(out_degree(node_id) for node_id in settled)
+    pops = pushes
+    if target is not None and settled and names[settled[-1]] == target:
+        target_id = settled[-1]
+        relaxations -= out_degree(target_id)  # The search stopped before looking at the target's edges
+        target_distance = min(distance[i] for i in range(pushes) if node[i] == target_id)
+        # The heap pops (distance, node) tuples in order, so exactly the entries up to the target's were popped
+        last = (target_distance, target_id if compact else target)
+        pops = sum(1 for i in range(pushes) if (distance[i], node[i] if compact else names[node[i]]) <= last)
+    return {"pushes": pushes, "pops": pops, "stale_pops": pops - len(settled), "settled": len(settled),
+            "relaxations": relaxations}
@@ -0,0 +1,240 @@
+import mmap  # Snapshots are mapped into memory instead of being read and parsed
+import struct
+import sys
+from array import array
+from collections.abc import Mapping, Sequence
+
+from compact_graph import CompactGraph
+from contraction import ContractionHierarchy
+from landmarks import LandmarkIndex
+
+# Binary graph snapshot, all numbers little endian:
+#   header   magic, format version, number of sections, node count, edge count
+#   sections table of (tag, offset, length in bytes), followed by the section data, each aligned to 8 bytes
+# Sections hold the interned node table (NAMEOFFS + NAMES), the forward and reverse CSR adjacency and optionally
+# the layout coordinates, landmark distances and a contraction hierarchy. Unknown sections are ignored on load,
+# so new ones can be added without a new version.
+MAGIC = b"DJKGRAPH"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sIIQQ")
+SECTION = struct.Struct("<8sQQ")
+EXTENSION = ".djkg"
+
+# Section tag -> array typecode of its contents ('B' for raw bytes)
+SECTION_TYPES = {
+    b"NAMEOFFS": "q",  # Start of every name in NAMES, node_count + 1 entries
+    b"NAMES": "B",  # UTF-8 node names, back to back
+    b"OFFSETS": "q",  # Forward CSR
+    b"TARGETS": "q",
+    b"WEIGHTS": "d",
+    b"ROFFSETS": "q",  # Reverse CSR
+    b"RSOURCES": "q",
+    b"RWEIGHTS": "d",
+    b"LAYOUT": "d",  # x, y of every node in layout coordinates (NaN if the node has no position)
+    b"LANDMARK": "q",  # Node ids of the landmarks of a LandmarkIndex
+    b"LMFROM": "d",  # Distances from every landmark, one row of node_count entries per landmark
+    b"LMTO": "d",  # Distances to every landmark, same layout
+    b"CHRANK": "q",  # Contraction hierarchy: contraction order of every node
+    b"CHUOFFS": "q",  # Upward CSR with the contracted node every shortcut skips (-1 for original edges)
+    b"CHUTGTS": "q",
+    b"CHUWGTS": "d",
+    b"CHUMIDS": "q",
+    b"CHDOFFS": "q",  # Downward CSR, stored by the lower ranked end
+    b"CHDSRCS": "q",
+    b"CHDWGTS": "d",
+    b"CHDMIDS": "q",
+}
+
+
+class NameTable(Sequence):
+    # Node names read straight from the mapped NAMES section, decoded only when asked for
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __getitem__(self, node_id):
+        if isinstance(node_id, slice):
+            return [self[i] for i in range(*node_id.indices(len(self)))]
+        if node_id < 0:
+            node_id += len(self)
+        return bytes(self._blob[self._offsets[node_id]:self._offsets[node_id + 1]]).decode("utf-8")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+class LazyIds(Mapping):
+    # Name -> node id, built on the first lookup so opening a snapshot does not touch every name
+    def __init__(self, names):
+        self._names = names
+        self._ids = None
+
+    def _table(self):
+        if self._ids is None:
+            self._ids = {name: node_id for node_id, name in enumerate(self._names)}
+        return self._ids
+
+    def __getitem__(self, name):
+        return self._table()[name]
+
+    def __iter__(self):
+        return iter(self._table())
+
+    def __len__(self):
+        return len(self._names)
+
+
+class LayoutView(Mapping):
+    # Name -> (x, y) over the mapped LAYOUT section
+    def __init__(self, graph, coordinates):
+        self._graph = graph
+        self.coordinates = coordinates
+
+    def __getitem__(self, name):
+        node_id = self._graph.ids[name]
+        x, y = self.coordinates[2 * node_id], self.coordinates[2 * node_id + 1]
+        if x != x:  # NaN, the node was added after the layout was computed
+            raise KeyError(name)
+        return x, y
+
+    def __iter__(self):
+        return (name for name in self._graph.names if name in self)
+
+    def __contains__(self, name):
+        node_id = self._graph.ids.get(name)
+        return node_id is not None and node_id < len(self.coordinates) // 2 and \
+            self.coordinates[2 * node_id] == self.coordinates[2 * node_id]
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+def is_snapshot(path):
+    try:
+        with open(path, "rb") as snapshot_file:
+            return snapshot_file.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def save_snapshot(graph, path):
+    # Write any Graph (dict or compact) to path. A layout stored on the graph is written with it
+    if not isinstance(graph, CompactGraph):
+        graph = CompactGraph.from_graph(graph)
+    graph.freeze()
+    names = graph.names
+    node_count = len(names)
+
+    encoded = [str(name).encode("utf-8") for name in names]
+    name_offsets = array("q", [0])
+    for name in encoded:
+        name_offsets.append(name_offsets[-1] + len(name))
+
+    sections = {
+        b"NAMEOFFS": _little_endian(name_offsets),
+        b"NAMES": b"".join(encoded),
+        b"OFFSETS": _little_endian(array("q", graph.offsets)),
+        b"TARGETS": _little_endian(array("q", graph.targets)),
+        b"WEIGHTS": _little_endian(array("d", graph.weights)),
+        b"ROFFSETS": _little_endian(array("q", graph.rev_offsets)),
+        b"RSOURCES": _little_endian(array("q", graph.rev_sources)),
+        b"RWEIGHTS": _little_endian(array("d", graph.rev_weights)),
+    }
+    if graph.layout:
+        nan = float("nan")
+        coordinates = array("d", [nan]) * (2 * node_count)
+        for name, (x, y) in graph.layout.items():
+            node_id = graph.ids.get(name)
+            if node_id is not None:
+                coordinates[2 * node_id], coordinates[2 * node_id + 1] = x, y
+        sections[b"LAYOUT"] = _little_endian(coordinates)
+    if graph.landmarks is not None and graph.landmarks.version == graph.version:
+        # Landmark distances are only written while they still match the edges
+        sections[b"LANDMARK"] = _little_endian(array("q", graph.landmarks.landmarks))
+        sections[b"LMFROM"] = _little_endian(array("d", graph.landmarks.from_landmark))
+        sections[b"LMTO"] = _little_endian(array("d", graph.landmarks.to_landmark))
+    hierarchy = graph.hierarchy
+    if hierarchy is not None and hierarchy.version == graph.version:
+        for tag, values in ((b"CHRANK", hierarchy.rank),
+                            (b"CHUOFFS", hierarchy.up_offsets), (b"CHUTGTS", hierarchy.up_targets),
+                            (b"CHUWGTS", hierarchy.up_weights), (b"CHUMIDS", hierarchy.up_middles),
+                            (b"CHDOFFS", hierarchy.down_offsets), (b"CHDSRCS", hierarchy.down_sources),
+                            (b"CHDWGTS", hierarchy.down_weights), (b"CHDMIDS", hierarchy.down_middles)):
+            sections[tag] = _little_endian(array(SECTION_TYPES[tag], values))
+
+    with open(path, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(sections), node_count, len(graph.targets)))
+        offset = HEADER.size + SECTION.size * len(sections)
+        for tag, data in sections.items():
+            offset += -offset % 8
+            snapshot_file.write(SECTION.pack(tag, offset, len(data)))
+            offset += len(data)
+        for data in sections.values():
+            snapshot_file.write(b"\0" * (-snapshot_file.tell() % 8))
+            snapshot_file.write(data)
+
+
+def load_snapshot(path):
+    # Map a snapshot into memory and return a CompactGraph whose arrays are zero-copy views of the file
+    with open(path, "rb") as snapshot_file:
+        mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+
+    magic, version, section_count, node_count, edge_count = HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a graph snapshot")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"{path} has snapshot format {version}, expected {FORMAT_VERSION}")
+
+    sections = {}
+    for i in range(section_count):
+        tag, offset, length = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+        tag = tag.rstrip(b"\0")
+        typecode = SECTION_TYPES.get(tag)
+        if typecode is None:
+            continue
+        data = view[offset:offset + length]
+        if sys.byteorder == "big" and typecode != "B":
+            # Only little endian machines can use the file in place
+            data = array(typecode, data.tobytes())
+            data.byteswap()
+        elif typecode != "B":
+            data = data.cast(typecode)
+        sections[tag] = data
+
+    names = NameTable(sections[b"NAMES"], sections[b"NAMEOFFS"])
+    graph = CompactGraph.from_arrays(names, LazyIds(names),
+                                     sections[b"OFFSETS"], sections[b"TARGETS"], sections[b"WEIGHTS"],
+                                     sections[b"ROFFSETS"], sections[b"RSOURCES"], sections[b"RWEIGHTS"])
+    if b"LAYOUT" in sections:
+        graph.layout = LayoutView(graph, sections[b"LAYOUT"])
+    if b"LANDMARK" in sections:
+        graph.landmarks = LandmarkIndex(graph.ids, sections[b"LANDMARK"], sections[b"LMFROM"], sections[b"LMTO"],
+                                        graph.version)
+    if b"CHRANK" in sections:
+        graph.hierarchy = ContractionHierarchy(
+            graph.names, graph.ids, sections[b"CHRANK"],
+            (sections[b"CHUOFFS"], sections[b"CHUTGTS"], sections[b"CHUWGTS"], sections[b"CHUMIDS"]),
+            (sections[b"CHDOFFS"], sections[b"CHDSRCS"], sections[b"CHDWGTS"], sections[b"CHDMIDS"]),
+            graph.version)
+    graph.snapshot_path = path
+    graph._mapped = mapped  # Keep the mapping alive as long as the graph uses it
+    return graph
+
+
+if __name__ == '__main__':
+    # Convert a DOT file to a snapshot: python snapshot.py input.dot output.djkg
+    if len(sys.argv) != 3:
+        print(f"usage: {sys.argv[0]} input.dot output{EXTENSION}")
+        raise SystemExit(2)
+    converted = CompactGraph()
+    with open(sys.argv[1], "rb") as dot_file:
+        converted.load_dot(dot_file)
+    save_snapshot(converted, sys.argv[2])
@@ -0,0 +1,260 @@
+import time
+from array import array  # Compact typed arrays for the per-step deltas
+from bisect import bisect_right
+from collections.abc import Mapping
+
+INF = float("inf")
+PROGRESS_INTERVAL = 1024  # Settled nodes between two calls of a search's progress callback
+
+
+class StepLog:
+    # Compact record of every distance change made by a search.
+    # Instead of a full snapshot per step only the delta is stored (which node changed, its new and old
+    # distance, its predecessor and the node that was being settled) in typed arrays. Step k is the state
+    # after the first k deltas, so step 0 is "nothing reached yet" and len(log) == number of deltas + 1.
+    # Full states are checkpointed periodically so any step can be rebuilt without replaying the whole run.
+    # A graph that already interns its nodes can pass its own names / ids and record by node id directly.
+    # Checkpoints are checkpoint_spacing = max(checkpoint_interval, node_count) steps apart, node_count being
+    # the number of names passed by default. That bounds both costs:
+    #   time    any step is rebuilt by replaying fewer than checkpoint_spacing deltas
+    #   memory  a checkpoint holds at most node_count distances, so all of them together hold at most one
+    #           entry per delta
+    # The spacing is fixed here, a graph that is still being interned must not move it while the log is
+    # recorded
+    def __init__(self, checkpoint_interval=256, names=None, ids=None, node_count=None):
+        self.names = [] if names is None else names  # Interned node names, deltas refer to nodes by index
+        self.ids = {} if ids is None else ids  # Node name -> index in names
+
+        self.node = array('l')  # Node whose distance changed
+        self.distance = array('d')  # Its new distance
+        self.old_distance = array('d')  # Its distance before the change, needed to step backwards
+        self.predecessor = array('l')  # Its new predecessor (-1 if none)
+        self.popped = array('l')  # Node being settled when the change happened (-1 if none)
+        self.settled = array('l')  # Every node in the order the search settled it
+
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_spacing = max(checkpoint_interval, len(self.names) if node_count is None else node_count)
+        self.checkpoint_steps = [0]  # Steps at which a full state was saved
+        self.checkpoint_states = [{}]  # The saved states (node id -> distance)
+        self._live = {}  # State after the last recorded delta, only used while recording
+
+    def intern(self, name):
+        node_id = self.ids.get(name)
+        if node_id is None:
+            node_id = len(self.names)
+            self.ids[name] = node_id
+            self.names.append(name)
+        return node_id
+
+    def record(self, node, distance, predecessor=None, popped=None):
+        # Append one delta, all arguments are node names
+        self.record_ids(self.intern(node), distance,
+                        -1 if predecessor is None else self.intern(predecessor),
+                        -1 if popped is None else self.intern(popped))
+
+    def record_ids(self, node_id, distance, predecessor_id=-1, popped_id=-1):
+        # Append one delta with the nodes given by their interned ids
+        self.node.append(node_id)
+        self.distance.append(distance)
+        self.old_distance.append(self._live.get(node_id, INF))
+        self.predecessor.append(predecessor_id)
+        self.popped.append(popped_id)
+        self._live[node_id] = distance
+
+        if len(self.node) % self.checkpoint_spacing == 0:
+            # The state goes in first, a reader on another thread only looks up states of steps it found
+            self.checkpoint_states.append(dict(self._live))
+            self.checkpoint_steps.append(len(self.node))
+
+    def settle(self, node):
+        self.settled.append(self.intern(node))
+
+    def settle_id(self, node_id):
+        self.settled.append(node_id)
+
+    finished = True  # Every step is recorded, see LazyStepLog
+
+    def extend_to(self, k):
+        # Make step k exist if the search ever gets there. A finished log has all its steps already
+        pass
+
+    def __len__(self):
+        return len(self.node) + 1
+
+    def _state_ids(self, k):
+        # State at step k as a dict of node id -> distance, rebuilt from the closest checkpoint before it
+        i = bisect_right(self.checkpoint_steps, k) - 1
+        start, state = self.checkpoint_steps[i], dict(self.checkpoint_states[i])
+        node, distance = self.node, self.distance
+        for i in range(start, k):
+            state[node[i]] = distance[i]
+        return state
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError("step index out of range")
+        names = self.names
+        return {names[node_id]: distance for node_id, distance in self._state_ids(k).items()}
+
+    def __iter__(self):
+        cursor = self.cursor()
+        yield dict(cursor.state)
+        while True:
+            self.extend_to(cursor.index + 1)
+            if cursor.index >= len(self) - 1:
+                break
+            yield dict(cursor.next())
+
+    def delta(self, k):
+        # The change that turns step k - 1 into step k, as (node, new_distance, predecessor, popped node)
+        i = k - 1
+        names = self.names
+        predecessor, popped = self.predecessor[i], self.popped[i]
+        return (names[self.node[i]], self.distance[i],
+                names[predecessor] if predecessor >= 0 else None,
+                names[popped] if popped >= 0 else None)
+
+    def arrays(self):
+        # The deltas and checkpoints by node id, without the names. Together with the same names and ids they
+        # rebuild the log with from_arrays, e.g. in a worker process that maps the same graph snapshot
+        return {"checkpoint_interval": self.checkpoint_interval, "checkpoint_spacing": self.checkpoint_spacing,
+                "node": self.node, "distance": self.distance,
+                "old_distance": self.old_distance, "predecessor": self.predecessor, "popped": self.popped,
+                "settled": self.settled, "checkpoint_steps": self.checkpoint_steps,
+                "checkpoint_states": self.checkpoint_states}
+
+    @classmethod
+    def from_arrays(cls, arrays, names, ids):
+        log = cls(arrays["checkpoint_interval"], names, ids, arrays["checkpoint_spacing"])
+        for field in ("node", "distance", "old_distance", "predecessor", "popped", "settled", "checkpoint_steps",
+                      "checkpoint_states"):
+            setattr(log, field, arrays[field])
+        return log
+
+    def changed_nodes(self, a, b):
+        # Names of the nodes whose distance changes between steps a and b, in either direction
+        low, high = sorted((a, b))
+        names, node = self.names, self.node
+        return {names[node[i]] for i in range(low, high)}
+
+    def cursor(self):
+        return StepCursor(self)
+
+
+class LazyStepLog(StepLog):
+    # Step log of a search that is still running. The search is a generator that records into this log and
+    # yields after every settled node, it is resumed only when a step that does not exist yet is asked for.
+    # len() counts the steps recorded so far, finished tells whether that is all of them. Once the generator
+    # ends its return value (distances, predecessors) is kept in result
+    # A search can be finished on another thread (see VisualizerApp) while this one reads the steps recorded so
+    # far, as long as only one thread resumes it
+    def __init__(self, checkpoint_interval=256, names=None, ids=None, node_count=None):
+        super().__init__(checkpoint_interval, names, ids, node_count)
+        self.node_count = len(self.names) if node_count is None else node_count  # Total of the progress reports
+        self.search = None  # The generator, None once it ended
+        self.result = None
+
+    @property
+    def finished(self):
+        return self.search is None
+
+    def _resume(self):
+        # Run the search up to its next settled node
+        try:
+            next(self.search)
+        except StopIteration as stop:
+            self.search = None
+            self.result = stop.value
+
+    def extend_to(self, k):
+        # Resume the search until step k exists or the search ended
+        node = self.node
+        while self.search is not None and len(node) < k:
+            self._resume()
+
+    def run_for(self, seconds):
+        # Resume the search for about seconds, e.g. what is left of a frame. Returns whether it finished
+        deadline = time.perf_counter() + seconds
+        while self.search is not None and time.perf_counter() < deadline:
+            self._resume()
+        return self.search is None
+
+    def finish(self, progress=None):
+        # Run the search to its end and return its result. progress(settled, node_count) is called every
+        # PROGRESS_INTERVAL settled nodes like a search's progress callback, an exception raised by it stops
+        # the search where it is and a later call resumes it
+        settled = self.settled
+        while self.search is not None:
+            self._resume()
+            if progress is not None and not len(settled) % PROGRESS_INTERVAL:
+                progress(len(settled), self.node_count)
+        return self.result
+
+    def __getitem__(self, k):
+        self.extend_to(INF if k < 0 else k)
+        return super().__getitem__(k)
+
+
+class FinalDistances(Mapping):
+    # Distances of a lazy search. The search is only run to its end when a distance is looked up, the window
+    # hands them out only once it ended (see VisualizerApp.advance_search)
+    def __init__(self, log):
+        self.log = log
+
+    def _distances(self):
+        return self.log.finish()[0]
+
+    def __getitem__(self, node):
+        return self._distances()[node]
+
+    def __iter__(self):
+        return iter(self._distances())
+
+    def __len__(self):
+        return len(self._distances())
+
+
+class StepCursor:
+    # Position in a StepLog with the materialized state of that step.
+    # Moving one step in either direction applies or undoes a single delta, so the Prev/Next buttons
+    # cost O(1) per click no matter how large the graph is
+    def __init__(self, log):
+        self.log = log
+        self.index = 0
+        self.state = {}  # Node name -> distance at the current step
+
+    def next(self):
+        log = self.log
+        log.extend_to(self.index + 1)
+        if self.index < len(log) - 1:
+            i = self.index
+            self.state[log.names[log.node[i]]] = log.distance[i]
+            self.index += 1
+        return self.state
+
+    def prev(self):
+        log = self.log
+        if self.index > 0:
+            self.index -= 1
+            i = self.index
+            name, old_distance = log.names[log.node[i]], log.old_distance[i]
+            if old_distance == INF:
+                self.state.pop(name, None)
+            else:
+                self.state[name] = old_distance
+        return self.state
+
+    def seek(self, k):
+        # Walk delta by delta when the target is close, otherwise rebuild from the nearest checkpoint
+        self.log.extend_to(k)
+        k = max(0, min(k, len(self.log) - 1))
+        if abs(k - self.index) > self.log.checkpoint_spacing:
+            self.state = self.log[k]
+            self.index = k
+        while self.index < k:
+            self.next()
+        while self.index > k:
+            self.prev()
+        return self.state
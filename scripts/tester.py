@@ -1,6 +1,44 @@
 from dijkstra import Graph
+from compact_graph import CompactGraph
+from dot_parser import iter_dot
+from step_log import FinalDistances, StepLog
+from snapshot import is_snapshot
+from batch_query import answer, load_graph, read_pairs
+from parallel import all_pairs, many_sources, run_chunks
+import dense_engine
+import parallel
+from dynamic_paths import DynamicShortestPaths
+from landmarks import LandmarkIndex, build_landmarks, compare_settled
+from contraction import ContractionHierarchy, build_hierarchy
+from priority_queues import QUEUES, BucketQueue, IndexedDaryHeap
+from generators import GENERATORS, random_directed, road_like, to_dot
+from profiling import FrameProfiler, dijkstra_counters
+import layout
+from worker import ComputeWorker
+import threading
+import time
+import compact_graph
+import dijkstra
+from unittest import mock
+import bisect
+import json
+import io
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
 import unittest
 
+
+def build_graph(edges, cls=Graph):
+    # Graph of generated (from, to, weight) triples, see generators.py
+    graph = cls()
+    for edge in edges:
+        graph.add_edge(*edge)
+    return graph
+
 class TestShortestPath(unittest.TestCase):
     def setUp(self):
         # Create a graph instance for testing
@@ -50,5 +88,1194 @@ class TestShortestPath(unittest.TestCase):
         self.assertEqual(self.graph.shortest_path('A', 'D'), ['A', 'B', 'C', 'D'])
 
 
+class TestPointToPoint(unittest.TestCase):
+    def random_graph(self, seed, nodes=80, degree=2):
+        return build_graph(random_directed(nodes * degree, seed, degree, weights=(1, 30)))
+
+    def path_length(self, graph, path):
+        return sum(graph.graph[a][b] for a, b in zip(path, path[1:]))
+
+    def test_against_full_search(self):
+        for seed in range(10):
+            graph = self.random_graph(seed)
+            nodes = sorted(graph.graph)
+            rng = random.Random(seed)
+            for _ in range(20):
+                source, target = rng.choice(nodes), rng.choice(nodes)
+                full, _, _ = graph.dijkstra(source, target)
+
+                early, predecessors, steps = graph.dijkstra(source, target, stop_at_target=True, record_steps=False)
+                self.assertIsNone(steps)
+                self.assertEqual(early[target], full[target])
+
+                distance, path = graph.bidirectional_dijkstra(source, target)
+                self.assertEqual(distance, full[target])
+                if full[target] == float('inf'):
+                    self.assertEqual(path, [])
+                    self.assertEqual(graph.shortest_path(source, target), [])
+                else:
+                    self.assertEqual((path[0], path[-1]), (source, target))
+                    self.assertEqual(self.path_length(graph, path), full[target])
+                    self.assertEqual(self.path_length(graph, graph.shortest_path(source, target)), full[target])
+
+    def test_sink_nodes_are_searchable(self):
+        # Nodes without outgoing edges no longer need a self loop to be part of the graph
+        graph = Graph()
+        graph.add_edge('A', 'B', 2)
+        self.assertEqual(graph.shortest_path('A', 'B'), ['A', 'B'])
+        self.assertEqual(graph.bidirectional_dijkstra('B', 'A'), (float('inf'), []))
+
+    def test_early_stop_settles_fewer_steps(self):
+        graph = Graph()
+        for i in range(50):
+            graph.add_edge(i, i + 1, 1)
+        _, _, full_steps = graph.dijkstra(0, 5)
+        _, _, early_steps = graph.dijkstra(0, 5, stop_at_target=True)
+        self.assertLess(len(early_steps), len(full_steps))
+
+
+class TestQueryCache(unittest.TestCase):
+    def setUp(self):
+        self.graph = Graph()
+        self.graph.add_edge('A', 'B', 1)
+        self.graph.add_edge('B', 'C', 2)
+        self.graph.add_edge('A', 'C', 4)
+        self.searches = 0
+        search = self.graph.dijkstra
+
+        def counting_search(*args, **kwargs):
+            self.searches += 1
+            return search(*args, **kwargs)
+        self.graph.dijkstra = counting_search
+
+    def test_repeated_query_is_cached(self):
+        self.assertEqual(self.graph.shortest_path('A', 'C'), ['A', 'B', 'C'])
+        self.assertEqual(self.graph.shortest_path('A', 'C'), ['A', 'B', 'C'])
+        self.assertEqual(self.searches, 1)
+
+    def test_complete_tree_answers_every_target(self):
+        self.graph.dijkstra('A', 'C')
+        self.assertEqual(self.graph.shortest_path('A', 'B'), ['A', 'B'])
+        self.assertEqual(self.graph.shortest_path('A', 'C'), ['A', 'B', 'C'])
+        self.assertEqual(self.searches, 1)
+
+    def test_add_edge_invalidates(self):
+        self.assertEqual(self.graph.shortest_path('A', 'C'), ['A', 'B', 'C'])
+        self.graph.add_edge('A', 'C', 1)
+        self.assertEqual(self.graph.shortest_path('A', 'C'), ['A', 'C'])
+        self.graph.from_dot_string('A -> D [weight=1];')
+        self.assertEqual(self.graph.shortest_path('A', 'D'), ['A', 'D'])
+
+
+class TestCompactGraph(unittest.TestCase):
+    def build(self, cls, seed, nodes=70):
+        return build_graph(random_directed(nodes * 2, seed, degree=2, weights=(1, 25)), cls)
+
+    def test_matches_dict_graph(self):
+        for seed in range(8):
+            graph, compact = self.build(Graph, seed), self.build(CompactGraph, seed)
+            compact.freeze()
+            self.assertEqual(sorted(graph.edges()), sorted(compact.edges()))
+            for source in sorted(graph.graph)[:10]:
+                expected, _, expected_steps = graph.dijkstra(source, None)
+                distances, predecessors, steps = compact.dijkstra(source, None)
+                self.assertEqual(dict(distances), expected)
+                self.assertEqual(steps[-1], expected_steps[-1])
+                for target in sorted(graph.graph)[::7]:
+                    self.assertEqual(compact.shortest_path(source, target), graph.shortest_path(source, target))
+                    self.assertEqual(compact.bidirectional_dijkstra(source, target)[0], expected[target])
+
+    def test_edits_after_freeze(self):
+        graph = CompactGraph()
+        graph.add_edge('A', 'B', 5)
+        graph.add_edge('B', 'C', 5)
+        graph.freeze()
+        self.assertEqual(graph.shortest_path('A', 'C'), ['A', 'B', 'C'])
+        graph.add_edge('A', 'C', 20)
+        graph.add_edge('A', 'C', 3)  # The last weight wins, like in Graph
+        self.assertEqual(graph.shortest_path('A', 'C'), ['A', 'C'])
+        self.assertEqual(graph.neighbors('A'), {'B': 5, 'C': 3})
+        graph.add_node('D')
+        self.assertEqual(graph.shortest_path('A', 'D'), [])
+        graph.remove_edge('A', 'C')
+        self.assertEqual(graph.shortest_path('A', 'C'), ['A', 'B', 'C'])
+        self.assertEqual(graph.bidirectional_dijkstra('A', 'C'), (10, ['A', 'B', 'C']))
+
+
+class TestDotParser(unittest.TestCase):
+    DOT = """
+        strict digraph "roads" {
+          rankdir = LR; // graph attribute, not a node
+          node [shape=circle];
+          edge [weight=2]
+          A -- B [weight=3];
+          B -> D [color=red, weight="3.5"]
+          /* block
+             comment */ C -> A -> E
+          "long name" -> F:port [label="x;y", weight=0.5];
+          F:east -> G [weight=4];
+          G # nodes declared on their own
+          H [label=H];
+        }
+    """
+    EXPECTED = [
+        ('A', 'B', 3.0), ('B', 'D', 3.5), ('C', 'A', 2.0), ('A', 'E', 2.0),
+        ('long name', 'F', 0.5), ('F', 'G', 4.0), ('G', None, None), ('H', None, None),
+    ]
+
+    def test_statements(self):
+        self.assertEqual(list(iter_dot(self.DOT)), self.EXPECTED)
+
+    def test_chunk_boundaries(self):
+        # Tokens split across reads of text and binary files must come out the same
+        for chunk_size in (1, 2, 3, 5, 8, 13):
+            self.assertEqual(list(iter_dot(io.StringIO(self.DOT), chunk_size)), self.EXPECTED)
+            self.assertEqual(list(iter_dot(io.BytesIO(self.DOT.encode("utf-8")), chunk_size)), self.EXPECTED)
+
+    def test_graph_loading(self):
+        graph = Graph()
+        graph.from_dot_string("graph G { A -- B [weight=4]; A -> C [weight=1]; C -- B [weight=1]; D }")
+        self.assertEqual(graph.shortest_path('A', 'B'), ['A', 'C', 'B'])
+        self.assertEqual(graph.shortest_path('A', 'D'), [])
+
+    def test_invalid_input(self):
+        with self.assertRaises(ValueError):
+            list(iter_dot("graph G { A -- B [weight=1]; /* never closed"))
+
+    def test_comment_on_the_last_line(self):
+        # The last line may be a comment without a newline after it, also in chunked reads
+        for comment in ("\n// tail", "\n# tail", "\n  \n// tail", "// tail"):
+            dot = "digraph { a -> b [weight=2]; }" + comment
+            self.assertEqual(list(iter_dot(dot)), [('a', 'b', 2.0)])
+            for chunk_size in (1, 3, 7):
+                self.assertEqual(list(iter_dot(io.StringIO(dot), chunk_size)), [('a', 'b', 2.0)])
+        with self.assertRaises(ValueError):
+            list(iter_dot("digraph { a -> b [weight=2]; }\n// tail\nc -"))
+
+    def test_negative_weights_are_rejected(self):
+        for dot in ("digraph { A -> B [weight=1]; A -> C [weight=2]; C -> B [weight=-5] }",
+                    "digraph { C -> B [weight=-5]; }", "digraph { edge [weight=-1]; A -> B }"):
+            with self.assertRaises(ValueError):
+                Graph().from_dot_string(dot)
+
+    def test_edge_target_groups(self):
+        self.assertEqual(list(iter_dot("digraph { A -> {B C} [weight=2]; B -> {C, D} -> E }")),
+                         [('A', 'B', 2.0), ('A', 'C', 2.0), ('B', 'C', 1.0), ('B', 'D', 1.0), ('C', 'E', 1.0),
+                          ('D', 'E', 1.0)])
+        for dot in ("digraph { {A B} -> C }", "digraph { A -> {B -> C} }"):
+            with self.assertRaises(ValueError):
+                list(iter_dot(dot))
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "graph.djkg")
+
+        self.graph = build_graph((a, b, weight / 2) for a, b, weight in random_directed(120, 3, 3, (1, 9)))
+        self.graph.add_node("lonely \N{GREEK SMALL LETTER ALPHA}")
+        self.graph.layout = {node: (i / 10, -i / 10) for i, node in enumerate(self.graph.nodes())}
+
+    def test_round_trip(self):
+        self.graph.save(self.path)
+        self.assertTrue(is_snapshot(self.path))
+        loaded = Graph.load(self.path)
+        self.assertEqual(loaded.nodes(), self.graph.nodes())
+        self.assertEqual(sorted(loaded.edges()), sorted(self.graph.edges()))
+        self.assertEqual(dict(loaded.layout), self.graph.layout)
+        for target in self.graph.nodes():
+            self.assertEqual(loaded.shortest_path('n0', target), self.graph.shortest_path('n0', target))
+            self.assertEqual(loaded.bidirectional_dijkstra('n0', target)[0],
+                             self.graph.bidirectional_dijkstra('n0', target)[0])
+
+    def test_loaded_graph_can_be_edited(self):
+        self.graph.save(self.path)
+        loaded = Graph.load(self.path)
+        loaded.add_edge('n0', 'new', 0.5)
+        self.assertEqual(loaded.shortest_path('n0', 'new'), ['n0', 'new'])
+        self.assertEqual(loaded.neighbors('n0')['new'], 0.5)
+
+    def test_dot_files_are_not_snapshots(self):
+        with open(self.path, "w") as dot_file:
+            dot_file.write("graph G { A -- B [weight=1]; }")
+        self.assertFalse(is_snapshot(self.path))
+
+
+class TestBatchQuery(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "graph.dot")
+        with open(self.path, "w") as dot_file:
+            dot_file.write("digraph G { A -> B [weight=1]; B -> C [weight=2]; A -> C [weight=4]; D; }")
+
+    def test_answers_in_input_order(self):
+        graph = load_graph(self.path)
+        pairs = read_pairs(io.StringIO("A C\n# comment\n\nA,B\nC A\nX A\nB C\nA D\n"))
+        results = list(answer(graph, pairs, batch_size=2))
+        self.assertEqual([(r["source"], r["target"]) for r in results],
+                         [('A', 'C'), ('A', 'B'), ('C', 'A'), ('X', 'A'), ('B', 'C'), ('A', 'D')])
+        self.assertEqual((results[0]["distance"], results[0]["path"]), (3, ['A', 'B', 'C']))
+        self.assertEqual((results[1]["distance"], results[1]["path"]), (1, ['A', 'B']))
+        self.assertEqual((results[2]["distance"], results[2]["path"]), (None, []))
+        self.assertIn("error", results[3])
+        self.assertEqual(results[4]["path"], ['B', 'C'])
+        self.assertEqual(results[5]["distance"], None)
+
+    def test_snapshot_input(self):
+        snapshot_path = self.path + ".djkg"
+        load_graph(self.path).save(snapshot_path)
+        results = list(answer(load_graph(snapshot_path), [('A', 'C')]))
+        self.assertEqual(results[0]["path"], ['A', 'B', 'C'])
+
+    def test_cli_does_not_import_gui(self):
+        code = "import sys, batch_query; print(sorted({'pygame', 'pygame_gui', 'networkx'} & set(sys.modules)))"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+
+class TestParallel(unittest.TestCase):
+    def test_process_pool_matches_single_source_runs(self):
+        graph = build_graph(random_directed(90, 5, 3, (1, 9)))
+        nodes = graph.nodes()
+        matrix = all_pairs(graph, workers=2)
+        self.assertEqual(sorted(matrix), sorted(nodes))
+        for source, row in matrix.items():
+            expected, _, _ = graph.dijkstra(source, None)
+            self.assertEqual({nodes[i]: distance for i, distance in enumerate(row)}, expected)
+
+    def test_chunks_in_order_and_as_they_arrive(self):
+        graph = CompactGraph.from_graph(build_graph(random_directed(90, 5, 3, (1, 9))))
+        graph.freeze()
+        expected = [[(source_id, graph.dijkstra_ids(source_id)[0].tobytes())] for source_id in range(30)]
+        for workers in (1, 2):
+            ordered = list(run_chunks(graph, parallel._solve_sources, range(30), workers, 1, ordered=True))
+            self.assertEqual(ordered, expected)
+            arrived = list(run_chunks(graph, parallel._solve_sources, range(30), workers, 1))
+            self.assertEqual(sorted(arrived), expected)
+        self.assertIsNone(parallel._worker_graph)  # Not kept in this process after a run without a pool
+
+    def test_selected_sources(self):
+        graph = Graph()
+        graph.from_dot_string("digraph { A -> B [weight=2]; B -> C [weight=3]; }")
+        rows = dict(many_sources(graph, ['B', 'C'], workers=2, chunk_size=1))
+        self.assertEqual(list(rows['B']), [float('inf'), 0, 3])
+        self.assertEqual(list(rows['C']), [float('inf'), float('inf'), 0])
+
+
+class TestDenseEngine(unittest.TestCase):
+    def random_graph(self, seed, nodes, edges):
+        degree = max(1, edges // nodes)
+        graph = build_graph(random_directed(nodes * degree, seed, degree, (0, 12)))
+        for i in range(nodes):
+            graph.add_node(f"n{i}")
+        return graph
+
+    def check(self, graph, source, distances, predecessors):
+        expected, _, _ = Graph.dijkstra(graph, source, None)
+        self.assertEqual(distances, expected)
+        for node, predecessor in predecessors.items():
+            # Ties may pick another predecessor, but it must lie on a shortest path
+            if predecessor is not None:
+                self.assertEqual(expected[predecessor] + graph.graph[predecessor][node], expected[node])
+
+    def test_single_source_engines(self):
+        for seed, edges in ((1, 40), (2, 400)):
+            graph = self.random_graph(seed, 25, edges)
+            for engine in ("dense", "sparse", "heap", "auto"):
+                distances, predecessors = dense_engine.single_source(graph, "n0", engine)
+                self.check(graph, "n0", distances, predecessors)
+
+    def test_all_pairs_engines(self):
+        graph = self.random_graph(3, 20, 150)
+        for engine in ("dense", "sparse", "heap"):
+            results = dense_engine.all_pairs(graph, engine)
+            for source, (distances, predecessors) in results.items():
+                self.check(graph, source, distances, predecessors)
+
+    def test_engine_choice_and_path_reuse(self):
+        self.assertEqual(dense_engine.choose_engine(self.random_graph(4, 20, 200)), "dense")
+        self.assertNotEqual(dense_engine.choose_engine(self.random_graph(5, 200, 300)), "dense")
+        graph = self.random_graph(6, 20, 200)
+        distances, _ = dense_engine.single_source(graph, "n0", "dense")
+        path = graph.shortest_path("n0", "n7")
+        self.assertEqual(sum(graph.graph[a][b] for a, b in zip(path, path[1:])), distances["n7"])
+
+    def test_counts_and_export_cache(self):
+        graph = self.random_graph(7, 20, 150)
+        for g in (graph, CompactGraph.from_graph(graph)):
+            self.assertEqual(g.node_count(), 20)
+            self.assertEqual(g.edge_count(), sum(1 for _ in g.edges()))
+        matrix = graph.cached_export(dense_engine.to_matrix)
+        self.assertIs(graph.cached_export(dense_engine.to_matrix), matrix)
+        graph.add_edge("n0", "n19", 0)
+        self.assertEqual(graph.edge_count(), sum(1 for _ in graph.edges()))
+        self.assertIsNot(graph.cached_export(dense_engine.to_matrix), matrix)
+        self.check(graph, "n0", *dense_engine.single_source(graph, "n0", "dense"))
+
+
+class TestDynamicPaths(unittest.TestCase):
+    def test_random_edits_match_recompute(self):
+        rng = random.Random(11)
+        graph = build_graph(random_directed(120, 11, 3))
+        tree = graph.track("n0")
+        for _ in range(200):
+            edges = list(graph.edges())
+            from_node, to_node, weight = rng.choice(edges)
+            action = rng.random()
+            if action < 0.3:
+                result = tree.delete_edge(from_node, to_node)
+            elif action < 0.7:
+                result = tree.update_weight(from_node, to_node, max(1, weight + rng.randint(-8, 8)))
+            else:
+                result = tree.insert_edge(f"n{rng.randrange(42)}", f"n{rng.randrange(42)}", rng.randint(1, 20))
+            expected, _, _ = Graph.dijkstra(graph, "n0", None, record_steps=False)
+            self.assertEqual(result.distances, expected)
+            for node, predecessor in result.predecessors.items():
+                if predecessor is not None:
+                    self.assertEqual(expected[predecessor] + graph.graph[predecessor][node], expected[node])
+
+    def test_versioned_result(self):
+        graph = Graph()
+        graph.add_edge('A', 'B', 1)
+        graph.add_edge('B', 'C', 1)
+        graph.add_edge('C', 'D', 1)
+        graph.add_edge('X', 'Y', 1)
+        tree = DynamicShortestPaths(graph, 'A')
+        self.assertEqual(tree.result().version, 0)
+        result = tree.update_weight('A', 'B', 5)
+        self.assertEqual((result.version, result.changed), (1, {'B', 'C', 'D'}))
+        result = tree.update_weight('X', 'Y', 7)  # Outside the tree, nothing to repair
+        self.assertEqual((result.version, result.changed), (2, set()))
+        result = tree.insert_edge('A', 'C', 1)
+        self.assertEqual(result.changed, {'C', 'D'})
+        self.assertEqual(graph.shortest_path('A', 'D'), ['A', 'C', 'D'])
+        result = tree.delete_edge('A', 'B')
+        self.assertEqual(result.distances['B'], float('inf'))
+
+    def test_unchanged_subtree_is_not_reported(self):
+        graph = Graph()
+        graph.add_edge('A', 'B', 1)
+        graph.add_edge('A', 'C', 1)
+        graph.add_edge('C', 'B', 0)
+        graph.add_edge('B', 'D', 1)
+        graph.add_edge('D', 'E', 1)
+        tree = graph.track('A')
+        result = tree.delete_edge('A', 'B')  # B keeps its distance through C, D and E keep theirs through B
+        self.assertEqual(result.changed, {'B'})
+        self.assertEqual(result.predecessors['B'], 'C')
+        self.assertEqual(result.distances['E'], 3)
+
+
+class TestAStar(unittest.TestCase):
+    def grid(self, cls, size=12, seed=3, name=lambda x, y: (x, y)):
+        rng = random.Random(seed)
+        graph = cls()
+        for x in range(size):
+            for y in range(size):
+                if x + 1 < size:
+                    graph.add_edge(name(x, y), name(x + 1, y), rng.randint(1, 9))
+                    graph.add_edge(name(x + 1, y), name(x, y), rng.randint(1, 9))
+                if y + 1 < size:
+                    graph.add_edge(name(x, y), name(x, y + 1), rng.randint(1, 9))
+                    graph.add_edge(name(x, y + 1), name(x, y), rng.randint(1, 9))
+        return graph
+
+    def test_landmark_search_matches_dijkstra(self):
+        for cls in (Graph, CompactGraph):
+            graph = self.grid(cls)
+            index = build_landmarks(graph, 4)
+            pairs = [((0, 0), (11, 11)), ((5, 2), (0, 9)), ((3, 3), (3, 3))]
+            for source, target in pairs:
+                expected, _, _ = graph.dijkstra(source, target, stop_at_target=True)
+                distances, _, steps = graph.astar(source, target, index)
+                self.assertEqual(distances[target], expected[target])
+                self.assertEqual(steps[-1][target], expected[target])  # The step log replays the A* run
+            counts = compare_settled(graph, pairs, index)
+            self.assertTrue(all(astar <= dijkstra for dijkstra, astar in counts))
+            self.assertLess(counts[0][1], counts[0][0])
+
+    def test_plain_heuristic_and_unreachable_target(self):
+        graph = self.grid(Graph, 4)
+        graph.add_node('island')
+        manhattan = lambda node, target: 0 if node == target else abs(node[0] - target[0]) + abs(node[1] - target[1])
+        distances, _, _ = graph.astar((0, 0), (3, 3), manhattan)
+        self.assertEqual(distances[(3, 3)], graph.dijkstra((0, 0), None)[0][(3, 3)])
+        build_landmarks(graph, 2)
+        self.assertEqual(graph.shortest_path((0, 0), 'island'), [])
+
+    def test_landmarks_are_saved_with_the_graph(self):
+        graph = self.grid(Graph, 6, name=lambda x, y: f"{x},{y}")  # Snapshots store names as text
+        build_landmarks(graph, 3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "grid.djkg")
+            graph.save(path)
+            loaded = Graph.load(path)
+            self.assertIsInstance(loaded.landmarks, LandmarkIndex)
+            self.assertEqual(list(loaded.landmarks.from_landmark), list(graph.landmarks.from_landmark))
+            self.assertEqual(loaded.shortest_path('0,0', '5,5'), graph.shortest_path('0,0', '5,5'))
+            loaded.add_edge('0,0', '5,5', 1)  # Stale landmarks are not used or saved any more
+            self.assertEqual(loaded.shortest_path('0,0', '5,5'), ['0,0', '5,5'])
+            loaded.save(path)
+            del loaded
+            self.assertIsNone(Graph.load(path).landmarks)
+
+
+class TestContractionHierarchy(unittest.TestCase):
+    def check(self, graph, hierarchy, pairs):
+        for source, target in pairs:
+            expected, _, _ = graph.dijkstra(source, target, stop_at_target=True, record_steps=False)
+            distance, path = hierarchy.query(source, target)
+            self.assertAlmostEqual(distance, expected[target])
+            if path:
+                # The unpacked path uses original edges only and adds up to the distance
+                self.assertEqual((path[0], path[-1]), (source, target))
+                self.assertAlmostEqual(sum(graph.neighbors(a)[b] for a, b in zip(path, path[1:])), distance)
+            else:
+                self.assertEqual(expected[target], float('inf'))
+
+    def test_queries_match_dijkstra(self):
+        graph = build_graph(road_like(520), CompactGraph)
+        hierarchy = ContractionHierarchy.build(graph)
+        rng = random.Random(5)
+        names = graph.nodes()
+        self.check(graph, hierarchy, [(rng.choice(names), rng.choice(names)) for _ in range(60)])
+
+    def test_directed_graph_with_unreachable_nodes(self):
+        graph = build_graph(random_directed(160, 8, 2, (1, 15)), CompactGraph)
+        graph.add_node("alone")
+        hierarchy = ContractionHierarchy.build(graph)
+        names = graph.nodes()
+        self.check(graph, hierarchy, [(a, b) for a in names[::9] for b in names[::7]])
+
+    def test_saved_with_the_graph(self):
+        graph = build_graph(road_like(130), CompactGraph)
+        build_hierarchy(graph)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "roads.djkg")
+            graph.save(path)
+            loaded = Graph.load(path)
+            self.assertIsInstance(loaded.hierarchy, ContractionHierarchy)
+            self.assertEqual(loaded.hierarchy.size, graph.hierarchy.size)
+            self.check(loaded, loaded.hierarchy, [("n0", "n35"), ("n9", "n24")])
+            self.assertEqual(loaded.shortest_path("n0", "n35"), graph.hierarchy.query("n0", "n35")[1])
+            del loaded
+
+
+class TestPriorityQueues(unittest.TestCase):
+    def test_indexed_heap_decrease_key(self):
+        rng = random.Random(2)
+        heap = IndexedDaryHeap(200, arity=3)
+        expected = {}
+        for _ in range(600):
+            node, priority = rng.randrange(200), rng.uniform(0, 100)
+            heap.push(node, priority)
+            expected[node] = min(priority, expected.get(node, float('inf')))
+        self.assertEqual(len(heap), len(expected))  # One entry per node, no stale duplicates
+        popped = [heap.pop() for _ in range(len(heap))]
+        self.assertEqual(popped, sorted((priority, node) for node, priority in expected.items()))
+
+    def test_every_queue_matches_default_search(self):
+        for seed, weight in ((1, lambda rng: rng.randint(0, 30)), (2, lambda rng: rng.uniform(0.5, 40))):
+            rng = random.Random(seed)
+            graph = CompactGraph()
+            for _ in range(400):
+                graph.add_edge(rng.randrange(90), rng.randrange(90), weight(rng))
+            graph.freeze()
+            for source_id in (0, 17, 45):
+                expected, _, _ = graph.dijkstra_ids(source_id)
+                for name in QUEUES:
+                    distances, predecessors, _ = graph.dijkstra_ids(source_id, queue=name)
+                    self.assertEqual(list(distances), list(expected), name)
+            source, target = graph.names[45], graph.names[0]
+            distances, _, _ = graph.dijkstra(source, target, stop_at_target=True, queue="bucket")
+            self.assertEqual(distances[target], expected[0])
+
+    def test_bucket_queue_with_rounded_weight_ratio(self):
+        # 9.4 // 0.2 is 46.0 in floating point although 9.4 / 0.2 is 47, a ring sized from that dropped entries
+        # into the bucket being drained
+        graph = build_graph([(0, 1, 0.2), (1, 2, 9.4)], CompactGraph)
+        graph.freeze()
+        bucket = BucketQueue.for_graph(graph)
+        self.assertGreaterEqual(len(bucket.buckets), 49)
+        for seed in (95, 193, 285):
+            rng = random.Random(seed)
+            graph = CompactGraph()
+            for _ in range(150):
+                graph.add_edge(rng.randrange(40), rng.randrange(40), rng.choice((0.2, 0.6, 4.2, 9.4)))
+            graph.freeze()
+            for source_id in range(0, len(graph.names), 5):
+                expected, _, _ = graph.dijkstra_ids(source_id, queue="heapq")
+                distances, _, _ = graph.dijkstra_ids(source_id, queue="bucket")
+                self.assertEqual(list(distances), list(expected), (seed, source_id))
+
+    def test_bucket_queue_rejects_unusable_weights(self):
+        graph = CompactGraph()
+        graph.add_edge('A', 'B', 0)
+        graph.add_edge('B', 'C', 1.5)
+        graph.freeze()
+        with self.assertRaises(ValueError):
+            BucketQueue.for_graph(graph)
+        with self.assertRaises(ValueError):
+            graph.dijkstra_ids(0, queue="fibonacci")
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_generators_hit_requested_size(self):
+        for name, generator in GENERATORS.items():
+            edges = list(generator(2000, seed=3))
+            self.assertTrue(1000 <= len(edges) <= 4000, (name, len(edges)))
+            self.assertEqual(edges, list(generator(2000, seed=3)))  # Seeded, so runs are comparable
+            graph = Graph()
+            graph.from_dot_string(to_dot(edges[:50]))
+            self.assertEqual(len(list(graph.edges())), len(set((a, b) for a, b, _ in edges[:50])))
+
+    def test_report_is_json(self):
+        output = subprocess.run([sys.executable, "benchmark.py", "--sizes", "100", "--generators", "grid,road",
+                                 "--repeats", "1", "--no-render"],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        report = json.loads(output)
+        self.assertEqual([row["generator"] for row in report["results"]], ["grid", "road"])
+        for key in ("from_dot_string_ms", "dijkstra_ms", "shortest_path_ms", "steps_peak_bytes"):
+            self.assertIn(key, report["results"][0])
+
+
+class TestProfiling(unittest.TestCase):
+    def counted_search(self, graph, module, target, stop_at_target):
+        # Run the search with counting wrappers around the heap functions of the module it is defined in
+        counts = {"pushes": 1, "pops": 0}  # The source is put into the queue without heappush
+
+        def counting_push(queue, item):
+            counts["pushes"] += 1
+            dijkstra_push(queue, item)
+
+        def counting_pop(queue):
+            counts["pops"] += 1
+            return dijkstra_pop(queue)
+        dijkstra_push, dijkstra_pop = module.heappush, module.heappop
+        with mock.patch.object(module, "heappush", counting_push), mock.patch.object(module, "heappop", counting_pop):
+            _, _, steps = graph.dijkstra('n0', target, stop_at_target=stop_at_target)
+        return counts, steps
+
+    def test_counters_match_instrumented_run(self):
+        graph = build_graph(random_directed(320, 4, 4, (1, 30)))
+        for searched, module in ((graph, dijkstra), (CompactGraph.from_graph(graph), compact_graph)):
+            for target, stop_at_target in ((None, False), ('n7', True), ('n33', True)):
+                counts, steps = self.counted_search(searched, module, target, stop_at_target)
+                counters = dijkstra_counters(searched, steps, target if stop_at_target else None)
+                self.assertEqual((counters["pushes"], counters["pops"]), (counts["pushes"], counts["pops"]))
+                self.assertEqual(counters["stale_pops"], counters["pops"] - counters["settled"])
+        with self.assertRaises(ValueError):  # Counted from the step log, a run without one has none
+            dijkstra_counters(graph, graph.dijkstra('n0', None, record_steps=False)[2])
+
+    def test_frame_profiler_phases_and_trace(self):
+        profiler = FrameProfiler(trace_path="unused")
+        for _ in range(3):
+            profiler.start_frame()
+            profiler.lap("events")
+            profiler.lap("draw")
+            profiler.end_frame()
+        profiler.set_counters({"pushes": 3})
+        self.assertEqual(set(profiler.phase_ms()), {"events", "draw"})
+        self.assertIn("pushes 3", profiler.overlay_lines())
+        self.assertEqual(sum(1 for event in profiler.trace if event["name"] == "frame"), 3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            profiler.export_trace(path)
+            with open(path) as trace_file:
+                self.assertEqual(len(json.load(trace_file)["traceEvents"]), len(profiler.trace))
+
+
+class TestVisualizerApp(unittest.TestCase):
+    # Runs the window headless on SDL's dummy video driver
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        global pygame, pygame_gui, visualization
+        import pygame
+        import pygame_gui
+        import visualization
+
+    def setUp(self):
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "input")
+        self.input1, self.input2 = os.path.join(directory, "input1.dot"), os.path.join(directory, "input2.dot")
+        with open(self.input2) as dot_file:
+            self.app = visualization.VisualizerApp(dot_file.read(), "A", "H")
+        self.app.frame()
+
+    def tearDown(self):
+        self.app.close()
+
+    def test_new_source_reuses_the_layout(self):
+        app = self.app
+        scene, graph = visualization.getScene(app.data, app.screen), app.graph
+        app.handle_event(pygame.event.Event(pygame_gui.UI_DROP_DOWN_MENU_CHANGED, ui_element=app.source_dropdown,
+                                            text="B"))
+        self.assertEqual(app.source_node, "B")
+        self.assertIsNone(app.distances)  # The rest of the search runs in the next frames
+        self.assertTrue(app.frame())
+        self.assertEqual(app.distances["H"], graph.dijkstra("B", "H")[0]["H"])
+        self.assertIs(app.graph, graph)
+        self.assertIs(visualization.getScene(app.data, app.screen), scene)
+        self.assertEqual(app.current_snapshot_index, 0)
+
+    def test_edge_edits_repair_the_tree(self):
+        app = self.app
+        app.render_path = True
+        app.frame()
+        result = app.edit_edge('A', 'D', 1)
+        self.assertIn('D', result.changed)
+        self.assertFalse(app.button_next.is_enabled)
+        # Later edits neither search again nor redraw the whole table, only the rows of changed nodes
+        with mock.patch.object(app.graph, "dijkstra", side_effect=AssertionError("full search")), \
+                mock.patch.object(app.renderer.table, "draw", side_effect=AssertionError("full redraw")), \
+                mock.patch.object(app.renderer.table, "_draw_row", wraps=app.renderer.table._draw_row) as draw_row:
+            result = app.edit_edge('G', 'H', 30)
+            self.assertEqual(result.changed, {'H'})
+            self.assertLessEqual(draw_row.call_count, len(app.nodes))
+            app.edit_edge('B', 'E', None)
+            self.assertTrue(app.frame())
+        self.assertTrue(app.path_shown)
+        expected, _, _ = Graph.dijkstra(app.graph, 'A', None, record_steps=False)
+        self.assertEqual(app.distances, expected)
+        scene = visualization.getScene(app.data, app.screen)
+        self.assertEqual(scene.arrow_lookup[('G', 'H')].weight, 30)
+        self.assertNotIn(('B', 'E'), scene.arrow_lookup)
+        self.assertNotIn(('B', 'E', 8), app.data)
+        with self.assertRaises(ValueError):
+            app.edit_edge('A', 'Z', 1)
+        app.set_search('A', 'H')  # A new search steps again
+        self.assertTrue(app.button_next.is_enabled)
+
+    def test_profiler_laps_table_and_layout(self):
+        app = self.app
+        app.profiler = FrameProfiler()
+        pygame.event.post(pygame.event.Event(pygame_gui.UI_BUTTON_PRESSED, ui_element=app.button_next))
+        app.frame()
+        self.assertIn("table", app.profiler.phase_ms())
+        pygame.event.post(pygame.event.Event(pygame_gui.UI_FILE_DIALOG_PATH_PICKED, ui_element=None, text=self.input1))
+        app.frame()
+        self.assertIn("layout", app.profiler.phase_ms())
+
+    def test_steps_and_graph_swap(self):
+        app = self.app
+        app.set_search("A", "H")
+        self.assertFalse(app.steps.finished)  # Only the steps shown so far were computed
+        while app.button_next.is_enabled:
+            app.handle_event(pygame.event.Event(pygame_gui.UI_BUTTON_PRESSED, ui_element=app.button_next))
+        self.assertTrue(app.steps.finished)
+        self.assertEqual(app.current_snapshot_index, len(app.steps) - 1)
+        self.assertEqual(len(app.steps), len(app.graph.dijkstra("A", "H")[2]))
+        self.assertTrue(app.frame())
+        self.assertTrue(app.path_shown)
+        app.open_file(self.input1)
+        self.assertEqual(sorted(app.graph.nodes()), ['A', 'B', 'C', 'D', 'E', 'F', 'G'])
+        self.assertEqual(app.current_snapshot_index, 0)
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+        self.assertFalse(app.frame())
+
+    def test_pan_and_zoom_redraw_the_view(self):
+        app = self.app
+        camera = app.renderer.camera
+        pygame.mouse.set_pos((300, 200))
+        app.handle_event(pygame.event.Event(pygame.MOUSEWHEEL, x=0, y=2, flipped=False))
+        self.assertAlmostEqual(camera.zoom, visualization.ZOOM_STEP ** 2)
+        self.assertFalse(app.renderer.is_idle())
+        app.handle_event(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_LEFT, mod=0, unicode="", scancode=0))
+        self.assertEqual(camera.to_screen(*camera.to_world(10, 20)), (10, 20))
+        self.assertTrue(app.frame())
+        self.assertTrue(app.renderer.is_idle())
+        app.handle_event(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_HOME, mod=0, unicode="", scancode=0))
+        self.assertEqual((camera.zoom, camera.offset_x, camera.offset_y), (1.0, 0.0, 0.0))
+
+    def test_auto_play(self):
+        app = self.app
+        app.play_rate = 50
+        app.handle_event(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, mod=0, unicode=" ", scancode=0))
+        self.assertTrue(app.playing)
+        app.advance_play(0.1)
+        self.assertEqual(app.current_snapshot_index, 5)
+        app.advance_play(0.03)  # The fraction of a step carries over
+        app.advance_play(0.01)
+        self.assertEqual(app.current_snapshot_index, 7)
+        app.advance_play(100)
+        self.assertFalse(app.playing)
+        self.assertEqual(app.current_snapshot_index, len(app.steps) - 1)
+        self.assertTrue(app.render_path)
+        app.handle_event(pygame.event.Event(pygame_gui.UI_BUTTON_PRESSED, ui_element=app.button_play))
+        self.assertTrue(app.playing)
+        app.handle_event(pygame.event.Event(pygame_gui.UI_DROP_DOWN_MENU_CHANGED, ui_element=app.source_dropdown,
+                                            text="B"))
+        self.assertFalse(app.playing)
+
+    def test_table_header_sorts(self):
+        app = self.app
+        table = app.renderer.table
+        header = (table.rect.centerx, table.rect.y + table.row_height // 2)
+        app.handle_event(pygame.event.Event(pygame.MOUSEBUTTONDOWN, button=1, pos=header))
+        self.assertTrue(table.sort_by_distance)
+        self.assertEqual(table.name_at(0), "A")  # The source, at distance 0
+        self.assertFalse(app.dragging)
+        self.assertTrue(app.frame())
+
+    def run_jobs(self, app):
+        # Run frames until the compute worker is done, the frames handle its events
+        deadline = time.monotonic() + 30
+        while app.layout_job or app.search_job:
+            self.assertLess(time.monotonic(), deadline)
+            self.assertTrue(app.frame())
+
+    def test_background_layout_and_search(self):
+        app = self.app
+        app.BACKGROUND_MIN_EDGES = 0
+        with open(self.input1) as dot_file:
+            app.load_graph(dot_file.read())
+        self.assertIsNotNone(app.layout_job)
+        self.assertTrue(app.progress_bar.visible)
+        self.assertIsNone(app.steps)
+        self.run_jobs(app)
+        self.assertFalse(app.progress_bar.visible)
+        self.assertEqual(set(app.graph.layout), set(app.graph.nodes()))
+        self.assertEqual(dict(app.distances), app.graph.dijkstra(app.source_node, app.target_node)[0])
+
+        # A new source while the search runs replaces it. The rest of a big Dijkstra search runs in the background,
+        # the window thread only computed the steps it showed
+        app.handle_event(pygame.event.Event(pygame_gui.UI_DROP_DOWN_MENU_CHANGED, ui_element=app.source_dropdown,
+                                            text="B"))
+        first = app.search_job
+        app.handle_event(pygame.event.Event(pygame_gui.UI_DROP_DOWN_MENU_CHANGED, ui_element=app.source_dropdown,
+                                            text="C"))
+        self.assertTrue(first.cancelled)
+        self.assertIsNone(app.distances)
+        self.assertFalse(app.steps.finished)
+        self.run_jobs(app)
+        self.assertEqual(app.source_node, "C")
+        self.assertTrue(app.steps.finished)
+        self.assertEqual(app.distances[app.target_node], app.graph.dijkstra("C", app.target_node)[0][app.target_node])
+
+        app.algorithm = "astar"  # A* searches big graphs in the background as a whole
+        app.set_search("B", app.target_node)
+        self.assertIsNone(app.steps)
+        self.run_jobs(app)
+        self.assertEqual(app.distances[app.target_node], app.graph.dijkstra("B", app.target_node)[0][app.target_node])
+
+    def test_big_dijkstra_search_is_finished_on_the_worker(self):
+        app = self.app
+        edges = list(GENERATORS["grid"](1200, seed=4))
+        app.BACKGROUND_MIN_EDGES = len(edges)  # Just big enough to go to the worker
+        settled_on, searched_on = [], []  # Threads that settled nodes and that ran whole searches
+        lazy_steps, full_search = Graph._dijkstra_steps, Graph.dijkstra
+
+        def recording_steps(graph, source, steps):
+            search = lazy_steps(graph, source, steps)
+            while True:
+                try:
+                    node = next(search)
+                except StopIteration as stop:
+                    return stop.value
+                settled_on.append(threading.current_thread())
+                yield node
+
+        def recording_search(graph, *args, **kwargs):
+            searched_on.append(threading.current_thread())
+            return full_search(graph, *args, **kwargs)
+        with mock.patch.object(Graph, "_dijkstra_steps", recording_steps), \
+                mock.patch.object(Graph, "dijkstra", recording_search), \
+                mock.patch.object(Graph, "astar", side_effect=AssertionError("A* search")):
+            app.load_graph(to_dot(edges))
+            self.run_jobs(app)  # The layout and the search from the first source
+            self.assertEqual(searched_on.count(threading.main_thread()), 0)
+            del settled_on[:]
+            app.handle_event(pygame.event.Event(pygame_gui.UI_DROP_DOWN_MENU_CHANGED, ui_element=app.source_dropdown,
+                                                text="n5"))
+            self.assertIsNotNone(app.search_job)
+            self.assertIsNone(app.distances)  # Nothing waits for the search on the window thread
+            app.handle_event(pygame.event.Event(pygame_gui.UI_BUTTON_PRESSED, ui_element=app.button_path))
+            app.handle_event(pygame.event.Event(pygame_gui.UI_BUTTON_PRESSED, ui_element=app.button_next))
+            self.run_jobs(app)
+            self.assertTrue(app.frame())
+            self.assertTrue(app.path_shown)
+        main = threading.main_thread()
+        self.assertEqual(searched_on.count(main), 0)
+        self.assertLessEqual(settled_on.count(main), 2)  # Step 0 and at most the step Next showed
+        self.assertEqual(len(settled_on), len(app.graph.nodes()))
+        self.assertTrue(app.steps.finished)
+        self.assertEqual(dict(app.distances), app.graph.dijkstra("n5", None)[0])
+
+
+class TestDistanceTable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        global pygame, visualization
+        import pygame
+        import visualization
+
+    def setUp(self):
+        pygame.init()
+        self.screen = pygame.display.set_mode((1200, 800))
+        self.graph = build_graph(random_directed(900, 5, 3))
+        self.nodes = {node: None for node in self.graph.nodes()}
+        _, _, self.steps = self.graph.dijkstra("n0", None)
+
+    def tearDown(self):
+        pygame.quit()
+        visualization._fonts.clear()
+        visualization.text_cache.clear()
+
+    def table(self, surface):
+        table = visualization.DistanceTable(self.nodes, self.screen, visualization.getFont("label"), 0xDDF2EB,
+                                            0x606d5d, (255, 0, 255))
+        surface.fill((255, 0, 255))
+        return table
+
+    def test_rows_are_virtualized(self):
+        surface = pygame.Surface(self.screen.get_size())
+        table = self.table(surface)
+        self.assertLess(table.visible_rows, len(self.nodes))
+        self.assertGreaterEqual(table.row_height, visualization.TABLE_ROW_HEIGHT)
+        table.update(surface, self.steps.cursor().state)
+        self.assertLessEqual(len(table.rows), table.visible_rows)
+        self.assertTrue(table.scroll_by(1000))
+        self.assertEqual(table.scroll, len(self.nodes) - table.visible_rows)
+        self.assertFalse(table.scroll_by(1))
+
+    def test_step_updates_match_full_redraw(self):
+        for sort in (False, True):
+            incremental, full = pygame.Surface(self.screen.get_size()), pygame.Surface(self.screen.get_size())
+            table, fresh = self.table(incremental), self.table(full)
+            if sort:
+                table.toggle_sort()
+            cursor = self.steps.cursor()
+            table.update(incremental, cursor.state)
+            for k in range(1, len(self.steps), 7):
+                changed = self.steps.changed_nodes(cursor.index, k)
+                rects = table.update(incremental, cursor.seek(k), changed)
+                self.assertLessEqual(len(rects), table.visible_rows)
+            if sort:
+                self.assertEqual(table.keys, sorted((cursor.state.get(name, math.inf), name) for name in self.nodes))
+                fresh.toggle_sort()
+            fresh.update(full, cursor.state)
+            self.assertEqual(pygame.image.tobytes(incremental, "RGB"), pygame.image.tobytes(full, "RGB"))
+
+
+class TestExportFrames(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        global export_frames
+        import export_frames
+
+    def setUp(self):
+        self.input2 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "input", "input2.dot")
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def test_pool_matches_single_process(self):
+        size = (400, 300)
+        outputs = []
+        for workers in (1, 3):
+            path = os.path.join(self.directory, f"{workers}.raw")
+            count = export_frames.export_frames(self.input2, "A", "H", path, "raw", workers, size, chunk_size=2)
+            with open(path, "rb") as raw_file:
+                outputs.append(raw_file.read())
+        _, _, steps = load_graph(self.input2).dijkstra("A", "H")
+        self.assertEqual(count, len(steps) + 1)
+        frame_bytes = size[0] * size[1] * 3
+        self.assertEqual(len(outputs[0]), count * frame_bytes)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertNotEqual(outputs[0][-frame_bytes:], outputs[0][-2 * frame_bytes:-frame_bytes])  # Path shown
+
+    def test_raw_frames_without_pwrite(self):
+        size = (200, 150)
+        outputs = []
+        for pwrite in (True, False):
+            path = os.path.join(self.directory, f"{pwrite}.raw")
+            with mock.patch.object(export_frames, "PWRITE", pwrite):
+                export_frames.export_frames(self.input2, "A", "H", path, "raw", 1, size)
+            with open(path, "rb") as raw_file:
+                outputs.append(raw_file.read())
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_png_frames(self):
+        count = export_frames.export_frames(self.input2, "A", "H", self.directory, "png", 2, (400, 300))
+        self.assertEqual(sorted(os.listdir(self.directory)), [export_frames.FRAME_NAME % k for k in range(count)])
+
+
+class TestComputeWorker(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        self.finished = threading.Event()
+
+        def notify(status, job):
+            self.events.append((status, job))
+            if status != "progress":
+                self.finished.set()
+        self.worker = ComputeWorker(notify)
+
+    def tearDown(self):
+        self.worker.close()
+
+    def test_progress_and_result(self):
+        graph = Graph()
+        for i in range(5000):
+            graph.add_edge(f"n{i}", f"n{i + 1}", 1)
+        job = self.worker.submit("search", graph.dijkstra, "n0", None)
+        self.assertTrue(self.finished.wait(10))
+        statuses = [status for status, event_job in self.events if event_job is job]
+        self.assertEqual(statuses[-1], "done")
+        self.assertGreaterEqual(statuses.count("progress"), 4)  # Every PROGRESS_INTERVAL of 5001 nodes
+        self.assertEqual(job.result[0]["n5000"], 5000)
+
+    def test_cancel_running_job(self):
+        started = threading.Event()
+
+        def endless(progress):
+            started.set()
+            while True:
+                progress(0, 1)
+                time.sleep(0.001)
+        job = self.worker.submit("search", endless)
+        self.assertTrue(started.wait(10))
+        replacement = self.worker.submit("search", lambda progress: "second")
+        self.assertTrue(job.cancelled)
+        deadline = time.monotonic() + 10
+        while len(self.events) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual([status for status, _ in self.events], ["cancelled", "done"])
+        self.assertEqual(replacement.result, "second")
+        self.assertFalse(self.worker.busy())
+
+    def test_failure_is_reported(self):
+        def broken(progress):
+            raise ValueError("no such node")
+        job = self.worker.submit("layout", broken)
+        self.assertTrue(self.finished.wait(10))
+        self.assertEqual(self.events, [("failed", job)])
+        self.assertIsInstance(job.error, ValueError)
+
+
+class TestViewCulling(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        global pygame, visualization
+        import pygame
+        import visualization
+
+    def test_grid_query_matches_brute_force(self):
+        rng = random.Random(5)
+        grid = visualization.SpatialGrid(cell_size=10)
+        boxes = []
+        for i in range(300):
+            x, y = rng.uniform(-100, 100), rng.uniform(-100, 100)
+            box = (x, y, x + rng.uniform(0, 30), y + rng.uniform(0, 30))
+            boxes.append(box)
+            grid.insert(i, *box)
+        for x0, y0, x1, y1 in ((-20, -20, 20, 20), (50, -90, 60, 95), (-500, -500, 500, 500)):
+            expected = [i for i, (a, b, c, d) in enumerate(boxes) if a <= x1 and c >= x0 and b <= y1 and d >= y0]
+            found = grid.query(x0, y0, x1, y1)
+            self.assertEqual([i for i in found if i in expected], expected)  # Whole cells may add a few more
+            self.assertEqual(found, sorted(set(found)))
+
+    def test_chains_cover_every_edge_once(self):
+        rng = random.Random(6)
+        edges = list({(rng.randrange(40), rng.randrange(40)) for _ in range(150)})
+        chains = visualization.chain_edges(edges, max_length=8)
+        covered = sorted(tuple(sorted(pair)) for chain in chains for pair in zip(chain, chain[1:]))
+        self.assertEqual(covered, sorted(tuple(sorted(edge)) for edge in edges))
+        self.assertTrue(all(len(chain) <= 8 for chain in chains))
+        self.assertLess(len(chains), len(edges))
+
+    def test_zoomed_out_view_batches_lines_and_culls(self):
+        pygame.init()
+        try:
+            surface = pygame.Surface((1200, 800))
+            data = visualization.parseInput(to_dot(GENERATORS["grid"](2000, seed=1)))
+            side = round((2000 / 4) ** 0.5)
+            visualization.setLayout(data, {f"n{i}": ((i % side) / side * 2 - 1, (i // side) / side * 2 - 1)
+                                           for i in range(side * side)})
+            font = visualization.getFont("label")
+            nodes, arrows = visualization.renderGraph(data, surface, font, surface, None, None)
+            self.assertEqual((len(nodes), arrows), (side * side, []))  # Short edges, so no arrows at zoom 1
+
+            camera = visualization.Camera()
+            camera.zoom_at(8, (600, 400))
+            nodes, arrows = visualization.renderGraph(data, surface, font, surface, None, None, camera=camera)
+            self.assertTrue(arrows)
+            self.assertLess(len(nodes), side * side / 4)
+            x0, y0, x1, y1 = camera.world_rect((1200, 800))
+            self.assertTrue(any(x0 <= node.x <= x1 and y0 <= node.y <= y1 for node in nodes))
+        finally:
+            visualization.invalidateScene()
+            visualization._fonts.clear()
+            visualization.text_cache.clear()
+            pygame.quit()
+
+
+class TestLayout(unittest.TestCase):
+    def setUp(self):
+        layout._store.clear()
+        self.edges = list(GENERATORS["grid"](1600, seed=2))
+
+    def edge_ratio(self, positions):
+        # Median distance of random node pairs over the median edge length, large for a readable layout
+        rng = random.Random(1)
+        nodes = list(positions)
+        pairs = sorted(math.dist(positions[rng.choice(nodes)], positions[rng.choice(nodes)]) for _ in range(500))
+        lengths = sorted(math.dist(positions[a], positions[b]) for a, b, _ in self.edges)
+        return pairs[len(pairs) // 2] / lengths[len(lengths) // 2]
+
+    def test_force_layout_is_normalized_and_keeps_neighbors_close(self):
+        positions = layout.force_layout(self.edges)
+        self.assertEqual(len(positions), 400)
+        self.assertAlmostEqual(max(abs(c) for position in positions.values() for c in position), 1.0)
+        self.assertGreater(self.edge_ratio(positions), 4)
+
+    def test_warm_start_keeps_known_nodes_in_place(self):
+        positions = layout.force_layout(self.edges)
+        self.edges.append(("n0", "new", 1))
+        warm = layout.compute_layout(self.edges, initial=positions)
+        self.assertIn("new", warm)
+        moved = sorted(math.dist(positions[node], warm[node]) for node in positions)
+        lengths = sorted(math.dist(positions[a], positions[b]) for a, b, _ in self.edges[:-1])
+        self.assertLess(moved[len(moved) // 2], lengths[len(lengths) // 2])  # Less than an edge
+        self.assertLess(math.dist(warm["new"], warm["n0"]), 3 * lengths[len(lengths) // 2])
+        self.assertGreater(self.edge_ratio(warm), 4)
+
+    def test_engine_choice(self):
+        self.assertEqual(layout.choose_engine(10), "spectral")
+        self.assertEqual(layout.choose_engine(layout.SPECTRAL_MAX_NODES + 1), "force")
+        self.assertEqual(layout.choose_engine(10, initial={"A": (0, 0)}), "force")
+        with self.assertRaises(ValueError):
+            layout.compute_layout(self.edges, engine="circular")
+
+    def test_layouts_are_stored_by_graph(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(os.environ, {layout.CACHE_ENV: directory}):
+            with mock.patch.object(layout, "compute_layout", wraps=layout.compute_layout) as compute:
+                first = layout.layout_for(self.edges)
+                self.assertEqual(layout.layout_for(list(self.edges)), first)  # Same graph parsed again
+                layout._store.clear()
+                self.assertEqual(layout.layout_for(list(self.edges)), first)  # From the cache directory
+                self.assertEqual(compute.call_count, 1)
+                # A warm start is part of the key, its layout is not the one of a cold start
+                initial = {"n0": (5.0, 5.0)}
+                warm = layout.layout_for(self.edges, initial=initial)
+                self.assertEqual(compute.call_count, 2)
+                self.assertEqual(layout.layout_for(self.edges, initial=dict(initial)), warm)
+                self.assertEqual(compute.call_count, 2)
+        self.assertEqual(layout.graph_key(iter(self.edges)), layout.graph_key(self.edges))
+
+    def test_visualization_does_not_import_networkx(self):
+        code = "import sys, visualization; print('networkx' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+        self.assertEqual(output.strip(), "False")
+
+
+class TestStepLog(unittest.TestCase):
+    def setUp(self):
+        # Random graph big enough to produce several checkpoints
+        self.graph = build_graph(random_directed(240, 7))
+
+    def snapshots(self, log):
+        # Full-dict snapshots the way dijkstra used to record them
+        state, result = {}, [{}]
+        for k in range(1, len(log)):
+            node, distance, _, _ = log.delta(k)
+            state[node] = distance
+            result.append(dict(state))
+        return result
+
+    def test_random_access_matches_snapshots(self):
+        _, _, steps = self.graph.dijkstra('n0', 'n1')
+        steps.checkpoint_interval = 8
+        expected = self.snapshots(steps)
+        self.assertEqual(len(steps), len(expected))
+        for k in range(len(steps)):
+            self.assertEqual(steps[k], expected[k])
+        self.assertEqual(steps[-1], expected[-1])
+
+    def test_checkpoints_are_used(self):
+        log = StepLog(checkpoint_interval=4)
+        for i in range(20):
+            log.record('A', i)
+        self.assertGreater(len(log.checkpoint_steps), 1)
+        self.assertEqual(log[13], {'A': 12})
+        self.assertEqual(log[0], {})
+
+    def test_checkpoint_spacing_is_fixed(self):
+        # Nodes interned while recording do not move the spacing the checkpoints and seek use
+        log = StepLog(checkpoint_interval=4)
+        for i in range(20):
+            log.record(f"n{i}", i)
+        self.assertEqual(log.checkpoint_spacing, 4)
+        self.assertEqual(log.checkpoint_steps, [0, 4, 8, 12, 16, 20])
+        cursor = log.cursor()
+        cursor.seek(13)
+        self.assertEqual(cursor.state, log[13])
+        _, _, steps = self.graph.dijkstra('n0', None)
+        self.assertEqual(steps.checkpoint_spacing, max(steps.checkpoint_interval, len(self.graph.graph)))
+
+    def test_checkpoint_bounds(self):
+        # Every step is less than one spacing after a checkpoint, and the checkpoints hold no more entries than
+        # there are deltas
+        _, _, full = self.graph.dijkstra('n0', None)
+        lazy = self.graph.dijkstra_lazy('n0')
+        lazy.finish()
+        small = StepLog(checkpoint_interval=1, node_count=5)
+        for i in range(40):
+            small.record(f"n{i % 5}", i)
+        self.assertEqual(small.checkpoint_spacing, 5)
+        for log in (full, lazy, small):
+            for k in range(len(log)):
+                start = log.checkpoint_steps[bisect.bisect_right(log.checkpoint_steps, k) - 1]
+                self.assertLess(k - start, log.checkpoint_spacing)
+            self.assertLessEqual(sum(len(state) for state in log.checkpoint_states), len(log) - 1)
+
+    def test_lazy_search_runs_in_slices(self):
+        steps = self.graph.dijkstra_lazy('n0')
+        self.assertFalse(steps.run_for(0))
+        self.assertEqual(len(steps), 1)  # Not even started
+        self.assertTrue(steps.run_for(60))
+        self.assertEqual(dict(FinalDistances(steps)), self.graph.dijkstra('n0', None)[0])
+
+    def test_cursor_moves_both_ways(self):
+        _, _, steps = self.graph.dijkstra('n0', 'n1')
+        expected = self.snapshots(steps)
+        cursor = steps.cursor()
+        for k in range(1, len(steps)):
+            self.assertEqual(cursor.next(), expected[k])
+        for k in range(len(steps) - 2, -1, -1):
+            self.assertEqual(cursor.prev(), expected[k])
+        self.assertEqual(cursor.seek(len(steps) - 1), expected[-1])
+
+    def test_lazy_log_matches_full_run(self):
+        for graph in (self.graph, CompactGraph.from_graph(self.graph)):
+            distances, _, steps = graph.dijkstra('n0', None)
+            lazy = graph.dijkstra_lazy('n0')
+            self.assertEqual(len(lazy), 1)
+            self.assertEqual(lazy.cursor().seek(10), steps[10])
+            self.assertLess(len(lazy), len(steps))  # Only a few nodes were settled to get there
+            self.assertEqual(list(lazy), list(steps))
+            self.assertTrue(lazy.finished)
+            self.assertEqual(dict(FinalDistances(lazy)), dict(distances))
+            self.assertEqual(list(lazy.settled), list(steps.settled))
+
+    def test_final_step_matches_distances(self):
+        distances, _, steps = self.graph.dijkstra('n0', 'n1')
+        reached = {node: d for node, d in distances.items() if d != float('inf')}
+        self.assertEqual(steps[-1], reached)
+
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -7,11 +7,17 @@ from pygame.rect import Rect
 # PyGame ⬆
 
 import math
-import networkx as nx
-# networkX ⬆
+from bisect import bisect_left
+from collections import OrderedDict
 
-from dijkstra import re
 from dijkstra import Graph
+from dot_parser import iter_dot
+from landmarks import build_landmarks
+from layout import layout_for
+from profiling import dijkstra_counters, profiler_from_env
+from snapshot import is_snapshot
+from step_log import INF, FinalDistances
+from worker import ComputeWorker
 # functions from dijkstra header ⬆
 
 import pygame_gui
@@ -19,6 +25,54 @@ from pygame_gui.windows.ui_file_dialog import UIFileDialog
 
 # UI elements and file systems ⬆
 
+INFINITY = "\N{INFINITY}"  # Shown in the table for nodes that were not reached yet
+
+IDLE_WAIT_MS = 500  # How long the main loop sleeps on the event queue when nothing needs redrawing
+WORKER_EVENT = pygame.event.custom_type()  # Progress and results of the background jobs, see worker.py
+PLAY_RATE = 10  # Steps per second shown by auto-play
+SEARCH_FRAME_BUDGET = 0.004  # Seconds per frame spent on the rest of a lazy search on the window thread
+TABLE_ROW_HEIGHT = 24  # Smallest row height of the distance table, more rows than fit are scrolled to
+TABLE_ROW_CACHE = 512  # Rendered table rows kept
+TABLE_REDRAW_LIMIT = 256  # A step that changed more nodes than this redraws the whole table
+TABLE_SCROLL_ROWS = 3  # Rows per mouse wheel notch over the table
+
+_fonts = {}  # Fonts are loaded once, SysFont does a system font lookup and a file load on every call
+
+
+def getFont(name):
+    if not _fonts:
+        _fonts["label"] = pygame.font.SysFont("Arial", 14, italic=True)
+        _fonts["edge_weight"] = pygame.font.SysFont("serif", 12)
+    return _fonts[name]
+
+
+class TextCache:
+    # LRU cache of rendered text surfaces shared by every render function.
+    # Node IDs, edge weights and table cells are the same few strings every frame,
+    # so they are rasterized once and then only blitted
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, False, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_entries:
+                self.surfaces.popitem(last=False)  # Evict the least recently used surface
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+text_cache = TextCache()
+
+
 class Object:
     def __init__(self, x, y, name, type='node', radius=None, center=None, weight=None):
         self.radius = radius
@@ -43,35 +97,42 @@ class Arrow(Object):
         self.shaft_length = math.sqrt(
             (end_pos[0] - start_pos[0]) ** 2 + (end_pos[1] - start_pos[1]) ** 2) - self.arrow_size
 
-    def render(self, surface, font, background_color, color):
+    def render(self, surface, font, background_color, color, camera=None, detail=True):
+        # camera maps the scene positions to the screen (see Camera), without one they are drawn as they are.
+        # Without detail only the shaft is drawn, for zoomed out views where heads and weights are unreadable
+        start_pos, end_pos, zoom = self.start_pos, self.end_pos, 1
+        if camera is not None:
+            start_pos, end_pos, zoom = camera.to_screen(*start_pos), camera.to_screen(*end_pos), camera.zoom
+
         # Calculate the angle between the nodes
-        angle = math.atan2(self.end_pos[1] - self.start_pos[1], self.end_pos[0] - self.start_pos[0])
+        angle = math.atan2(end_pos[1] - start_pos[1], end_pos[0] - start_pos[0])
 
         # Calculate positions for arrow start and end
-        arrow_start_x = self.start_pos[0] + 13 * math.cos(
+        arrow_start_x = start_pos[0] + 13 * zoom * math.cos(
             angle)  # Move 13 pixels (scaled node radius) outward from the center of start node
-        arrow_start_y = self.start_pos[1] + 13 * math.sin(angle)
-        arrow_end_x = self.end_pos[0] - 13 * math.cos(
+        arrow_start_y = start_pos[1] + 13 * zoom * math.sin(angle)
+        arrow_end_x = end_pos[0] - 13 * zoom * math.cos(
             angle)  # Move 13 pixels (scaled node radius) inward from the center of end node
-        arrow_end_y = self.end_pos[1] - 13 * math.sin(angle)
+        arrow_end_y = end_pos[1] - 13 * zoom * math.sin(angle)
 
         # Draw the arrow shaft (line) from the adjusted start position to the adjusted end position
         pygame.draw.line(surface, (color), (arrow_start_x, arrow_start_y), (arrow_end_x, arrow_end_y), 2)
+        if not detail:
+            return
 
         # Draw the arrowhead (triangle) pointing towards the end node
-        arrow_x1 = arrow_end_x - self.arrow_size * math.cos(angle - math.pi / 6)
-        arrow_y1 = arrow_end_y - self.arrow_size * math.sin(angle - math.pi / 6)
-        arrow_x2 = arrow_end_x - self.arrow_size * math.cos(angle + math.pi / 6)
-        arrow_y2 = arrow_end_y - self.arrow_size * math.sin(angle + math.pi / 6)
+        arrow_size = self.arrow_size * zoom
+        arrow_x1 = arrow_end_x - arrow_size * math.cos(angle - math.pi / 6)
+        arrow_y1 = arrow_end_y - arrow_size * math.sin(angle - math.pi / 6)
+        arrow_x2 = arrow_end_x - arrow_size * math.cos(angle + math.pi / 6)
+        arrow_y2 = arrow_end_y - arrow_size * math.sin(angle + math.pi / 6)
 
         pygame.draw.polygon(surface, color,
                             [(arrow_end_x, arrow_end_y), (arrow_x1, arrow_y1), (arrow_x2, arrow_y2)])
 
         # Render and rotate the text to match the angle of the arrow
         # Position the rotated text at the end of the arrow
-        edge_weight_font = pygame.font.SysFont("serif", 12)
-
-        text = edge_weight_font.render(f"{self.weight}", False, (0, 221, 242))
+        text = text_cache.render(getFont("edge_weight"), f"{self.weight}", (0, 221, 242))
 
         mid_x, mid_y = (arrow_start_x + arrow_end_x) / 2, (arrow_start_y + arrow_end_y) / 2
         surface.blit(text,
@@ -81,142 +142,507 @@ class Arrow(Object):
 # Function to reParse the DOT graph input in order to visualize the graph
 def parseInput(input_string):
     edges = []
-    # Regular expression to match lines in the format: A -- B [weight=3]
-    pattern = r'(\w+)\s--\s(\w+)\s\[weight=([0-9.]+)\]'
-
-    # Iterate through each line in the input string
-    for match in re.finditer(pattern, input_string):
-        nodeA = match.group(1)
-        nodeB = match.group(2)
-        edgeWeight = float(match.group(3))
-        edges.append((nodeA, nodeB, edgeWeight))  # Store as a tuple
+    if isinstance(input_string, Graph):
+        # Already loaded graph (e.g. a snapshot), nodes without any edges become self loops as well
+        connected = set()
+        for nodeA, nodeB, edgeWeight in input_string.edges():
+            edges.append((nodeA, nodeB, edgeWeight))
+            connected.add(nodeA)
+            connected.add(nodeB)
+        edges.extend((node, node, 0.0) for node in input_string.nodes() if node not in connected)
+        return edges
+
+    # Same parser as Graph.load_dot, nodes declared on their own become self loops like "D -- D [weight=0]"
+    for nodeA, nodeB, edgeWeight in iter_dot(input_string):
+        if nodeB is None:
+            edges.append((nodeA, nodeA, 0.0))
+        else:
+            edges.append((nodeA, nodeB, edgeWeight))  # Store as a tuple
 
     return edges
 
 
-def renderGraph(graph, surface, font, screen, distances, source_node, opacity=255):
-    nodes = set()
-    edges = []
-
-    # Use NetworkX to calculate node positions (X, Y)
-    nx_graph = nx.DiGraph()  # Directed graph
-    for from_node, to_node, weight in graph:
-        nx_graph.add_edge(from_node, to_node, weight=weight)
-
-    # Use a NetworkX layout (spring layout in this case)
-    node_positions = nx.spectral_layout(nx_graph)
-
-    global SCALE_DIV_X,SCALE_DIV_Y = 2.7, 2.2
-
-    center_x, center_y = surface.get_width() / SCALE_DIV_X, surface.get_height() / SCALE_DIV_Y
-
-    # Scale the node positions (optional, to fit in Pygame window)
-    global SCALE_FACTOR = 300  # Scale factor to adjust the layout to the Pygame window size
-    node_positions = {node: (pos[0] * SCALE_FACTOR + center_x, pos[1] * SCALE_FACTOR + center_y)
-                      for node, pos in node_positions.items()}
-
-    global PROGRAMMERS_PI = 3
-    # Determine the size of the circle (based on the number of nodes)
-    radius = min(surface.get_width(), surface.get_height()) / PROGRAMMERS_PI
-    center_x, center_y = surface.get_width() / scale_div_x, surface.get_height() / PROGRAMMERS_PI
-
-    # Collect unique nodes and edges
-    for A, B, weight in graph:
-        if A is not B:  # Due to the existence of nodes without outgoing edges we need to check in order not to render its edges and to add it twice
+# Layout scale constants used to fit the normalized layout positions into the window
+SCALE_DIV_X, SCALE_DIV_Y = 2.7, 2.2
+SCALE_FACTOR = 300  # Scale factor to adjust the layout to the Pygame window size
+SCALE_MULTIPLIER = 1.3  # Node circles are drawn 30% bigger than their logical radius
+X_DIV, Y_DIV = 2.4, 2.2  # Offsets used to roughly center node IDs inside their circles
+
+# Pan / zoom and level of detail
+MIN_ZOOM, MAX_ZOOM = 0.05, 20.0
+ZOOM_STEP = 1.15  # Zoom factor of one mouse wheel notch or +/- key press
+PAN_STEP = 60  # Pixels the view moves per arrow key press
+DETAIL_EDGE_PIXELS = 40  # Below this median on-screen edge length weights, arrowheads and labels are left out
+GRID_CELL = 64  # Size of a spatial grid cell in scene coordinates, for graphs without edges
+GRID_CELL_EDGES = 2  # Otherwise cells are this many median edge lengths wide
+CHAIN_LENGTH = 64  # Most points in one batched line, keeps the boxes used for culling small
+
+
+class Camera:
+    # Pan and zoom of the graph view: screen = scene position * zoom + offset. The scene positions are already
+    # fitted to the window, so the default camera draws the graph exactly as it was drawn before there was one
+    def __init__(self, zoom=1.0, offset=(0.0, 0.0)):
+        self.zoom = zoom
+        self.offset_x, self.offset_y = offset
+
+    def to_screen(self, x, y):
+        return x * self.zoom + self.offset_x, y * self.zoom + self.offset_y
+
+    def to_world(self, x, y):
+        return (x - self.offset_x) / self.zoom, (y - self.offset_y) / self.zoom
+
+    def pan(self, dx, dy):
+        self.offset_x += dx
+        self.offset_y += dy
+
+    def zoom_at(self, factor, screen_pos):
+        # Zoom keeping the scene point under screen_pos (usually the mouse) where it is
+        world_x, world_y = self.to_world(*screen_pos)
+        self.zoom = min(MAX_ZOOM, max(MIN_ZOOM, self.zoom * factor))
+        self.offset_x = screen_pos[0] - world_x * self.zoom
+        self.offset_y = screen_pos[1] - world_y * self.zoom
+
+    def reset(self):
+        self.zoom = 1.0
+        self.offset_x = self.offset_y = 0.0
+
+    def world_rect(self, size):
+        # (x0, y0, x1, y1) of the scene area a surface of the given size shows
+        x0, y0 = self.to_world(0, 0)
+        x1, y1 = self.to_world(*size)
+        return x0, y0, x1, y1
+
+
+class SpatialGrid:
+    # Uniform grid over scene coordinates, every cell lists the items whose bounding box touches it.
+    # A query only looks at the cells under the visible area (or at the occupied cells, if there are fewer),
+    # so culling costs what is on screen and not what is in the graph
+    def __init__(self, cell_size=GRID_CELL):
+        self.cell_size = cell_size
+        self.cells = {}  # (column, row) -> item indices
+        self.items = []
+        self.bounds = None  # (x0, y0, x1, y1) around every item
+
+    def insert(self, item, x0, y0, x1, y1):
+        index = len(self.items)
+        self.items.append(item)
+        size, cells = self.cell_size, self.cells
+        for column in range(int(x0 // size), int(x1 // size) + 1):
+            for row in range(int(y0 // size), int(y1 // size) + 1):
+                cells.setdefault((column, row), []).append(index)
+        if self.bounds is None:
+            self.bounds = (x0, y0, x1, y1)
+        else:
+            bx0, by0, bx1, by1 = self.bounds
+            self.bounds = (min(bx0, x0), min(by0, y0), max(bx1, x1), max(by1, y1))
+
+    def query(self, x0, y0, x1, y1):
+        # Items whose box may touch the area, each once and in insertion order so drawing order stays stable
+        if self.bounds is None:
+            return []
+        bx0, by0, bx1, by1 = self.bounds
+        if x0 <= bx0 and y0 <= by0 and x1 >= bx1 and y1 >= by1:
+            return self.items  # Everything is in view, skip the cells
+        size = self.cell_size
+        columns = range(int(x0 // size), int(x1 // size) + 1)
+        rows = range(int(y0 // size), int(y1 // size) + 1)
+        found = set()
+        if len(columns) * len(rows) <= len(self.cells):
+            for column in columns:
+                for row in rows:
+                    found.update(self.cells.get((column, row), ()))
+        else:
+            for (column, row), indices in self.cells.items():
+                if column in columns and row in rows:
+                    found.update(indices)
+        items = self.items
+        return [items[index] for index in sorted(found)]
+
+
+def chain_edges(edges, max_length=CHAIN_LENGTH):
+    # Split edges (pairs of nodes) into chains of consecutive edges a-b, b-c, c-d ... so every chain is drawn
+    # with one pygame.draw.lines call. Direction is ignored, batched edges have no arrowheads. Greedy walk:
+    # start at an edge that is not in a chain yet and keep taking an unused edge at the last node
+    incident = {}
+    for index, (a, b) in enumerate(edges):
+        incident.setdefault(a, []).append(index)
+        incident.setdefault(b, []).append(index)
+    used = bytearray(len(edges))
+    chains = []
+    for index, (a, b) in enumerate(edges):
+        if used[index]:
+            continue
+        used[index] = 1
+        chain = [a, b]
+        node = b
+        while len(chain) < max_length:
+            candidates = incident[node]
+            while candidates and used[candidates[-1]]:
+                candidates.pop()
+            if not candidates:
+                break
+            following = candidates.pop()
+            used[following] = 1
+            a, b = edges[following]
+            node = b if a == node else a
+            chain.append(node)
+        chains.append(chain)
+    return chains
+
+
+class Scene:
+    # Everything about the drawn graph that does not change from frame to frame:
+    # node positions and the node / arrow objects built from them
+    def __init__(self, graph, size, layout):
+        self.graph = graph  # Edge list the scene was built from
+        self.size = size  # Window size the positions were scaled to
+
+        center_x, center_y = size[0] / SCALE_DIV_X, size[1] / SCALE_DIV_Y
+        node_positions = {node: (pos[0] * SCALE_FACTOR + center_x, pos[1] * SCALE_FACTOR + center_y)
+                          for node, pos in layout.items()}
+
+        nodes = set()
+        edges = []
+        # Collect unique nodes and edges
+        for A, B, weight in graph:
             nodes.add(A)
             nodes.add(B)
-            edges.append((A, B, weight))
-
-    # Create node objects
-    node_objects = {
-        node: Object(
-            x=node_positions[node][0],
-            y=node_positions[node][1],
-            name=node,
-            type='node',
-            radius=13,
-        )
-        for node in nodes
-    }
-
-    # Create edge (arrow) objects
-    arrow_objects = [
-        Arrow(
-            start_node=nodeA,
-            end_node=nodeB,
-            weight=weight,
-            start_pos=node_positions[nodeA],
-            end_pos=node_positions[nodeB],
-            name=f"{nodeA}-{nodeB}"
-        )
-        for nodeA, nodeB, weight in edges
-    ]
+            if A != B:  # Self loops only declare nodes without outgoing edges, they are never drawn
+                edges.append((A, B, weight))
+
+        # Create node objects
+        self.node_objects = {
+            node: Object(
+                x=node_positions[node][0],
+                y=node_positions[node][1],
+                name=node,
+                type='node',
+                radius=13,
+            )
+            for node in nodes
+        }
+
+        # Create edge (arrow) objects
+        self.arrow_objects = [
+            Arrow(
+                start_node=nodeA,
+                end_node=nodeB,
+                weight=weight,
+                start_pos=node_positions[nodeA],
+                end_pos=node_positions[nodeB],
+                name=f"{nodeA}-{nodeB}"
+            )
+            for nodeA, nodeB, weight in edges
+        ]
+        # Arrows by (start, end) so path highlighting does not scan every edge
+        self.arrow_lookup = {(arrow.start_node, arrow.end_node): arrow for arrow in self.arrow_objects}
+        self._index = None  # Spatial grids and batched lines, built on the first draw
+
+    def _build_index(self):
+        lengths = sorted(math.hypot(arrow.end_pos[0] - arrow.start_pos[0], arrow.end_pos[1] - arrow.start_pos[1])
+                         for arrow in self.arrow_objects)
+        median = lengths[len(lengths) // 2] if lengths else 0
+        # Cells a few edges wide hold a handful of nodes each in dense and in sparse graphs
+        cell_size = max(4.0, GRID_CELL_EDGES * median) if median else GRID_CELL
+        node_grid, arrow_grid, chain_grid = SpatialGrid(cell_size), SpatialGrid(cell_size), SpatialGrid(cell_size)
+        for node in self.node_objects.values():
+            reach = node.radius * SCALE_MULTIPLIER
+            node_grid.insert(node, node.x - reach, node.y - reach, node.x + reach, node.y + reach)
+        pairs = set()
+        for arrow in self.arrow_objects:
+            (x0, y0), (x1, y1) = arrow.start_pos, arrow.end_pos
+            arrow_grid.insert(arrow, min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+            if (arrow.end_node, arrow.start_node) not in pairs:
+                pairs.add((arrow.start_node, arrow.end_node))  # A-B and B-A are one line without arrowheads
+        for chain in chain_edges(list(pairs)):
+            points = [(self.node_objects[node].x, self.node_objects[node].y) for node in chain]
+            xs, ys = [x for x, _ in points], [y for _, y in points]
+            chain_grid.insert(points, min(xs), min(ys), max(xs), max(ys))
+        # Zoom from which the edges are long enough on screen for weights, arrowheads and labels
+        detail_zoom = DETAIL_EDGE_PIXELS / median if median else 0
+        self._index = (node_grid, arrow_grid, chain_grid, median, detail_zoom)
+        return self._index
+
+    def detailed(self, camera):
+        index = self._index or self._build_index()
+        return camera.zoom >= index[4]
+
+    def node_pixels(self, node, camera):
+        # On-screen radius of a node: scaled with the zoom, and shrunk below the level of detail so dense
+        # graphs do not turn into one blob
+        index = self._index or self._build_index()
+        radius = node.radius * SCALE_MULTIPLIER * camera.zoom
+        if camera.zoom < index[4]:
+            radius = min(radius, index[3] * camera.zoom / 4)
+        return max(1, int(radius))
+
+    def visible(self, camera, size, margin=40):
+        # Nodes, arrows and batched lines inside the view. margin (in pixels) keeps labels at the border
+        node_grid, arrow_grid, chain_grid, _, _ = self._index or self._build_index()
+        x0, y0 = camera.to_world(-margin, -margin)
+        x1, y1 = camera.to_world(size[0] + margin, size[1] + margin)
+        return node_grid.query(x0, y0, x1, y1), arrow_grid.query(x0, y0, x1, y1), chain_grid.query(x0, y0, x1, y1)
+
+    def draw_lines(self, surface, color, camera, chains):
+        # Batched edges: one pygame.draw.lines call per chain
+        zoom, offset_x, offset_y = camera.zoom, camera.offset_x, camera.offset_y
+        draw_lines = pygame.draw.lines
+        for points in chains:
+            draw_lines(surface, color, False, [(x * zoom + offset_x, y * zoom + offset_y) for x, y in points])
+
+    def set_edge(self, from_node, to_node, weight):
+        # Follow an edge edit of the graph in place, weight None removes the arrow. The spatial index is built
+        # again on the next draw
+        arrow = self.arrow_lookup.get((from_node, to_node))
+        if arrow is not None and weight is not None:
+            arrow.weight = weight  # The label is drawn from the weight
+            return
+        if arrow is not None:
+            del self.arrow_lookup[(from_node, to_node)]
+            self.arrow_objects.remove(arrow)
+        elif weight is not None and from_node != to_node:
+            start, end = self.node_objects[from_node], self.node_objects[to_node]
+            arrow = Arrow(start_node=from_node, end_node=to_node, weight=weight, start_pos=(start.x, start.y),
+                          end_pos=(end.x, end.y), name=f"{from_node}-{to_node}")
+            self.arrow_objects.append(arrow)
+            self.arrow_lookup[(from_node, to_node)] = arrow
+        self._index = None
+
+    def matches(self, graph, size):
+        # Identity check first so the common per-frame case costs nothing
+        if self.size != size:
+            return False
+        if self.graph is graph:
+            return True
+        if self.graph == graph:
+            self.graph = graph  # Same edges parsed again, remember the new list so the next check is by identity
+            return True
+        return False
+
+
+_layout_cache = None  # (edge list, normalized positions) of the last laid out graph
+_scene_cache = None  # Last built Scene
+
+
+def computeLayout(graph, engine=None, initial=None):
+    # Layout of the edge list, see layout.py. engine picks the layout engine (None chooses by graph size) and
+    # initial holds earlier coordinates to warm start from, e.g. of the graph before an edit
+    global _layout_cache
+    if _layout_cache is not None and (_layout_cache[0] is graph or _layout_cache[0] == graph):
+        return _layout_cache[1]
+
+    # Layouts are stored by graph, so the same graph loaded again is never laid out twice
+    layout = layout_for(graph, engine, initial)
+    _layout_cache = (graph, layout)
+    return layout
+
+
+def setLayout(graph, layout):
+    # Use positions computed earlier (e.g. stored in a graph snapshot) instead of running the layout
+    global _layout_cache
+    _layout_cache = (graph, layout)
+
+
+def getScene(graph, surface):
+    # Return the cached scene, rebuilding it only if the graph or the window size changed
+    global _scene_cache
+    size = surface.get_size()
+    if _scene_cache is None or not _scene_cache.matches(graph, size):
+        _scene_cache = Scene(graph, size, computeLayout(graph))
+    return _scene_cache
+
+
+def setScene(scene):
+    # Use a scene built elsewhere, e.g. on the compute worker together with its layout
+    global _scene_cache
+    _scene_cache = scene
+
+
+def invalidateScene():
+    # Forget the cached layout and scene, e.g. after the graph was reloaded in place
+    global _layout_cache, _scene_cache
+    _layout_cache = None
+    _scene_cache = None
+
+
+def renderGraph(graph, surface, font, screen, distances, source_node, opacity=255, camera=None):
+    # Draw what camera shows of the graph (the whole fitted scene without a camera). Returns the drawn nodes
+    # and arrows, the arrows are empty when the edges were batched into lines
+    scene = getScene(graph, surface)
+    camera = camera or Camera()
+    node_objects, arrow_objects, chains = scene.visible(camera, surface.get_size())
+    detailed = scene.detailed(camera)
 
     def renderNode(node_obj):
-        x, y = node_obj.x, node_obj.y
-        node_radius = node_obj.radius
-        global SCALE_MULTIPLIER = 1.3
-
-        scaled_radius = int(node_radius * SCALE_MULTIPLIER)  # Scale up by 30%
+        x, y = camera.to_screen(node_obj.x, node_obj.y)
+        scaled_radius = scene.node_pixels(node_obj, camera)  # Scale up by 30% (and by the zoom)
         pygame.draw.circle(surface, (136, 149, 141, opacity), (int(x), int(y)), scaled_radius)
         # Render node ID
-        NodeID = font.render(f"{node_obj.name}", False, 0x606d5d)
+        NodeID = text_cache.render(font, f"{node_obj.name}", 0x606d5d)
 
-        global X_DIV,Y_DIV = 2.4, 2.2
         screen.blit(NodeID, (x - scaled_radius / X_DIV, y - scaled_radius / Y_DIV))
         # Render text (distance or label)
 
-    # Render all nodes and edges
-    for node_obj in node_objects.values():
-        renderNode(node_obj)
-    for arrow_obj in arrow_objects:
-        arrow_obj.render(surface, font, opacity, color=(255, 255, 255))
-
-    return node_objects, arrow_objects
-
-
-def render_table(distances, nodes, surface, font, screen, table_background_color, table_border_color):
-    # Define margins for spacing within the table
-    margin = 1
-    num_rows = len(nodes)
-    num_cols = 2  # One column for node name and one for its distance or value
-    cell_width = screen.get_width() // 20  # Adjust the width of the table
-    cell_height = screen.get_height() // (num_rows + 1)  # Adjust the height based on the number of nodes
-
-    # Define position to place the table in the upper-right corner
-    table_x = screen.get_width() - (cell_width * num_cols) - margin  # Right-aligned
-    table_y = margin  # Top-aligned
-
-    # Loop through each node and draw the table cells
-    row = 0  # Row index to go through each node
-    for node_name, node_obj in sorted(nodes.items()):
-        for col in range(num_cols):
-            x = table_x + col * cell_width
-            y = table_y + row * cell_height
-
-            # Draw the cell background (white)
-            pygame.draw.rect(surface, table_background_color,
-                             (x + margin, y + margin, cell_width - 2 * margin, cell_height - 2 * margin))
-            # Draw the cell border (black)
-            pygame.draw.rect(surface, table_border_color,
-                             (x + margin, y + margin, cell_width - 2 * margin, cell_height - 2 * margin), 2)
-
-            # Render the node name in the first column
-            if col == 0:
-                value = node_name  # Use the node name
-            else:
-                # Use the distance or '∞' if the distance is not available
-                value = f"{distances.get(node_name, '\N{INFINITY}')}"
-
-            # Render the value in the cell
-            text = font.render(value, False, (0, 0, 0))  # Black color for text
-            text_rect = text.get_rect(center=(x + cell_width // 2, y + cell_height // 2))
-            surface.blit(text, text_rect)
-
-        row += 1  # Move to the next row
-
-
-def render_shortest_path(data, graph, source, target, background_color, screen, font, distances):
+    if detailed:
+        # Render all visible nodes and edges
+        for node_obj in node_objects:
+            renderNode(node_obj)
+        for arrow_obj in arrow_objects:
+            arrow_obj.render(surface, font, opacity, color=(255, 255, 255), camera=camera)
+        return node_objects, arrow_objects
+
+    # Zoomed out: no labels and plain lines, a few calls for many edges. This loop runs for every visible node
+    # of a big graph, so the camera transform is inlined and the radius worked out once per node size
+    zoom, offset_x, offset_y = camera.zoom, camera.offset_x, camera.offset_y
+    circle, color, radii = pygame.draw.circle, (136, 149, 141, opacity), {}
+    for node_obj in node_objects:
+        radius = radii.get(node_obj.radius)
+        if radius is None:
+            radius = radii[node_obj.radius] = scene.node_pixels(node_obj, camera)
+        circle(surface, color, (int(node_obj.x * zoom + offset_x), int(node_obj.y * zoom + offset_y)), radius)
+    scene.draw_lines(surface, (255, 255, 255), camera, chains)
+    return node_objects, []
+
+
+class DistanceTable:
+    # Distance table in the upper right corner, one row per node below a header. Rows keep a readable height
+    # and the table scrolls when they do not all fit, only the rows in view are drawn. A row is rendered once
+    # into a cached surface and only rendered again when its distance changed, a step redraws just the rows of
+    # the nodes it changed. Clicking the header sorts by distance instead of by name, the sorted order is a
+    # list of (distance, name) keys kept in order with bisect as distances change
+    MARGIN = 1
+    COLUMNS = 2  # Node name and its distance
+
+    def __init__(self, nodes, screen, font, background_color, border_color, clear_color):
+        self.nodes = nodes
+        self.names = sorted(nodes)
+        self.position = {name: row for row, name in enumerate(self.names)}  # Row of every node sorted by name
+        self.font = font
+        self.background_color, self.border_color, self.clear_color = background_color, border_color, clear_color
+        self.cell_width = screen.get_width() // 20
+        # Rows fill the window height like they used to, but do not get smaller than TABLE_ROW_HEIGHT
+        self.row_height = max(TABLE_ROW_HEIGHT, screen.get_height() // (len(self.names) + 2))
+        fitting = (screen.get_height() - 2 * self.MARGIN) // self.row_height - 1  # Rows below the header
+        self.visible_rows = max(1, min(len(self.names), fitting))
+        width = self.cell_width * self.COLUMNS
+        self.rect = Rect(screen.get_width() - width - self.MARGIN, self.MARGIN, width + 2 * self.MARGIN,
+                         (self.visible_rows + 1) * self.row_height + 2 * self.MARGIN)
+        self.scroll = 0  # First row in view
+        self.sort_by_distance = False
+        self.keys = None  # Sorted (distance, name) of every node while sorting by distance
+        self.distances = None  # Distances of the step shown, the cursor's state
+        self.shown = {}  # Distance every row was last drawn or sorted with
+        self.rows = OrderedDict()  # Node -> (distance, row surface), the least recently drawn are dropped
+
+    def name_at(self, row):
+        if self.keys is not None:
+            return self.keys[row][1]
+        return self.names[row]
+
+    def _value(self, name):
+        return self.distances.get(name, INF)
+
+    def _row_surface(self, name, value):
+        cached = self.rows.get(name)
+        if cached is not None and cached[0] == value:
+            self.rows.move_to_end(name)
+            return cached[1]
+        margin, cell_width = self.MARGIN, self.cell_width
+        surface = pygame.Surface((cell_width * self.COLUMNS, self.row_height)).convert()
+        surface.fill(self.clear_color)  # The gaps between the cells stay transparent in the table layer
+        for col, text in enumerate((str(name), INFINITY if value == INF else f"{value}")):
+            cell = Rect(col * cell_width + margin, margin, cell_width - 2 * margin, self.row_height - 2 * margin)
+            pygame.draw.rect(surface, self.background_color, cell)
+            pygame.draw.rect(surface, self.border_color, cell, 2)
+            label = text_cache.render(self.font, text, (0, 0, 0))
+            surface.blit(label, label.get_rect(center=cell.center))
+        self.rows[name] = (value, surface)
+        if len(self.rows) > TABLE_ROW_CACHE:
+            self.rows.popitem(last=False)
+        return surface
+
+    def _draw_header(self, surface):
+        margin, cell_width = self.MARGIN, self.cell_width
+        titles = ("node", "distance \N{DOWNWARDS ARROW}" if self.sort_by_distance else "distance")
+        for col, text in enumerate(titles):
+            cell = Rect(self.rect.x + col * cell_width + margin, self.rect.y + margin, cell_width - 2 * margin,
+                        self.row_height - 2 * margin)
+            pygame.draw.rect(surface, self.border_color, cell)
+            label = text_cache.render(self.font, text, self.background_color)
+            surface.blit(label, label.get_rect(center=cell.center))
+
+    def _draw_row(self, surface, row):
+        # Draw the row at this position of the order if it is in view, returns the rect drawn on
+        line = row - self.scroll
+        if not 0 <= line < self.visible_rows or row >= len(self.names):
+            return None
+        name = self.name_at(row)
+        return surface.blit(self._row_surface(name, self._value(name)),
+                            (self.rect.x, self.rect.y + self.MARGIN + (line + 1) * self.row_height))
+
+    def draw(self, surface):
+        # Everything in view, returns the table rect
+        surface.fill(self.clear_color, self.rect)
+        self._draw_header(surface)
+        for row in range(self.scroll, min(self.scroll + self.visible_rows, len(self.names))):
+            self._draw_row(surface, row)
+        return self.rect
+
+    def _sort(self):
+        self.shown = {name: self._value(name) for name in self.names}
+        self.keys = sorted((distance, name) for name, distance in self.shown.items())
+
+    def update(self, surface, distances, changed=None):
+        # Show the distances of another step. changed holds the nodes whose distance may differ from the
+        # step shown before, None (or a new search) redraws everything in view. Returns the rects drawn on
+        if distances is not self.distances or changed is None or len(changed) > TABLE_REDRAW_LIMIT:
+            self.distances = distances
+            if self.sort_by_distance:
+                self._sort()
+            return [self.draw(surface)]
+
+        rows = set()
+        for name in changed:
+            if name not in self.position:
+                continue
+            value = self._value(name)
+            if self.keys is None:
+                rows.add(self.position[name])
+                continue
+            old = self.shown[name]
+            if old == value:
+                continue
+            # Move the key to its new place, the rows in between shift by one
+            keys = self.keys
+            old_row = bisect_left(keys, (old, name))
+            del keys[old_row]
+            new_row = bisect_left(keys, (value, name))
+            keys.insert(new_row, (value, name))
+            self.shown[name] = value
+            low, high = sorted((old_row, new_row))
+            rows.update(range(max(low, self.scroll), min(high, self.scroll + self.visible_rows - 1) + 1))
+        rects = [self._draw_row(surface, row) for row in sorted(rows)]
+        return [rect for rect in rects if rect is not None]
+
+    def scroll_by(self, rows):
+        # Returns True if the view moved
+        scroll = max(0, min(self.scroll + rows, len(self.names) - self.visible_rows))
+        if scroll == self.scroll:
+            return False
+        self.scroll = scroll
+        return True
+
+    def toggle_sort(self):
+        self.sort_by_distance = not self.sort_by_distance
+        self.scroll = 0
+        if self.sort_by_distance and self.distances is not None:
+            self._sort()
+        else:
+            self.keys = None
+            self.shown = {}
+
+
+def render_shortest_path(data, graph, source, target, background_color, screen, font, distances, camera=None):
     # Get the shortest path
     shortest_path_nodes = graph.shortest_path(source, target)
 
@@ -230,40 +656,247 @@ def render_shortest_path(data, graph, source, target, background_color, screen,
         for i in range(len(shortest_path_nodes) - 1)
     ]
 
-    # Render the full graph, dimmed (no weights visible)
-    nodes, arrows = renderGraph(data, screen, font, screen, distances, source, opacity=0)
-
-    # Dim the entire graph
-    for arrow in arrows:
-        arrow.render(screen, font, background_color, color=(128, 128, 128, 128))
-
-    for node in nodes.values():
-        pygame.draw.circle(screen, (100, 100, 100), (int(node.x), int(node.y)), node.radius)
+    # The dimmed graph underneath is a static layer (see renderDimmedGraph), only the path is drawn here
+    scene = getScene(data, screen)
+    nodes = scene.node_objects
+    camera = camera or Camera()
+    detailed = scene.detailed(camera)  # The path is short, pygame clips what is outside the view
 
     # Highlight the shortest path edges
     for edge in shortest_path_edges:
-        nodeA, nodeB = edge
-
-        # Find the corresponding arrow object
-        for arrow in arrows:
-            if arrow.start_node == nodeA and arrow.end_node == nodeB:
-                arrow.render(screen, font, background_color, color=(255, 0, 0))  # Red for shortest path
-                break
+        arrow = scene.arrow_lookup.get(edge)
+        if arrow is not None:
+            arrow.render(screen, font, background_color, color=(255, 0, 0), camera=camera,
+                         detail=detailed)  # Red for shortest path
 
     # Highlight the shortest path nodes
     for node_name in shortest_path_nodes:
         node = nodes[node_name]
-        pygame.draw.circle(screen, (0, 255, 0), (int(node.x), int(node.y)), node.radius)
+        x, y = camera.to_screen(node.x, node.y)
+        radius = max(1, int(node.radius * camera.zoom)) if detailed else scene.node_pixels(node, camera)
+        pygame.draw.circle(screen, (0, 255, 0), (int(x), int(y)), radius)
+        if not detailed:
+            continue
 
         # Render node labels
-        label = font.render(node.name, False, (255, 0, 0))
+        label = text_cache.render(font, node.name, (255, 0, 0))
         xOffset = 10
         programmers_pi = 3
 
-        screen.blit(label, (node.x + xOffset - node.radius, node.y + xOffset - node.radius * (programmers_pi/2)))
+        screen.blit(label, (x + xOffset - radius, y + xOffset - radius * (programmers_pi/2)))
 
     return 1
 
+def renderDimmedGraph(data, surface, font, background_color, camera=None):
+    # Render the full graph, dimmed (no weights visible)
+    camera = camera or Camera()
+    nodes, arrows = renderGraph(data, surface, font, surface, None, None, opacity=0, camera=camera)
+    scene = getScene(data, surface)
+
+    # Dim the entire graph
+    for arrow in arrows:
+        arrow.render(surface, font, background_color, color=(128, 128, 128, 128), camera=camera)
+    if not arrows:
+        scene.draw_lines(surface, (128, 128, 128), camera, scene.visible(camera, surface.get_size())[2])
+
+    for node in nodes:
+        x, y = camera.to_screen(node.x, node.y)
+        radius = node.radius * camera.zoom if scene.detailed(camera) else scene.node_pixels(node, camera)
+        pygame.draw.circle(surface, (100, 100, 100), (int(x), int(y)), max(1, int(radius)))
+
+
+class LayeredRenderer:
+    # Composes each frame from cached layers and only pushes the rectangles that changed:
+    #   base  - background fill with the whole graph, or its dimmed copy while the shortest path is shown
+    #   path  - highlighted shortest path on top of the dimmed base
+    #   table - distances of the current step
+    #   UI    - pygame_gui, drawn last straight onto the screen
+    TRANSPARENT = (255, 0, 255)  # Colorkey of the overlay layers
+
+    def __init__(self, screen, background_color):
+        self.screen = screen
+        self.background_color = background_color
+        size = screen.get_size()
+        self.base = pygame.Surface(size).convert()
+        self.dimmed = pygame.Surface(size).convert()
+        self.path_layer = self._overlay(size)
+        self.table_layer = self._overlay(size)
+        self.show_path = False
+        self.camera = Camera()  # Shared by the base, dimmed and path layers
+        self.static_args = None  # What build_static drew, to redraw it when the camera moves
+        self.path_args = None  # Same for the shown shortest path
+        self.dimmed_stale = True  # The dimmed copy is only drawn once the path is shown
+        self.view_stale = False  # Camera moved since the layers were drawn
+        self.table = None  # DistanceTable drawn into the table layer
+        self.ui_rects = []
+        self.dirty = []
+        self.full_redraw = True
+
+    def _overlay(self, size):
+        layer = pygame.Surface(size).convert()
+        layer.set_colorkey(self.TRANSPARENT)
+        layer.fill(self.TRANSPARENT)
+        return layer
+
+    def build_static(self, data, font, distances, source_node):
+        # Edges and nodes only change when the graph or the camera does, so they are drawn once into the base
+        self.static_args = (data, font, distances, source_node)
+        self.base.fill(self.background_color)
+        renderGraph(data, self.base, font, self.base, distances, source_node, camera=self.camera)
+        self.dimmed_stale = True
+        self.full_redraw = True
+
+    def clear(self):
+        # Background only, while the layout of a new graph is still being computed
+        self.static_args = self.path_args = None
+        self.show_path = False
+        self.base.fill(self.background_color)
+        if self.table is not None:
+            self.table_layer.fill(self.TRANSPARENT, self.table.rect)
+            self.table = None
+        self.full_redraw = True
+
+    def view_changed(self):
+        # Called after the camera moved, the graph layers are redrawn once on the next draw however many
+        # pan and zoom events came in before it
+        self.view_stale = True
+
+    def _redraw_view(self):
+        self.view_stale = False
+        if self.static_args is not None:
+            self.build_static(*self.static_args)
+        if self.path_args is not None:
+            self.path_layer.fill(self.TRANSPARENT)
+            render_shortest_path(*self.path_args, camera=self.camera)
+
+    def set_table(self, distances, nodes, font, changed=None):
+        # Show the distances of a step, changed as in DistanceTable.update. A new node set gets a new table
+        table = self.table
+        if table is None or table.nodes is not nodes:
+            if table is not None:
+                self.table_layer.fill(self.TRANSPARENT, table.rect)
+                self.invalidate(table.rect)
+            table = self.table = DistanceTable(nodes, self.screen, font, 0xDDF2EB, 0x606d5d, self.TRANSPARENT)
+            changed = None
+        for rect in table.update(self.table_layer, distances, changed):
+            self.invalidate(rect)
+
+    def table_at(self, position):
+        # The table if position is on it
+        if self.table is not None and self.table.rect.collidepoint(position):
+            return self.table
+        return None
+
+    def scroll_table(self, rows):
+        if self.table is not None and self.table.scroll_by(rows):
+            self.invalidate(self.table.draw(self.table_layer))
+
+    def sort_table(self):
+        if self.table is not None:
+            self.table.toggle_sort()
+            self.invalidate(self.table.draw(self.table_layer))
+
+    def show_shortest_path(self, data, graph, source, target, font, distances):
+        self.path_layer.fill(self.TRANSPARENT)
+        path_args = (data, graph, source, target, self.background_color, self.path_layer, font, distances)
+        found = render_shortest_path(*path_args, camera=self.camera)
+        if found:
+            self.show_path = True
+            self.path_args = path_args
+            self.full_redraw = True  # The whole base switches to the dimmed graph
+        return found
+
+    def hide_shortest_path(self):
+        self.path_args = None
+        if self.show_path:
+            self.show_path = False
+            self.full_redraw = True
+
+    def invalidate(self, rect):
+        if rect is not None:
+            self.dirty.append(Rect(rect))
+
+    def is_idle(self):
+        return not self.full_redraw and not self.dirty and not self.view_stale
+
+    def _update_layers(self):
+        if self.view_stale:
+            self._redraw_view()
+        if self.show_path and self.dimmed_stale and self.static_args is not None:
+            self.dimmed.fill(self.background_color)
+            renderDimmedGraph(self.static_args[0], self.dimmed, self.static_args[1], self.background_color,
+                              camera=self.camera)
+            self.dimmed_stale = False
+
+    def compose(self, surface):
+        # The whole frame without the UI into surface, for exporting frames (see export_frames.py)
+        self._update_layers()
+        surface.blit(self.dimmed if self.show_path else self.base, (0, 0))
+        if self.show_path:
+            surface.blit(self.path_layer, (0, 0))
+        surface.blit(self.table_layer, (0, 0))
+
+    def draw(self, manager, ui_changed):
+        self._update_layers()
+        if ui_changed:
+            # UI elements can move or disappear, so both their old and their new areas are redrawn
+            ui_rects = [sprite.rect.copy() for sprite in manager.get_sprite_group().sprites()
+                        if sprite is not manager.get_root_container() and sprite.image is not None
+                        and sprite.visible]
+            self.dirty.extend(self.ui_rects)
+            self.dirty.extend(ui_rects)
+            self.ui_rects = ui_rects
+
+        if self.full_redraw:
+            rects = [self.screen.get_rect()]
+        else:
+            rects = _merge_rects(self.dirty)
+        self.dirty = []
+        if not rects:
+            return
+
+        base = self.dimmed if self.show_path else self.base
+        for rect in rects:
+            self.screen.set_clip(rect)
+            self.screen.blit(base, rect, rect)
+            if self.show_path:
+                self.screen.blit(self.path_layer, rect, rect)
+            self.screen.blit(self.table_layer, rect, rect)
+            manager.draw_ui(self.screen)
+        self.screen.set_clip(None)
+
+        if self.full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+        self.full_redraw = False
+
+
+def _merge_rects(rects):
+    # Collapse overlapping rectangles so every area is composed and pushed only once
+    merged = []
+    for rect in rects:
+        rect = rect.clip(Rect(0, 0, 1 << 15, 1 << 15))
+        if not rect.width or not rect.height:
+            continue
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect = rect.union(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+
+# Keys that move the camera
+PAN_KEYS = {pygame.K_LEFT: (PAN_STEP, 0), pygame.K_RIGHT: (-PAN_STEP, 0),
+            pygame.K_UP: (0, PAN_STEP), pygame.K_DOWN: (0, -PAN_STEP)}
+ZOOM_KEYS = {pygame.K_PLUS: ZOOM_STEP, pygame.K_EQUALS: ZOOM_STEP, pygame.K_KP_PLUS: ZOOM_STEP,
+             pygame.K_MINUS: 1 / ZOOM_STEP, pygame.K_KP_MINUS: 1 / ZOOM_STEP}
+
+
 # Function to create a Pygame_GUI button
 def create_gui_button(manager, text, x, y, width, height):
     return pygame_gui.elements.UIButton(
@@ -273,228 +906,608 @@ def create_gui_button(manager, text, x, y, width, height):
     )
 
 
-def visualize(graph, source_node, target_node,select_source, select_target):
-    pygame.init()
-    screen = pygame.display.set_mode((1200, 800), pygame.SRCALPHA)
-    _clock = pygame.time.Clock()
-
-    # Snapshot management
-    current_snapshot_index = 0
-
-    sourceSelect, targetSelect = select_source, select_target
-    nodesForSelection = []
-    manager = pygame_gui.UIManager((1200, 800))
-
-    title = "Visualization of Dijkstra's algorithm"
-    pygame.display.set_caption(title)
-
-    data = parseInput(graph)
-    font = pygame.font.SysFont("Arial", 14, italic=True)
-
-    # Initialize the graph and add edges
-    g = Graph()
-    for nodeA, nodeB, weight in data:
-        g.add_edge(nodeA, nodeB, weight)
-        if nodeA not in nodesForSelection:
-            nodesForSelection.append(nodeA)
-        elif nodeB not in nodesForSelection:
-            nodesForSelection.append(nodeB)
-
-
-    # Get distances using the Dijkstra algorithm
-    distances, _, steps = g.dijkstra(source_node, target_node)
-    screenWidth, screenHeight = screen.get_width(), screen.get_height()
-    #region UI_INIT
-
-    buttonPrev = create_gui_button(manager=manager, x=100, y=screenHeight - 60, width=100, height=40,
-                                   text="Previous Step")
-
-    buttonNext = create_gui_button(manager=manager, x=screenWidth - 150, y=screenHeight - 60, width=100,
-                                   height=40, text="Next Step")
-
-    buttonSP = create_gui_button(manager=manager, x=10, y=10, width=100, height=40,
-                                 text="Shortest Path")
-
-    buttonLoadGraph = create_gui_button(manager=manager, x=10, y=60, width=100, height=40,
-                                        text="Load Graph")
-
-    #Dropdown menus to select source and target nodes and their respective labels
-    sourceDropdown = pygame_gui.elements.UIDropDownMenu(nodesForSelection, sourceSelect, (10, 110, 50, 40), manager=manager)
-    sourceLabel = pygame_gui.elements.UILabel(
-        relative_rect=Rect((60,110), (100, 40)),
-        text="Source Node",
-        manager=manager,
-    )
-    targetDropdown = pygame_gui.elements.UIDropDownMenu(nodesForSelection, targetSelect,(10, 160, 50, 40), manager=manager)
-    targetLabel = pygame_gui.elements.UILabel(
-        relative_rect=Rect((60, 160), (100, 40)),
-        text="Target Node",
-        manager=manager,
-    )
-
-    currentIndexLabel = pygame_gui.elements.UILabel(
-        relative_rect=Rect(screen.get_width() / 2.3 - 15, screen.get_height() - 64, 200, 40),
-        manager=manager,
-        text=f"current step: {current_snapshot_index}"
+class VisualizerApp:
+    # State of the visualization window, kept for the whole session.
+    # The model (graph, edge list, layout, static layers) and the search (source, target, distances, step log)
+    # are separate: picking another source or target only reruns the search on the same layout, and loading a
+    # graph swaps the model in place. The window, the UI manager and the widgets are created once.
+    WINDOW_SIZE = (1200, 800)
+    BACKGROUND = 0x606d5d
+    BACKGROUND_MIN_EDGES = 2000  # Layouts and searches of graphs this big run on the compute worker
+
+    def __init__(self, graph, source_node, target_node, algorithm="dijkstra", layout_engine=None,
+                 play_rate=PLAY_RATE):
+        pygame.init()
+        self.screen = pygame.display.set_mode(self.WINDOW_SIZE, pygame.SRCALPHA)
+        pygame.display.set_caption("Visualization of Dijkstra's algorithm")
+        self.clock = pygame.time.Clock()
+        self.manager = pygame_gui.UIManager(self.WINDOW_SIZE)
+        self.font = getFont("label")
+        self.renderer = LayeredRenderer(self.screen, self.BACKGROUND)
+        self.profiler = profiler_from_env()  # None unless profiling was switched on, see profiling.py
+        self.worker = ComputeWorker(_post_worker_event)
+        self.layout_job = self.search_job = None  # Running background jobs, results of other jobs are stale
+        self.algorithm = algorithm
+        self.layout_engine = layout_engine  # Name of a layout.ENGINES entry, None picks one by graph size
+        self.running = True
+
+        # Model
+        self.graph = None  # Graph that is searched
+        self.node_by_text = None  # Dropdown text -> node
+        self.names = None  # Dropdown texts
+        self.data = None  # Edge list the scene is drawn from
+        self.nodes = None  # Node objects of the scene, the rows of the distance table
+
+        # Search
+        self.source_node, self.target_node = source_node, target_node
+        self.distances = None
+        self.steps = None
+        self.step_cursor = None
+        self.current_snapshot_index = 0
+        self.counters_pending = False  # Profiler counters wait for a lazy search to finish
+        self.tracker = None  # Shortest path tree of the source that edge edits repair, see edit_edge
+
+        # Auto-play
+        self.play_rate = play_rate  # Steps per second
+        self.playing = False
+        self.play_budget = 0.0  # Steps owed to auto-play, the fraction carries over to the next frame
+
+        # View
+        self.render_path = False  # Shortest path requested
+        self.path_shown = False  # Shortest path currently on screen
+        self.overlay_panel_on = False
+        self.overlay_rect = None
+        self.file_dialog = None
+        self.dragging = False  # A mouse button went down on the graph, moving the mouse pans
+        self.source_dropdown = self.target_dropdown = None
+
+        self._create_widgets()
+        self.load_graph(graph)
+
+    def _create_widgets(self):
+        manager = self.manager
+        screenWidth, screenHeight = self.screen.get_width(), self.screen.get_height()
+        self.button_prev = create_gui_button(manager=manager, x=100, y=screenHeight - 60, width=100, height=40,
+                                             text="Previous Step")
+        self.button_next = create_gui_button(manager=manager, x=screenWidth - 150, y=screenHeight - 60, width=100,
+                                             height=40, text="Next Step")
+        self.button_play = create_gui_button(manager=manager, x=210, y=screenHeight - 60, width=100, height=40,
+                                             text="Play")
+        self.button_path = create_gui_button(manager=manager, x=10, y=10, width=100, height=40,
+                                             text="Shortest Path")
+        self.button_load = create_gui_button(manager=manager, x=10, y=60, width=100, height=40,
+                                             text="Load Graph")
+
+        # Labels of the source and target dropdowns, the dropdowns themselves depend on the graph
+        pygame_gui.elements.UILabel(relative_rect=Rect((60, 110), (100, 40)), text="Source Node", manager=manager)
+        pygame_gui.elements.UILabel(relative_rect=Rect((60, 160), (100, 40)), text="Target Node", manager=manager)
+
+        self.index_label = pygame_gui.elements.UILabel(
+            relative_rect=Rect(screenWidth / 2.3 - 15, screenHeight - 64, 200, 40),
+            manager=manager,
+            text="current step: 0",
         )
 
-    # Create a panel for the overlay
-    overlay_panel = pygame_gui.elements.UIPanel(
-        relative_rect=pygame.Rect((350, 250), (300, 120)),
-        manager=manager,
-        object_id="#overlay_panel"
-    )
-
-    # Create a label for the message on the overlay panel
-    message_label = pygame_gui.elements.UILabel(
-        relative_rect=pygame.Rect((40, -20), (220, 100)),
-        text=f"No path from node {sourceSelect} to node {targetSelect}",
-        manager=manager,
-        container=overlay_panel
-    )
-
-    # Create a label for the message on the overlay panel
-    continue_label = pygame_gui.elements.UILabel(
-        relative_rect=pygame.Rect((40, 30), (220, 50)),
-        text=f"Press any key to continue",
-        manager=manager,
-        container=overlay_panel
-    )
-
-    #endregion
-
-
-    # Initially hide the overlay panel
-    overlay_panel.hide()
-    overlay_panel_on = False
-
-
-    #Function which renders the data in the upcoming step into the table
-    def render_snapshot():
-        if current_snapshot_index < len(steps):
-            # Get the current step
-            current_distances = steps[current_snapshot_index]
-            # Update table values to reflect the current distances
-            render_table(current_distances, nodes, screen, font, screen, 0xDDF2EB, 0x606d5d)
-
-
-    file_dialog = None
-    renderSP = False
-    second = 1000.0
-    #region Main_Loop
-    # Event loop for visualization
-    while True:
-        time_delta = _clock.tick(60) / second
-        screen.fill(0x606d5d)
-        for event in pygame.event.get():
-            manager.process_events(event)
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                raise SystemExit(0)
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    raise SystemExit(0)
-
-            if event.type == pygame.KEYDOWN or event.type == pygame.MOUSEBUTTONDOWN and overlay_panel_on:
-                    overlay_panel.hide()
-                    renderSP = False
-                    select_source = "A"
-                    visualize(graph, source_node, target_node, select_source, select_target)
-
-            if event.type == pygame_gui.UI_BUTTON_PRESSED:
-                # Previous button
-                if event.ui_element == buttonPrev:
-                    if renderSP:
-                        renderSP = False
-                        overlay_panel.hide()
-
-                    if current_snapshot_index != 0:
-                        current_snapshot_index -= 1
-                        currentIndexLabel.set_text(text=f"current step: {current_snapshot_index}")
-                        render_snapshot()
-                        print("previous button clicked")
-                        buttonNext.enable()
-
-                    if current_snapshot_index == 0:
-                        print("no more previous events")
-                        buttonPrev.disable()
-
-
-                # Next button
-                if event.ui_element == buttonNext:
-                    if current_snapshot_index < len(steps):
-                        current_snapshot_index += 1
-                        currentIndexLabel.set_text(text=f"current step: {current_snapshot_index}")
-                        render_snapshot()
-                        buttonPrev.enable()
-                        print("next button clicked")
-
-                    if current_snapshot_index == len(steps) - 1:
-                        print("no more upcoming events")
-                        renderSP = not renderSP
-                        buttonNext.disable()
-
-
-
-
-
-                # Shortest path button
-                if event.ui_element == buttonSP:
-                    print("Shortest path button clicked")
-                    renderSP = not renderSP
-
-                # File Dialog button
-                if event.ui_element == buttonLoadGraph:
-                    print("Load Graph button clicked!")
-                    if file_dialog is None:
-                        file_dialog = UIFileDialog(
-                            rect=pygame.Rect(100, 100, 600, 400),
-                            manager=manager,
-                            window_title="Load a Graph File",
-                        )
-
-            #Logic which handles selecting source and target from the available nodes
-            if event.type == pygame_gui.UI_DROP_DOWN_MENU_CHANGED:
-                if event.ui_element == sourceDropdown:
-                    visualize(graph, f"{event.text}", f"{targetSelect}", f"{event.text}",
-                              f"{targetSelect}")
-                if event.ui_element == targetDropdown:
-                    visualize(graph, f"{sourceSelect}", f"{event.text}", f"{sourceSelect}",
-                              f"{event.text}")
-
-            if event.type == pygame_gui.UI_FILE_DIALOG_PATH_PICKED:
-                if file_dialog is not None and event.ui_element == file_dialog:
-                    print(f"File selected: {event.text}")
-                    try:
-                        with open(event.text, "r") as graph_file:
-                            graph_DOT = graph_file.read()
-                        # Call the visualization function
-                        visualize(graph_DOT, f"{sourceSelect}", f"{targetSelect}", sourceSelect, targetSelect)
-                    except Exception as e:
-                        print(f"Node {e} doesn't exist in submitted graph!")
-                    file_dialog = None  # Close the dialog after the selection
-
-        # Render the graph
-        nodes, arrows = renderGraph(data, screen, font, screen, distances, source_node)
-
-        # Render default step of the algorithm
-        render_snapshot()
-
-        # Render pygame_GUI
-        manager.update(time_delta)
-        manager.draw_ui(screen)
-
+        # Panel shown when there is no path, dismissed by any key or click
+        self.overlay_panel = pygame_gui.elements.UIPanel(
+            relative_rect=pygame.Rect((350, 250), (300, 120)),
+            manager=manager,
+            object_id="#overlay_panel"
+        )
+        self.message_label = pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((40, -20), (220, 100)),
+            text="",
+            manager=manager,
+            container=self.overlay_panel
+        )
+        pygame_gui.elements.UILabel(
+            relative_rect=pygame.Rect((40, 30), (220, 50)),
+            text="Press any key to continue",
+            manager=manager,
+            container=self.overlay_panel
+        )
+        self.overlay_panel.hide()
+
+        # Progress of the background jobs, only shown while one runs
+        self.progress_label = pygame_gui.elements.UILabel(
+            relative_rect=Rect(screenWidth / 2 - 100, screenHeight - 130, 200, 30), text="", manager=manager)
+        self.progress_bar = pygame_gui.elements.UIProgressBar(
+            relative_rect=Rect(screenWidth / 2 - 100, screenHeight - 100, 200, 26), manager=manager)
+        self.progress_label.hide()
+        self.progress_bar.hide()
+
+    def _create_dropdowns(self, names):
+        # Dropdown options can not be replaced, so a new graph gets new dropdowns
+        for dropdown in (self.source_dropdown, self.target_dropdown):
+            if dropdown is not None:
+                dropdown.kill()
+        self.source_dropdown = pygame_gui.elements.UIDropDownMenu(names, str(self.source_node), (10, 110, 50, 40),
+                                                                  manager=self.manager)
+        self.target_dropdown = pygame_gui.elements.UIDropDownMenu(names, str(self.target_node), (10, 160, 50, 40),
+                                                                  manager=self.manager)
+
+    def load_graph(self, graph):
+        # Swap in a new model: a DOT string or file, or an already loaded Graph (e.g. a snapshot)
+        data = parseInput(graph)
+        if isinstance(graph, Graph):
+            g = graph  # A graph that was already loaded is used as it is
+        else:
+            g = Graph()
+            for nodeA, nodeB, weight in data:
+                g.add_edge(nodeA, nodeB, weight)
+
+        # Dropdowns hand back text, this finds the node it stands for
+        node_by_text = {str(node): node for node in g.nodes()}
+        if not node_by_text:
+            raise ValueError("The graph has no nodes")
+        names = list(node_by_text)
+        # Keep the selected nodes if the new graph has them as well
+        if str(self.source_node) not in node_by_text:
+            self.source_node = node_by_text[names[0]]
+        if str(self.target_node) not in node_by_text:
+            self.target_node = node_by_text[names[-1]]
+
+        # Nothing computed for the previous graph is of any use now
+        self.worker.cancel()
+        self.set_playing(False)
+        self.layout_job = self.search_job = None
+        self.tracker = None
+        self.graph, self.data, self.node_by_text, self.names = g, data, node_by_text, names
+
+        # Reuse layout coordinates stored with the graph, otherwise compute them once and keep them on the graph.
+        # Coordinates of only some nodes (the graph was edited since) warm start the layout
+        self._lap("events")
+        if g.layout is not None and all(node in g.layout for edge in data for node in edge[:2]):
+            setLayout(data, g.layout)
+        elif len(data) >= self.BACKGROUND_MIN_EDGES:
+            # Big graph: lay it out in the background, the window shows the progress meanwhile
+            self.renderer.clear()
+            self.steps = None
+            self.render_path = False
+            self.hide_overlay()
+            self.button_prev.disable()
+            self.button_next.disable()
+            self.layout_job = self.worker.submit("layout", self._lay_out, data, g.layout or None)
+            self._update_progress()
+            return
+        else:
+            g.layout = computeLayout(data, self.layout_engine, initial=g.layout or None)
+        self._show_graph()
+
+    def _lay_out(self, data, initial, progress=None):
+        # Runs on the compute worker: the layout and the scene built from it, which takes a while as well.
+        # Neither touches pygame
+        positions = layout_for(data, self.layout_engine, initial, progress)
+        scene = Scene(data, self.screen.get_size(), positions)
+        scene._build_index()
+        return positions, scene
+
+    def _show_graph(self):
+        # The layout is there, build the scene and the static layers and start the search
+        self.nodes = getScene(self.data, self.screen).node_objects
+        # Static layers are drawn once per graph instead of every frame, a new graph starts fully in view
+        self.renderer.camera.reset()
+        self.renderer.build_static(self.data, self.font, {}, self.source_node)
+        self._lap("layout")  # Layout, scene and static layers of the graph
+        self._create_dropdowns(self.names)
+        self.set_search(self.source_node, self.target_node)
+
+    def set_search(self, source_node, target_node):
+        # Rerun only the search, the layout and the static layers stay as they are
+        self.source_node, self.target_node = source_node, target_node
+        self.hide_overlay()
+        self.render_path = False
+        self.set_playing(False)
+        self.tracker = None
+        self.worker.cancel("search")
+        self.search_job = None
+        if self.algorithm != "astar":
+            # Dijkstra steps are produced as they are shown, so even a big graph shows step 0 right away. The
+            # rest of a big search runs on the compute worker, the distances and the shortest path are there
+            # once it is done
+            steps = self.graph.dijkstra_lazy(source_node)
+            self._search_done(None, steps)  # A small search is finished frame by frame, see advance_search
+            if len(self.data) < self.BACKGROUND_MIN_EDGES:
+                return
+            self.search_job = self.worker.submit("search", self._finish_search, steps)
+            self._update_progress()
+            return
+        if len(self.data) < self.BACKGROUND_MIN_EDGES:
+            self._search_done(*self._search(self.graph, source_node, target_node))
+            return
+        # Big graph: search in the background, a search still running for another pair is cancelled
+        self.steps = None
+        self.button_prev.disable()
+        self.button_next.disable()
+        self.search_job = self.worker.submit("search", self._search, self.graph, source_node, target_node)
+        self._update_progress()
+
+    def _search(self, g, source_node, target_node, progress=None):
+        # A* with landmark bounds, its step log replays like a Dijkstra run but settles fewer nodes. Runs on the
+        # compute worker for big graphs, so it must not touch pygame
+        if g.landmarks is None or g.landmarks.version != g.version:
+            build_landmarks(g)
+        distances, _, steps = g.astar(source_node, target_node, g.landmarks, progress=progress)
+        return distances, steps
+
+    def _finish_search(self, steps, progress=None):
+        # Runs on the compute worker: the rest of a lazy Dijkstra search whose first steps are shown already.
+        # The window thread does not resume the search meanwhile, see show_step
+        steps.finish(progress)
+        return FinalDistances(steps), steps
+
+    def _search_done(self, distances, steps):
+        self.distances, self.steps = distances, steps
+        if self.algorithm == "astar":
+            pygame.display.set_caption(f"Visualization of A* search ({len(steps.settled)} nodes settled)")
+        self.counters_pending = self.profiler is not None
+
+        # Materialized state of the currently shown step, moved one delta at a time by Prev/Next
+        self.step_cursor = steps.cursor()
+        self.message_label.set_text(f"No path from node {self.source_node} to node {self.target_node}")
+        self.show_step(0)
+
+    def worker_event(self, status, job):
+        # Progress or end of a background job, handed over from the worker thread as a WORKER_EVENT
+        if job is not self.layout_job and job is not self.search_job:
+            return  # Superseded by a newer job
+        if status == "progress":
+            self.progress_bar.set_current_progress(job.fraction * 100)
+            return
+        if job is self.layout_job:
+            self.layout_job = None
+            if status == "done":
+                self.graph.layout, scene = job.result
+                setLayout(self.data, self.graph.layout)
+                setScene(scene)
+                self._show_graph()
+        else:
+            self.search_job = None
+            if status == "done" and job.result[1] is self.steps:
+                # The shown lazy search finished, stepping goes on where it is
+                self.distances = job.result[0]
+                self.show_step(self.current_snapshot_index)
+            elif status == "done":
+                self._search_done(*job.result)
+        if status == "failed":
+            print(f"The {job.kind} failed: {job.error}")
+        self._update_progress()
+
+    def _update_progress(self):
+        job = self.layout_job or self.search_job
+        if job is None:
+            self.progress_label.hide()
+            self.progress_bar.hide()
+            return
+        self.progress_label.set_text("Computing the layout" if job is self.layout_job else "Searching")
+        self.progress_bar.set_current_progress(job.fraction * 100)
+        self.progress_label.show()
+        self.progress_bar.show()
+
+    def show_step(self, index):
+        steps = self.steps
+        if self.search_job is None:
+            steps.extend_to(index + 1)  # A lazy search runs just far enough to tell whether index is the last step
+        # Otherwise the compute worker finishes the search, only the steps recorded so far are shown
+        shown = self.step_cursor.index
+        self.current_snapshot_index = max(0, min(index, len(steps) - 1))
+        self.index_label.set_text(text=f"current step: {self.current_snapshot_index}")
+        # Update table values to reflect the distances of the step, only the rows of nodes that changed
+        changed = None
+        if abs(self.current_snapshot_index - shown) <= TABLE_REDRAW_LIMIT:
+            changed = steps.changed_nodes(shown, self.current_snapshot_index)
+        self._lap("events")
+        self.renderer.set_table(self.step_cursor.seek(self.current_snapshot_index), self.nodes, self.font, changed)
+        self._lap("table")
+        if self.current_snapshot_index == 0:
+            self.button_prev.disable()
+        else:
+            self.button_prev.enable()
+        if self.at_last_step():
+            self.button_next.disable()
+        else:
+            self.button_next.enable()
+        if self.counters_pending and steps.finished:
+            self.counters_pending = False
+            self.profiler.set_counters(dijkstra_counters(self.graph, steps) if self.algorithm != "astar"
+                                       else {"settled": len(steps.settled)})
+
+    def edit_edge(self, from_node, to_node, weight=None):
+        # Insert or reweight the edge from_node -> to_node of the shown graph, or delete it with weight None.
+        # The shortest path tree of the source is repaired instead of searched again (see dynamic_paths.py) and
+        # only the table rows of the nodes it reports as changed are redrawn. The step log no longer matches
+        # the graph, so stepping stays off until the next search. Returns the PathTreeResult
+        scene = getScene(self.data, self.screen)
+        if from_node not in scene.node_objects or to_node not in scene.node_objects:
+            raise ValueError(f"No edge can be edited between {from_node} and {to_node}, both must be in the graph")
+        if weight is not None and not weight >= 0:
+            raise ValueError(f"Edge weights must be non-negative, got {weight}")
+        if self.layout_job is not None:
+            raise RuntimeError("The graph is still being laid out")
+        self.worker.cancel("search")
+        self.search_job = None
+        self.set_playing(False)
+        if self.tracker is None:
+            self.tracker = self.graph.track(self.source_node)  # One full search, every later edit repairs it
+        if weight is None:
+            result = self.tracker.delete_edge(from_node, to_node)
+        else:
+            result = self.tracker.set_edge(from_node, to_node, weight)
+
+        # The edge list is edited in place, so the scene and the layout cache still match it by identity
+        for i, (nodeA, nodeB, _) in enumerate(self.data):
+            if (nodeA, nodeB) == (from_node, to_node):
+                if weight is None:
+                    del self.data[i]
+                else:
+                    self.data[i] = (nodeA, nodeB, weight)
+                break
+        else:
+            if weight is not None:
+                self.data.append((from_node, to_node, weight))
+        scene.set_edge(from_node, to_node, weight)
+        self.renderer.build_static(*self.renderer.static_args)
+
+        self.steps = self.step_cursor = None
+        self.distances = result.distances
+        self.button_prev.disable()
+        self.button_next.disable()
+        self.index_label.set_text(text=f"edit {result.version}: {len(result.changed)} changed")
+        self._lap("events")
+        self.renderer.set_table(result.distances, self.nodes, self.font, result.changed)
+        self._lap("table")
+        if self.path_shown:
+            # Drawn again from the repaired tree on the next frame, graph.shortest_path needs no search
+            self.renderer.hide_shortest_path()
+            self.path_shown = False
+        return result
+
+    def searching_in_frames(self):
+        # A lazy search is still being finished on the window thread
+        return self.distances is None and self.steps is not None and self.search_job is None
+
+    def advance_search(self):
+        # Spend this frame's budget on the rest of a small lazy search, so neither a step nor a distance lookup
+        # ever has to run the whole search at once. Big searches are finished on the compute worker instead
+        if self.searching_in_frames() and self.steps.run_for(SEARCH_FRAME_BUDGET):
+            self.distances = FinalDistances(self.steps)
+            self.show_step(self.current_snapshot_index)
+
+    def at_last_step(self):
+        # The last step of a search that has ended is shown
+        return self.steps.finished and self.current_snapshot_index == len(self.steps) - 1
+
+    def set_playing(self, playing):
+        self.playing = playing
+        self.play_budget = 0.0
+        self.button_play.set_text("Pause" if playing else "Play")
+
+    def advance_play(self, time_delta):
+        # Show the steps auto-play owes for time_delta seconds, several per frame if the rate is above the
+        # frame rate. Stops on the last step and shows the result like Next does
+        if not self.playing or self.steps is None:
+            return
+        self.play_budget += time_delta * self.play_rate
+        count = int(self.play_budget)
+        if count:
+            self.play_budget -= count
+            self.show_step(self.current_snapshot_index + count)
+        if self.at_last_step():
+            self.set_playing(False)
+            self.render_path = True
+
+    def hide_overlay(self):
+        self.overlay_panel.hide()
+        self.overlay_panel_on = False
+
+    def open_file(self, path):
+        try:
+            if is_snapshot(path):
+                # Binary snapshot, mapped into memory instead of parsed
+                graph = Graph.load(path)
+            else:
+                with open(path, "r") as graph_file:
+                    graph = graph_file.read()
+            self.load_graph(graph)
+        except Exception as e:
+            print(f"Could not load {path}: {e}")
+
+    def quit(self):
+        self.running = False
+
+    def handle_table_event(self, event):
+        # The wheel over the table and Page Up / Page Down scroll it, a click on its header sorts it by
+        # distance or by name again. Returns True if the event was used
+        renderer = self.renderer
+        if event.type == pygame.MOUSEWHEEL and renderer.table_at(pygame.mouse.get_pos()):
+            renderer.scroll_table(-event.y * TABLE_SCROLL_ROWS)
+        elif event.type == pygame.KEYDOWN and event.key in (pygame.K_PAGEUP, pygame.K_PAGEDOWN) and renderer.table:
+            page = renderer.table.visible_rows - 1
+            renderer.scroll_table(-page if event.key == pygame.K_PAGEUP else page)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and renderer.table_at(event.pos):
+            if event.pos[1] < renderer.table.rect.y + renderer.table.row_height:
+                renderer.sort_table()
+        else:
+            return False
+        return True
+
+    def handle_view_event(self, event):
+        # Pan by dragging with any mouse button or with the arrow keys, zoom with the wheel or +/- and go back
+        # to the whole graph with Home. Returns True if the event was used
+        camera = self.renderer.camera
+        if event.type == pygame.MOUSEWHEEL:
+            camera.zoom_at(ZOOM_STEP ** event.y, pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button in (1, 2, 3):
+            self.dragging = True
+            return False  # A click still dismisses dropdowns and the like
+        elif event.type == pygame.MOUSEMOTION and self.dragging and any(event.buttons):
+            camera.pan(*event.rel)
+        elif event.type == pygame.KEYDOWN and event.key in PAN_KEYS:
+            camera.pan(*PAN_KEYS[event.key])
+        elif event.type == pygame.KEYDOWN and event.key in ZOOM_KEYS:
+            camera.zoom_at(ZOOM_KEYS[event.key], self.screen.get_rect().center)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_HOME:
+            camera.reset()
+        else:
+            return False
+        self.renderer.view_changed()
+        return True
+
+    def handle_event(self, event):
+        consumed = self.manager.process_events(event)
+        if event.type == pygame.MOUSEBUTTONUP:
+            self.dragging = False
+        if event.type == pygame.QUIT:
+            self.quit()
+            return
+        if event.type == WORKER_EVENT:
+            self.worker_event(event.status, event.job)
+            return
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.quit()
+                return
+            if event.key == pygame.K_F3 and self.profiler:
+                self.profiler.show_overlay = not self.profiler.show_overlay
+                self.renderer.invalidate(self.overlay_rect)
+                return
+            if event.key == pygame.K_SPACE and self.steps is not None and self.file_dialog is None:
+                self.set_playing(not self.playing)
+                return
+
+        if self.overlay_panel_on and event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+            self.hide_overlay()
+            self.render_path = False
+            return
+
+        if not consumed and self.file_dialog is None and (self.handle_table_event(event) or
+                                                          self.handle_view_event(event)):
+            return
+
+        if event.type == pygame_gui.UI_BUTTON_PRESSED:
+            if event.ui_element == self.button_prev:
+                self.render_path = False
+                self.set_playing(False)
+                self.show_step(self.current_snapshot_index - 1)
+            elif event.ui_element == self.button_play and self.steps is not None:
+                self.set_playing(not self.playing)
+            elif event.ui_element == self.button_next:
+                self.show_step(self.current_snapshot_index + 1)
+                if self.at_last_step():
+                    self.render_path = True  # The last step shows the result
+            elif event.ui_element == self.button_path and (self.steps is not None or self.distances is not None):
+                self.render_path = not self.render_path
+            elif event.ui_element == self.button_load and self.file_dialog is None:
+                self.file_dialog = UIFileDialog(
+                    rect=pygame.Rect(100, 100, 600, 400),
+                    manager=self.manager,
+                    window_title="Load a Graph File",
+                )
+
+        # Selecting another source or target reruns the search only
+        elif event.type == pygame_gui.UI_DROP_DOWN_MENU_CHANGED and self.layout_job is None:
+            if event.ui_element == self.source_dropdown:
+                self.set_search(self.node_by_text[event.text], self.target_node)
+            elif event.ui_element == self.target_dropdown:
+                self.set_search(self.source_node, self.node_by_text[event.text])
+
+        elif event.type == pygame_gui.UI_FILE_DIALOG_PATH_PICKED and event.ui_element == self.file_dialog:
+            self.file_dialog = None  # Close the dialog after the selection
+            self.open_file(event.text)
+
+        elif event.type == pygame_gui.UI_WINDOW_CLOSE and event.ui_element == self.file_dialog:
+            self.file_dialog = None
+
+    def update_path(self):
         # Check whether to render the Shortest path
-        if renderSP:
-            if render_shortest_path(data, g, source_node, target_node, 0x606d5d, screen, font, distances) == 0:
-                overlay_panel.show()
-                overlay_panel_on = True
-
+        if self.render_path != self.path_shown:
+            if self.render_path and self.distances is None:
+                return  # Shown once the search running on the compute worker is done
+            self.path_shown = self.render_path
+            if not self.render_path:
+                self.renderer.hide_shortest_path()
+            elif self.renderer.show_shortest_path(self.data, self.graph, self.source_node, self.target_node,
+                                                  self.font, self.distances) == 0:
+                self.overlay_panel.show()
+                self.overlay_panel_on = True
+
+    def _lap(self, phase):
+        # Charge the time since the last lap to phase, for work that runs within the events phase of a frame
+        # (stepping, loading a graph)
+        if self.profiler:
+            self.profiler.lap(phase)
+
+    def frame(self):
+        # One iteration of the main loop, returns False once the window was closed
+        profiler = self.profiler
+        renderer = self.renderer
+        if profiler:
+            profiler.start_frame()
+        events = pygame.event.get()
+        if (not events and renderer.is_idle() and self.file_dialog is None and not self.playing
+                and not self.searching_in_frames()):
+            # Nothing to redraw, sleep until the user does something instead of spinning at 60 fps
+            event = pygame.event.wait(IDLE_WAIT_MS)
+            if event.type != pygame.NOEVENT:
+                events = [event] + pygame.event.get()
+        time_delta = self.clock.tick(60) / 1000.0
+        if profiler:
+            profiler.lap("wait")
+
+        for event in events:
+            self.handle_event(event)
+            if not self.running:
+                return False
+        self.advance_play(time_delta)
+        self.advance_search()
+        if profiler:
+            profiler.lap("events")
+
+        self.update_path()
+        if profiler:
+            profiler.lap("path")
 
-
-        #Core pygame functions for rendering anything
-        pygame.display.flip()
-        pygame.display.update()
-        _clock.tick(60)
-    #endregion
+        # Render pygame_GUI
+        self.manager.update(time_delta)
+        if profiler:
+            profiler.lap("ui")
+
+        # Compose the layers and push only the changed parts of the screen
+        renderer.draw(self.manager, ui_changed=bool(events) or self.file_dialog is not None)
+        if profiler:
+            profiler.lap("draw")
+            profiler.end_frame()
+            # The overlay is drawn over the finished frame and its area recomposed on the next one
+            self.overlay_rect = profiler.draw_overlay(self.screen, getFont("label"))
+            if self.overlay_rect is not None:
+                pygame.display.update(self.overlay_rect)
+                renderer.invalidate(self.overlay_rect)
+        return True
+
+    def run(self):
+        while self.frame():
+            pass
+        self.close()
+
+    def close(self):
+        # Fonts, text surfaces and the scene belong to this pygame session, a new window starts without them
+        self.worker.close()
+        pygame.quit()
+        _fonts.clear()
+        text_cache.clear()
+        invalidateScene()
+
+
+def _post_worker_event(status, job):
+    # notify function of the compute worker, called on its thread. Posting events is thread safe in SDL
+    try:
+        pygame.event.post(pygame.event.Event(WORKER_EVENT, status=status, job=job))
+    except pygame.error:
+        pass  # The window was closed meanwhile
+
+
+def visualize(graph, source_node, target_node, select_source=None, select_target=None, algorithm="dijkstra",
+              layout_engine=None, play_rate=PLAY_RATE):
+    # Open the window and run until it is closed. select_source / select_target are kept for older callers,
+    # the dropdowns always show the searched nodes
+    VisualizerApp(graph, source_node, target_node, algorithm, layout_engine, play_rate).run()
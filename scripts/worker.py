@@ -0,0 +1,117 @@
+import threading
+from collections import deque
+
+# Background thread for the slow parts of the visualization (layouts, searches), so the window keeps drawing
+# and answering the OS while they run. A thread and not a process: the results (layouts, step logs) are big and
+# would have to be pickled back, and the searches yield the GIL often enough for the window thread to keep its
+# frame rate. Jobs are cancelled cooperatively: a job function takes a progress(done, total) callback, calls it
+# regularly and the callback raises Cancelled once the job was cancelled.
+# The worker never touches pygame itself, it reports to a notify(status, job) function instead (the window
+# posts those as pygame events) with status one of
+#   "progress"   job.fraction went up by at least PROGRESS_STEP
+#   "done"       job.result holds the return value
+#   "failed"     job.error holds the exception
+#   "cancelled"  the job was cancelled, while queued jobs are dropped without a notification
+PROGRESS_STEP = 0.01  # Smallest progress change reported, keeps the event queue from flooding
+
+
+class Cancelled(Exception):
+    # Raised inside a job by its progress callback once the job was cancelled
+    pass
+
+
+class Job:
+    def __init__(self, kind, function, args, notify):
+        self.kind = kind  # Jobs of one kind replace each other, e.g. "search"
+        self.function = function
+        self.args = args
+        self.fraction = 0.0  # Last reported progress, 0 to 1
+        self.result = None
+        self.error = None
+        self._notify = notify
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def progress(self, done, total):
+        # Handed to the job function as its progress keyword
+        if self._cancelled.is_set():
+            raise Cancelled
+        fraction = done / total if total else 1.0
+        if fraction - self.fraction >= PROGRESS_STEP:
+            self.fraction = fraction
+            self._notify("progress", self)
+
+
+class ComputeWorker:
+    def __init__(self, notify):
+        self.notify = notify
+        self.jobs = deque()  # Jobs waiting to run
+        self.current = None  # Job running right now
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name="compute-worker", daemon=True)
+        self.thread.start()
+
+    def submit(self, kind, function, *args):
+        # Run function(*args, progress=...) in the background. A queued or running job of the same kind is
+        # cancelled, the new one makes its result useless. Returns the Job
+        job = Job(kind, function, args, self.notify)
+        with self.condition:
+            self._cancel(kind)
+            self.jobs.append(job)
+            self.condition.notify()
+        return job
+
+    def cancel(self, kind=None):
+        # Cancel the jobs of one kind, or all of them
+        with self.condition:
+            self._cancel(kind)
+
+    def _cancel(self, kind):
+        for job in self.jobs:
+            if kind is None or job.kind == kind:
+                job.cancel()
+        self.jobs = deque(job for job in self.jobs if not job.cancelled)
+        if self.current is not None and (kind is None or self.current.kind == kind):
+            self.current.cancel()
+
+    def busy(self):
+        with self.condition:
+            return self.current is not None or bool(self.jobs)
+
+    def close(self, timeout=5):
+        # Cancel everything and stop the thread. A job that does not check its progress callback can not be
+        # stopped, the thread is a daemon so it does not keep the program alive either way
+        with self.condition:
+            self._cancel(None)
+            self.closed = True
+            self.condition.notify()
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.jobs and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                job = self.current = self.jobs.popleft()
+            try:
+                job.result = job.function(*job.args, progress=job.progress)
+                status = "done"
+            except Cancelled:
+                status = "cancelled"
+            except Exception as error:
+                job.error = error
+                status = "failed"
+            with self.condition:
+                self.current = None
+                if job.cancelled:
+                    status = "cancelled"  # It finished before it noticed, the result is not wanted any more
+            self.notify(status, job)